@@ -1,19 +1,36 @@
 # app.py
+import importlib
+
 import streamlit as st
-from pages.dashboard import page_dashboard
-from pages.relatorios import page_relatorios
-from pages.cadastrosGerais import page_cadastros_gerais
-from pages.importarVendas import page_importar_vendas
+from utils.instrumentacao import medir_execucao, mostrar_painel_desempenho
 
 st.set_page_config(page_title="Gestor E-commerce", page_icon="📈", layout="wide")
 
-st.sidebar.title("Navegação")
+# Página -> (módulo, função). O módulo só é importado quando a página é aberta pela primeira vez no processo,
+# então a barra lateral aparece sem esperar pandas, modelos e dependências de todas as páginas.
 paginas = {
-    "Dashboard": page_dashboard,
-    "Relatórios": page_relatorios,
-    "Cadastros Gerais": page_cadastros_gerais,
-    "Importar Vendas": page_importar_vendas,
+    "Dashboard": ("pages.dashboard", "page_dashboard"),
+    "Relatórios": ("pages.relatorios", "page_relatorios"),
+    "Cadastros Gerais": ("pages.cadastrosGerais", "page_cadastros_gerais"),
+    "Importar Vendas": ("pages.importarVendas", "page_importar_vendas"),
 }
+
+
+@st.cache_resource(show_spinner="Preparando o banco de dados...")
+def _preparar_servidor():
+    # Uma vez por processo: esquema conferido/migrado e caches compartilhados montados em segundo plano
+    from utils.aquecimento import preparar_servidor
+    return preparar_servidor()
+
+
+st.sidebar.title("Navegação")
 pagina_selecionada = st.sidebar.radio("Selecione uma página:", paginas.keys())
+painel_desempenho = st.sidebar.toggle("⏱️ Painel de desempenho", key="painel_desempenho", help="Tempo de cada etapa e de cada consulta SQL desta execução da página.")
 
-paginas[pagina_selecionada]()
\ No newline at end of file
+# A medição roda sempre (o log de lentidão vale para todos); o painel só aparece para quem pedir
+with medir_execucao(pagina_selecionada) as registro:
+    _preparar_servidor()
+    modulo, funcao = paginas[pagina_selecionada]
+    getattr(importlib.import_module(modulo), funcao)()
+if painel_desempenho:
+    mostrar_painel_desempenho(registro)
@@ -0,0 +1,177 @@
+# benchmarks/gerador.py
+"""
+Gerador determinístico de dados sintéticos para os benchmarks: catálogo (categorias, Produtos Pai e variações,
+no formato da planilha de catálogo de utils/catalogo.py), vendas no formato da exportação da Shopee e
+lançamentos prontos para lancamentos_vendas. A mesma semente sempre gera exatamente os mesmos dados.
+
+Uso direto: python benchmarks/gerador.py --linhas 100000 --saida /tmp/vendas_100k.xlsx [--catalogo /tmp/catalogo.xlsx]
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+SEMENTE_PADRAO = 20240601
+INICIO_VENDAS = pd.Timestamp("2023-01-01")
+DIAS_DE_VENDAS = 730
+# Fração das linhas com SKU fora do catálogo (exercita o caminho de SKUs não encontrados)
+FRACAO_SKUS_DESCONHECIDOS = 0.01
+# Fração das linhas que são mais um item do pedido anterior
+FRACAO_ITENS_EXTRAS = 0.2
+
+_CATEGORIAS = ["Camisetas", "Calças", "Vestidos", "Acessórios", "Calçados", "Bolsas", "Moda Praia", "Infantil",
+               "Esportes", "Casa", "Beleza", "Papelaria"]
+_MODELOS = ["Básica", "Estampada", "Premium", "Oversized", "Slim", "Clássica", "Esportiva", "Casual"]
+_CORES = ["Preto", "Branco", "Azul", "Vermelho", "Verde", "Cinza", "Rosa", "Bege"]
+_TAMANHOS = ["PP", "P", "M", "G", "GG", "XG"]
+
+COLUNAS_SHOPEE = [
+    "ID do pedido", "Data de criação do pedido", "Número de referência SKU", "Quantidade", "Preço acordado",
+    "Taxa de comissão", "Taxa de serviço", "Taxa de transação", "Cupom do vendedor", "Cupom Shopee", "Reembolso Shopee",
+]
+
+
+def dimensionar_catalogo(linhas: int) -> int:
+    """
+    Número de SKUs proporcional ao volume de vendas (entre 200 e 20 mil).
+    """
+    return int(min(20000, max(200, linhas // 50)))
+
+
+def gerar_catalogo(skus: int, semente: int = SEMENTE_PADRAO) -> pd.DataFrame:
+    """
+    Catálogo no formato COLUNAS_PLANILHA_CATALOGO: uma linha por variação, cerca de 4 variações por Produto Pai.
+    """
+    rng = np.random.default_rng(semente)
+    produtos = max(20, skus // 4)
+    id_produto = np.arange(produtos)
+    categoria = np.array(_CATEGORIAS)[id_produto % len(_CATEGORIAS)]
+    modelo = np.array(_MODELOS)[(id_produto // len(_CATEGORIAS)) % len(_MODELOS)]
+    nome_produto = pd.Series(categoria).str.rstrip("s") + " " + modelo + " " + (id_produto + 1).astype(str)
+    custo_unidade = np.round(rng.uniform(4, 60, produtos), 2)
+    quantidade_kit = rng.choice([1, 1, 1, 2, 3], produtos)
+    custo_insumos = np.round(rng.uniform(0.2, 3, produtos), 2)
+
+    sku = np.arange(skus)
+    dono = sku % produtos
+    cor = np.array(_CORES)[(sku // produtos) % len(_CORES)]
+    tamanho = np.array(_TAMANHOS)[(sku // (produtos * len(_CORES))) % len(_TAMANHOS)]
+    return pd.DataFrame({
+        "categoria": categoria[dono],
+        "idProdutoPai": "PP" + pd.Series(dono + 1).astype(str).str.zfill(5),
+        "nomeProdutoPai": nome_produto.values[dono],
+        "custoUnidade": custo_unidade[dono],
+        "quantidadeKit": quantidade_kit[dono],
+        "custoInsumos": custo_insumos[dono],
+        "skuVariacao": "SKU-" + pd.Series(sku + 1).astype(str).str.zfill(6),
+        "nomeVariacao": nome_produto.values[dono] + " - " + cor + " " + tamanho,
+    })
+
+
+def gerar_vendas_shopee(linhas: int, catalogo: pd.DataFrame, semente: int = SEMENTE_PADRAO, prefixo_pedido: str = "25") -> pd.DataFrame:
+    """
+    Vendas no formato da exportação da Shopee. A popularidade dos SKUs segue uma lei de potência (poucos SKUs
+    concentram as vendas), cerca de 20% dos itens pertencem ao mesmo pedido do item anterior e 1% dos SKUs
+    não existem no catálogo.
+    """
+    rng = np.random.default_rng(semente + linhas)
+    skus = catalogo["skuVariacao"].to_numpy()
+    peso = 1.0 / np.arange(1, len(skus) + 1) ** 1.1
+    indice_sku = rng.choice(len(skus), size=linhas, p=peso / peso.sum())
+    sku = skus[rng.permutation(len(skus))][indice_sku]
+    desconhecido = rng.random(linhas) < FRACAO_SKUS_DESCONHECIDOS
+    sku[desconhecido] = "SKU-X" + pd.Series(indice_sku[desconhecido] % 50).astype(str).to_numpy()
+
+    item_extra = (rng.random(linhas) < FRACAO_ITENS_EXTRAS) & (np.arange(linhas) > 0)
+    item_extra[1:] &= sku[1:] != sku[:-1]
+    numero_pedido = np.cumsum(~item_extra)
+    # Itens do mesmo pedido compartilham data e hora
+    segundos = np.sort(rng.integers(0, DIAS_DE_VENDAS * 86400, numero_pedido[-1] + 1))[numero_pedido]
+    preco = np.round(rng.uniform(19.9, 199.9, linhas), 2)
+    quantidade = rng.choice([1, 1, 1, 1, 2, 2, 3], linhas)
+    bruto = preco * quantidade
+    cupom = np.where(rng.random(linhas) < 0.3, np.round(bruto * 0.05, 2), 0.0)
+    return pd.DataFrame({
+        "ID do pedido": prefixo_pedido + pd.Series(numero_pedido).astype(str).str.zfill(10),
+        "Data de criação do pedido": (INICIO_VENDAS + pd.to_timedelta(segundos, unit="s")).strftime("%Y-%m-%d %H:%M"),
+        "Número de referência SKU": sku,
+        "Quantidade": quantidade,
+        "Preço acordado": preco,
+        "Taxa de comissão": np.round(bruto * 0.14, 2),
+        "Taxa de serviço": np.round(bruto * 0.06, 2),
+        "Taxa de transação": np.round(bruto * 0.02, 2),
+        "Cupom do vendedor": cupom,
+        "Cupom Shopee": 0.0,
+        "Reembolso Shopee": np.where(rng.random(linhas) < 0.01, np.round(bruto, 2), 0.0),
+    })[COLUNAS_SHOPEE]
+
+
+def escrever_xlsx(df: pd.DataFrame, caminho: str):
+    """
+    Grava o DataFrame como .xlsx com o openpyxl em modo write-only (memória constante, bem mais rápido que to_excel).
+    """
+    from openpyxl import Workbook
+    livro = Workbook(write_only=True)
+    planilha = livro.create_sheet()
+    planilha.append(list(df.columns))
+    for linha in df.itertuples(index=False, name=None):
+        planilha.append(linha)
+    livro.save(caminho)
+
+
+def gerar_lancamentos(vendas_shopee: pd.DataFrame, catalogo: pd.DataFrame) -> pd.DataFrame:
+    """
+    Os lançamentos que a importação gravaria para estas vendas (sem passar pela planilha), no formato
+    COLUNAS_LANCAMENTO. Útil para popular bancos grandes rapidamente.
+    """
+    from utils.importacao import COLUNAS_LANCAMENTO, preparar_vendas
+
+    df = preparar_vendas(vendas_shopee.astype(str), "Shopee")
+    custo_kit = (catalogo["custoUnidade"] * catalogo["quantidadeKit"] + catalogo["custoInsumos"]).set_axis(catalogo["skuVariacao"])
+    df["custoTotalCalculado"] = df["skuVenda"].map(custo_kit)
+    df = df.dropna(subset=["custoTotalCalculado"]).drop_duplicates(["pedidoId", "skuVenda"])
+    df["lucroLiquidoReal"] = df["valorVendaLiquido"] - df["custoTotalCalculado"] * df["quantidade"]
+    return df[COLUNAS_LANCAMENTO].reset_index(drop=True)
+
+
+def popular_banco(linhas: int, semente: int = SEMENTE_PADRAO):
+    """
+    Cria o esquema no banco de DATABASE_URL e grava o catálogo e os lançamentos de `linhas` vendas
+    geradas, com o resumo diário reconstruído. Para bancos temporários de benchmark.
+    """
+    from database import SessionLocal, engine, criar_banco
+    from utils.catalogo import gravar_catalogo, validar_catalogo
+    from utils.resumo import reconstruir_resumo_vendas
+    criar_banco()
+    catalogo = gerar_catalogo(dimensionar_catalogo(linhas), semente)
+    with SessionLocal() as db:
+        gravar_catalogo(db, validar_catalogo(db, catalogo))
+    lancamentos = gerar_lancamentos(gerar_vendas_shopee(linhas, catalogo, semente), catalogo)
+    with engine.begin() as conexao:
+        lancamentos.to_sql("lancamentos_vendas", conexao, if_exists="append", index=False, chunksize=50000)
+        reconstruir_resumo_vendas(conexao)
+        conexao.exec_driver_sql("ANALYZE")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, default=10000)
+    parser.add_argument("--saida", required=True, help="arquivo .xlsx (ou .csv) de vendas no formato Shopee")
+    parser.add_argument("--catalogo", help="grava também a planilha de catálogo correspondente (.xlsx ou .csv)")
+    parser.add_argument("--semente", type=int, default=SEMENTE_PADRAO)
+    args = parser.parse_args()
+
+    catalogo = gerar_catalogo(dimensionar_catalogo(args.linhas), args.semente)
+    vendas = gerar_vendas_shopee(args.linhas, catalogo, args.semente)
+    for df, caminho in ((vendas, args.saida), (catalogo, args.catalogo)):
+        if not caminho:
+            continue
+        if caminho.lower().endswith(".csv"):
+            df.to_csv(caminho, index=False)
+        else:
+            escrever_xlsx(df, caminho)
+        print(f"{len(df):,} linhas em {caminho}")
+
+
+if __name__ == "__main__":
+    main()
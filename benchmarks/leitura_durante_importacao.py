@@ -0,0 +1,175 @@
+# benchmarks/leitura_durante_importacao.py
+"""
+Latência de leitura do dashboard enquanto uma importação grava no banco.
+
+Roda o mesmo cenário em um banco temporário para cada configuração (um subprocesso por configuração,
+pois o engine é montado na importação de database.py):
+  - "padrao antigo": journal DELETE, synchronous FULL, timeout de 5s (o create_engine sem ajustes);
+  - "ajustado": os padrões atuais de database.py (WAL, synchronous NORMAL, cache, mmap, busy_timeout).
+
+Uso: python benchmarks/leitura_durante_importacao.py [--linhas-base 50000] [--blocos 20] [--leitores 4]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFIGURACOES = {
+    "padrao antigo": {"SQLITE_JOURNAL_MODE": "DELETE", "SQLITE_SYNCHRONOUS": "FULL", "SQLITE_CACHE_SIZE_KB": "2000",
+                      "SQLITE_MMAP_SIZE_MB": "0", "SQLITE_TEMP_STORE": "DEFAULT", "SQLITE_BUSY_TIMEOUT_MS": "5000"},
+    "ajustado": {},
+}
+
+
+def _vendas_sinteticas(inicio: int, quantidade: int):
+    import pandas as pd
+    indices = pd.RangeIndex(inicio, inicio + quantidade)
+    return pd.DataFrame({
+        "pedidoId": "B" + indices.astype(str),
+        "dataPedido": (pd.Timestamp("2023-01-01") + pd.to_timedelta(indices % 700, unit="D")).astype(str),
+        "skuVenda": "SKU-" + pd.Series(indices % 40).astype(str).values,
+        "quantidade": (1 + indices % 3).astype(str),
+        "receitaBrutaProduto": "49.90", "taxasMarketplace": "7.60", "totalCupons": "1.00",
+    })
+
+
+def _preparar_banco(linhas_base: int):
+    from database import SessionLocal, Categoria, ProdutoPai, Variacao, criar_banco
+    from utils.importacao import processar_vendas
+    criar_banco()
+    with SessionLocal() as db:
+        db.add(Categoria(id=1, nome="Categoria"))
+        for p in range(10):
+            db.add(ProdutoPai(idProdutoPai=f"P{p}", nomeProdutoPai=f"Produto {p}", custoUnidade=5 + p, quantidadeKit=1, custoInsumos=0.5, categoria_id=1))
+        for s in range(40):
+            db.add(Variacao(skuVariacao=f"SKU-{s}", nomeVariacao=f"Variação {s}", idProdutoPai=f"P{s % 10}"))
+        db.commit()
+        for inicio in range(0, linhas_base, 10000):
+            processar_vendas(db, _vendas_sinteticas(inicio, min(10000, linhas_base - inicio)), "Outra")
+
+
+def _escritor(linhas_base: int, blocos: int, tamanho_bloco: int):
+    """
+    Executado em um processo separado (como a CLI ou o worker de importação): importa os blocos, um commit por bloco.
+    """
+    from database import sessao_banco
+    from utils.importacao import processar_vendas
+    inicio, erros = time.perf_counter(), 0
+    with sessao_banco() as db:
+        for bloco in range(blocos):
+            try:
+                processar_vendas(db, _vendas_sinteticas(linhas_base + bloco * tamanho_bloco, tamanho_bloco), "Outra")
+            except Exception:
+                db.rollback()
+                erros += 1
+    segundos = time.perf_counter() - inicio
+    return {"erros_escrita": erros, "linhas_por_segundo_escrita": round(blocos * tamanho_bloco / segundos)}
+
+
+def _medir_leituras(leitores: int, continuar) -> dict:
+    """
+    `leitores` threads repetindo as consultas do dashboard enquanto continuar() for verdadeiro.
+    """
+    from database import sessao_banco
+    from utils.consultas import FiltrosVendas, calcular_kpis, consultar_pagina_lancamentos
+    latencias, erros = [], []
+    trava = threading.Lock()
+
+    def ler():
+        while continuar():
+            inicio = time.perf_counter()
+            try:
+                with sessao_banco() as db:
+                    calcular_kpis(db, FiltrosVendas())
+                    consultar_pagina_lancamentos(db, FiltrosVendas(), limite=50)
+            except Exception as e:
+                with trava:
+                    erros.append(type(e).__name__ + ": " + str(e).splitlines()[0])
+                continue
+            with trava:
+                latencias.append(time.perf_counter() - inicio)
+
+    threads = [threading.Thread(target=ler) for _ in range(leitores)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencias.sort()
+    def percentil(p):
+        return latencias[min(len(latencias) - 1, int(p * len(latencias)))] * 1000 if latencias else None
+    return {
+        "leituras": len(latencias), "erros_leitura": len(erros), "exemplo_erro": erros[0] if erros else None,
+        "p50_ms": percentil(0.50), "p95_ms": percentil(0.95), "p99_ms": percentil(0.99),
+        "max_ms": latencias[-1] * 1000 if latencias else None,
+        "media_ms": statistics.fmean(latencias) * 1000 if latencias else None,
+    }
+
+
+def _cenario(args) -> dict:
+    """
+    Executado no subprocesso de cada configuração: mede as leituras sozinhas e depois com o escritor gravando.
+    """
+    _preparar_banco(args.linhas_base)
+    fim_referencia = time.perf_counter() + args.segundos_referencia
+    sem_escrita = _medir_leituras(args.leitores, lambda: time.perf_counter() < fim_referencia)
+
+    escritor = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--escritor", "1", "--linhas-base", str(args.linhas_base),
+         "--blocos", str(args.blocos), "--tamanho-bloco", str(args.tamanho_bloco)],
+        stdout=subprocess.PIPE, text=True,
+    )
+    com_escrita = _medir_leituras(args.leitores, lambda: escritor.poll() is None)
+    saida_escritor = escritor.communicate()[0]
+    return {"sem_escrita": sem_escrita, "com_escrita": com_escrita, **json.loads(saida_escritor.strip().splitlines()[-1])}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas-base", type=int, default=50000, help="vendas já gravadas antes do teste")
+    parser.add_argument("--blocos", type=int, default=20, help="blocos importados durante o teste")
+    parser.add_argument("--tamanho-bloco", type=int, default=5000)
+    parser.add_argument("--leitores", type=int, default=4, help="threads lendo em paralelo (sessões do Streamlit)")
+    parser.add_argument("--segundos-referencia", type=float, default=3.0, help="duração da medição sem escrita")
+    parser.add_argument("--cenario", help=argparse.SUPPRESS)
+    parser.add_argument("--escritor", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.escritor:
+        print(json.dumps(_escritor(args.linhas_base, args.blocos, args.tamanho_bloco)))
+        return
+    if args.cenario:
+        print(json.dumps(_cenario(args)))
+        return
+
+    resultados = {}
+    for nome, variaveis in CONFIGURACOES.items():
+        with tempfile.TemporaryDirectory() as pasta:
+            ambiente = {**os.environ, **variaveis, "DATABASE_URL": f"sqlite:///{os.path.join(pasta, 'bench.db')}", "PYTHONPATH": RAIZ}
+            saida = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--cenario", "1", "--linhas-base", str(args.linhas_base),
+                 "--blocos", str(args.blocos), "--tamanho-bloco", str(args.tamanho_bloco), "--leitores", str(args.leitores),
+                 "--segundos-referencia", str(args.segundos_referencia)],
+                env=ambiente, cwd=RAIZ, capture_output=True, text=True, check=True,
+            )
+            resultados[nome] = json.loads(saida.stdout.strip().splitlines()[-1])
+
+    formatar = lambda v: f"{v:10.1f}" if v is not None else f"{'-':>10}"
+    print(f"{'configuração':<15}{'escrita':<9}{'leituras':>10}{'erros':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'máx ms':>10}")
+    for nome, r in resultados.items():
+        for rotulo, medida in (("não", r["sem_escrita"]), ("sim", r["com_escrita"])):
+            print(f"{nome:<15}{rotulo:<9}{medida['leituras']:>10}{medida['erros_leitura']:>8}{formatar(medida['p50_ms'])}"
+                  f"{formatar(medida['p95_ms'])}{formatar(medida['p99_ms'])}{formatar(medida['max_ms'])}")
+            if medida["exemplo_erro"]:
+                print(f"  ex.: {medida['exemplo_erro']}")
+        print(f"  importação: {r['linhas_por_segundo_escrita']:,} linhas/s, {r['erros_escrita']} bloco(s) com erro")
+
+
+if __name__ == "__main__":
+    main()
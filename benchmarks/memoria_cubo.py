@@ -0,0 +1,114 @@
+# benchmarks/memoria_cubo.py
+"""
+Memória do cubo de vendas (utils/cubo.py), o que o app mantém em memória por versão dos dados: o tamanho
+do cubo pronto, o da leitura do banco que o alimenta e o pico de RSS do processo durante a montagem.
+
+Variantes:
+  - leitura_antiga: o cubo montado sobre um pd.read_sql de uma vez (texto como str, inteiros em int64);
+  - cubo: a montagem atual, com a leitura em blocos e tipos enxutos de ler_sql_compacto (utils/analise.py).
+
+Cada variante roda em um subprocesso próprio, para que o pico de RSS de uma não contamine a outra. Sem --banco,
+um banco temporário é populado com o gerador (lançamentos gravados direto, sem passar pela planilha).
+
+Uso: python benchmarks/memoria_cubo.py [--linhas 1000000] [--banco /tmp/bench.db] [--saida relatorio.json]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VARIANTES = ["leitura_antiga", "cubo"]
+
+
+def _bytes_cubo(cubo) -> int:
+    total = int(cubo.grupos.memory_usage(deep=True).sum())
+    for valor in vars(cubo).values():
+        if hasattr(valor, "nbytes"):
+            total += valor.nbytes
+    return total
+
+
+def _variante(nome: str) -> dict:
+    """
+    Executado no subprocesso: monta o cubo uma vez e mede o cubo, a leitura que o alimentou, o pico de RSS e o tempo.
+    """
+    import pandas as pd
+    import utils.cubo
+    from utils.analise import ler_sql_compacto
+
+    entrada = {}
+
+    def ler(consulta, conexao, categoricas=(), datas=()):
+        if nome == "leitura_antiga":
+            df = pd.read_sql(consulta, conexao, parse_dates=list(datas))
+        else:
+            df = ler_sql_compacto(consulta, conexao, categoricas=categoricas, datas=datas)
+        entrada["bytes"] = int(df.memory_usage(deep=True).sum())
+        entrada["tipos"] = {coluna: str(tipo) for coluna, tipo in df.dtypes.items()}
+        return df
+
+    # A montagem é a mesma nas duas variantes; só a leitura do banco muda
+    utils.cubo.ler_sql_compacto = ler
+    rss_inicial = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    inicio = time.perf_counter()
+    cubo = utils.cubo._construir_cubo()
+    segundos = time.perf_counter() - inicio
+    rss_pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "linhas": len(cubo), "segundos": round(segundos, 2), "cubo_mb": round(_bytes_cubo(cubo) / 2**20, 1),
+        "leitura_mb": round(entrada["bytes"] / 2**20, 1),
+        # ru_maxrss vem em KB no Linux
+        "pico_rss_mb": round(rss_pico / 1024, 1), "acrescimo_pico_rss_mb": round((rss_pico - rss_inicial) / 1024, 1),
+        "tipos_leitura": entrada["tipos"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, default=1_000_000, help="vendas geradas quando não há --banco")
+    parser.add_argument("--banco", help="arquivo SQLite já populado (não é alterado)")
+    parser.add_argument("--saida", help="grava o relatório também em JSON")
+    parser.add_argument("--variante", choices=VARIANTES, help=argparse.SUPPRESS)
+    parser.add_argument("--popular", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.popular:
+        from gerador import popular_banco
+        popular_banco(args.linhas)
+        return
+    if args.variante:
+        print(json.dumps(_variante(args.variante)))
+        return
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.abspath(args.banco) if args.banco else os.path.join(pasta, "bench.db")
+        ambiente = {**os.environ, "DATABASE_URL": f"sqlite:///{caminho}", "PYTHONPATH": RAIZ, "ARQUIVO_LOG_LENTIDAO": ""}
+        if not args.banco:
+            print(f"Populando {args.linhas:,} linhas...", flush=True)
+            subprocess.run([sys.executable, os.path.abspath(__file__), "--popular", "--linhas", str(args.linhas)],
+                           env=ambiente, cwd=RAIZ, check=True)
+        resultados = {}
+        for nome in VARIANTES:
+            saida = subprocess.run([sys.executable, os.path.abspath(__file__), "--variante", nome],
+                                   env=ambiente, cwd=RAIZ, capture_output=True, text=True, check=True)
+            resultados[nome] = json.loads(saida.stdout.strip().splitlines()[-1])
+
+    print(f"{'variante':<16}{'linhas':>12}{'cubo MB':>10}{'leitura MB':>12}{'pico RSS MB':>13}{'+RSS MB':>10}{'segundos':>10}")
+    for nome, r in resultados.items():
+        print(f"{nome:<16}{r['linhas']:>12,}{r['cubo_mb']:>10.1f}{r['leitura_mb']:>12.1f}{r['pico_rss_mb']:>13.1f}"
+              f"{r['acrescimo_pico_rss_mb']:>10.1f}{r['segundos']:>10.2f}")
+    antes, depois = resultados["leitura_antiga"]["acrescimo_pico_rss_mb"], resultados["cubo"]["acrescimo_pico_rss_mb"]
+    if antes:
+        print(f"\nAcréscimo de RSS na montagem: {antes:,.1f} MB -> {depois:,.1f} MB ({1 - depois / antes:.0%} menos)")
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump({"linhas_geradas": None if args.banco else args.linhas, "resultados": resultados}, arquivo, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
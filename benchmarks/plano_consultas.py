@@ -0,0 +1,201 @@
+# benchmarks/plano_consultas.py
+"""
+Confere, com EXPLAIN QUERY PLAN, que as consultas do dashboard, dos relatórios e da reprecificação usam os
+índices criados pelas migrações (utils/migracoes.py) em vez de varrer lancamentos_vendas inteira.
+
+Monta um banco temporário com um catálogo e vendas sintéticas (nunca toca o controle_financeiro.db),
+roda ANALYZE (como a migração dos índices faz em bancos existentes) e imprime o plano de cada consulta. Sai com código 1 se alguma
+consulta não usar um dos índices esperados. Com --esquema-base, o banco temporário começa com o esquema (só as tabelas,
+sem dados) de outro arquivo SQLite e chega à versão atual pelas migrações de utils/migracoes.py, como um banco antigo.
+Os testes em tests/test_plano_consultas.py rodam este script com --json.
+
+Uso: python benchmarks/plano_consultas.py [--linhas 100000] [--skus 600] [--esquema-base controle_financeiro.db] [--mostrar-planos] [--json]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+from datetime import date
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _copiar_esquema(origem: str, destino: str):
+    """
+    Cria em `destino` as tabelas e índices de `origem` (aberto só para leitura), sem as linhas e com a mesma
+    versão de esquema (PRAGMA user_version).
+    """
+    conexao_origem = sqlite3.connect(f"file:{origem}?mode=ro", uri=True)
+    try:
+        comandos = [sql for nome, sql in conexao_origem.execute("SELECT name, sql FROM sqlite_master WHERE sql IS NOT NULL")
+                    if not nome.startswith("sqlite_")]
+        versao = conexao_origem.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conexao_origem.close()
+    conexao = sqlite3.connect(destino)
+    try:
+        for comando in comandos:
+            conexao.execute(comando)
+        conexao.execute(f"PRAGMA user_version = {versao}")
+        conexao.commit()
+    finally:
+        conexao.close()
+
+
+def _preparar_banco(linhas: int, skus: int):
+    import pandas as pd
+    from database import SessionLocal, Categoria, ProdutoPai, Variacao, criar_banco
+    from utils.importacao import processar_vendas
+    from utils.plataformas import obter_parser
+
+    criar_banco()
+    produtos = max(1, skus // 6)
+    with SessionLocal() as db:
+        db.add_all(Categoria(id=c, nome=f"Categoria {c}") for c in range(1, 9))
+        db.add_all(
+            ProdutoPai(idProdutoPai=f"P{p}", nomeProdutoPai=f"Produto {p}", custoUnidade=5 + p % 20, quantidadeKit=1 + p % 3,
+                       custoInsumos=0.5, categoria_id=1 + p % 8)
+            for p in range(produtos)
+        )
+        db.add_all(Variacao(skuVariacao=f"SKU-{s}", nomeVariacao=f"Variação {s}", idProdutoPai=f"P{s % produtos}") for s in range(skus))
+        db.commit()
+
+        parser = obter_parser("Outra")
+        for numero, plataforma in enumerate(("Shopee", "Mercado Livre", "Loja Própria")):
+            indices = pd.RangeIndex(numero * linhas, (numero + 1) * linhas, 3)
+            df = pd.DataFrame({
+                "pedidoId": f"{plataforma[0]}" + indices.astype(str),
+                "dataPedido": (pd.Timestamp("2023-01-01") + pd.to_timedelta(indices % 730, unit="D")).astype(str),
+                "skuVenda": "SKU-" + pd.Series((indices * 7919) % skus).astype(str).values,
+                "quantidade": (1 + indices % 3).astype(str),
+                "receitaBrutaProduto": "49.90", "taxasMarketplace": "7.60", "totalCupons": "1.00",
+            })
+            processar_vendas(db, df, plataforma, parser=parser)
+
+
+def _consultas():
+    """
+    (nome, SQL compilado, índices aceitos para lancamentos_vendas). Conjunto vazio: a consulta não lê lancamentos_vendas.
+    """
+    from sqlalchemy import distinct, func, select
+    from database import engine, LancamentosVendas
+    from utils.consultas import FiltrosVendas, aplicar_filtros, com_catalogo, _filtro_busca
+    from utils.custos import _sql_reprecificar
+
+    def sql(consulta):
+        return str(consulta.compile(engine, compile_kwargs={"literal_binds": True}))
+
+    periodo = dict(data_inicio=date(2024, 3, 1), data_fim=date(2024, 3, 31))
+    filtros = {
+        "período": FiltrosVendas(**periodo),
+        "período + plataforma": FiltrosVendas(plataformas=("Shopee",), **periodo),
+        "período + categoria": FiltrosVendas(categorias=(3,), **periodo),
+    }
+    por_periodo = {"ix_lancamentos_data_plataforma", "ix_lancamentos_sku_data"}
+    consultas = []
+    for rotulo, filtro in filtros.items():
+        pedidos = aplicar_filtros(com_catalogo(select(func.count(distinct(LancamentosVendas.pedidoId))).select_from(LancamentosVendas)), filtro)
+        consultas.append((f"KPI pedidos distintos ({rotulo})", sql(pedidos), por_periodo))
+        contagem = _filtro_busca(aplicar_filtros(com_catalogo(select(func.count()).select_from(LancamentosVendas)), filtro), "")
+        consultas.append((f"contagem do detalhamento ({rotulo})", sql(contagem), por_periodo))
+        pagina = aplicar_filtros(com_catalogo(select(LancamentosVendas.id).select_from(LancamentosVendas)), filtro)
+        pagina = pagina.order_by(LancamentosVendas.dataPedido.desc(), LancamentosVendas.id.desc()).limit(50)
+        consultas.append((f"página do detalhamento ({rotulo})", sql(pagina), por_periodo))
+    consultas.append((
+        "intervalo de datas dos filtros",
+        sql(select(select(func.min(LancamentosVendas.dataPedido)).scalar_subquery(), select(func.max(LancamentosVendas.dataPedido)).scalar_subquery())),
+        {"ix_lancamentos_data_plataforma"},
+    ))
+    consultas.append((
+        "reprecificação de um Produto Pai",
+        _sql_reprecificar("lancamentos_vendas", "'P1'"),
+        {"ix_lancamentos_sku_data"},
+    ))
+    # O relatório por grupo lê só o resumo diário; o plano é mostrado para conferir os joins do catálogo
+    consultas.append(("relatório por grupo (categoria)", _sql_relatorio(filtros["período + categoria"]), set()))
+    return consultas
+
+
+def _sql_relatorio(filtro):
+    from sqlalchemy import func, select
+    from database import engine, Categoria, ProdutoPai, Variacao, ResumoVendasDiario
+    from utils.consultas import aplicar_filtros_resumo, com_catalogo
+    consulta = aplicar_filtros_resumo(com_catalogo(select(
+        Variacao.grupoProduto, Categoria.nome, func.sum(ResumoVendasDiario.unidades * ProdutoPai.quantidadeKit),
+    ).select_from(ResumoVendasDiario), ResumoVendasDiario), filtro).group_by(Variacao.grupoProduto, Categoria.nome)
+    return str(consulta.compile(engine, compile_kwargs={"literal_binds": True}))
+
+
+def _conferir(plano: list, indices_aceitos: set) -> str:
+    """
+    Devolve o problema encontrado no plano, ou "" se estiver de acordo.
+    """
+    acessos = [linha for linha in plano if " lancamentos_vendas" in f" {linha}"]
+    if not indices_aceitos:
+        return "lê lancamentos_vendas" if acessos else ""
+    if not acessos:
+        return "não lê lancamentos_vendas"
+    for linha in acessos:
+        # SCAN ... USING INDEX ainda percorre a tabela inteira: só SEARCH conta como acesso pelo índice
+        if not linha.startswith("SEARCH") or not any(indice in linha for indice in indices_aceitos):
+            return f"acesso sem índice esperado: {linha}"
+    return ""
+
+
+def avaliar_planos(linhas: int, skus: int, esquema_base: str = None) -> dict:
+    """
+    Monta o banco temporário (a partir do esquema de `esquema_base`, se informado) e confere o plano de cada
+    consulta. Precisa rodar antes de qualquer importação de database.py, que fixa o DATABASE_URL.
+    """
+    pasta = tempfile.mkdtemp()
+    caminho = os.path.join(pasta, "plano.db")
+    if esquema_base:
+        _copiar_esquema(os.path.abspath(esquema_base), caminho)
+    os.environ["DATABASE_URL"] = f"sqlite:///{caminho}"
+    sys.path.insert(0, RAIZ)
+    _preparar_banco(linhas, skus)
+
+    from sqlalchemy import text
+    from database import engine
+    from utils.migracoes import VERSAO_ATUAL, versao_esquema
+
+    consultas = []
+    with engine.connect() as conexao:
+        conexao.exec_driver_sql("ANALYZE")
+        versao = versao_esquema(conexao)
+        for nome, sql, indices_aceitos in _consultas():
+            plano = [linha[3] for linha in conexao.execute(text("EXPLAIN QUERY PLAN " + sql))]
+            consultas.append({"nome": nome, "problema": _conferir(plano, indices_aceitos), "plano": plano})
+    return {"versao_esquema": versao, "versao_atual": VERSAO_ATUAL, "consultas": consultas}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, default=100000, help="vendas por plataforma (3 plataformas)")
+    parser.add_argument("--skus", type=int, default=600)
+    parser.add_argument("--esquema-base", help="arquivo SQLite cujo esquema (sem os dados) é o ponto de partida das migrações")
+    parser.add_argument("--mostrar-planos", action="store_true", help="imprime o plano de todas as consultas, não só das reprovadas")
+    parser.add_argument("--json", action="store_true", help="imprime o resultado como JSON na última linha")
+    args = parser.parse_args()
+
+    resultado = avaliar_planos(args.linhas, args.skus, args.esquema_base)
+    reprovadas = sum(bool(consulta["problema"]) for consulta in resultado["consultas"])
+    if args.json:
+        print(json.dumps(resultado, ensure_ascii=False))
+        sys.exit(1 if reprovadas else 0)
+
+    print(f"Esquema na versão {resultado['versao_esquema']} (atual: {resultado['versao_atual']})\n")
+    for consulta in resultado["consultas"]:
+        problema = consulta["problema"]
+        print(f"[{'FALHOU' if problema else 'ok'}] {consulta['nome']}" + (f": {problema}" if problema else ""))
+        if problema or args.mostrar_planos:
+            for linha in consulta["plano"]:
+                print(f"         {linha}")
+    print(f"\n{reprovadas} consulta(s) fora do plano esperado.")
+    sys.exit(1 if reprovadas else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# benchmarks/primeira_pintura.py
+"""
+Partida a frio do app: quanto tempo até a barra lateral aparecer e até a primeira página (Dashboard) ficar
+pronta num processo novo do Streamlit, e quanto leva a sessão seguinte no mesmo processo.
+
+  - barra lateral: importações de nível de módulo do app (o que roda antes de st.sidebar), num processo novo;
+  - primeira sessão: primeira execução completa do app pelo AppTest, num processo novo (caches vazios);
+  - segunda sessão: outra sessão no mesmo processo, logo depois da primeira.
+
+Variantes: o app.py atual com e sem aquecimento (AQUECER_CACHES) e, com --app-anterior, outra versão do
+app.py para comparação (ex.: git show <commit>:app.py > /tmp/app_anterior.py). Cada medida roda em um
+subprocesso próprio; sem --banco, um banco temporário é populado com o gerador.
+
+Uso: python benchmarks/primeira_pintura.py [--linhas 100000] [--banco arquivo.db] [--app-anterior /tmp/app_anterior.py] [--repeticoes 3]
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _importacoes_de_modulo(caminho: str) -> list:
+    """
+    Os comandos import/from ... import do nível de módulo do script, na ordem em que aparecem.
+    """
+    with open(caminho, encoding="utf-8") as arquivo:
+        arvore = ast.parse(arquivo.read())
+    return [ast.unparse(no) for no in arvore.body if isinstance(no, (ast.Import, ast.ImportFrom))]
+
+
+def _medir_barra_lateral(caminho: str) -> dict:
+    inicio = time.perf_counter()
+    exec("\n".join(_importacoes_de_modulo(caminho)), {})
+    return {"barra_lateral_s": time.perf_counter() - inicio}
+
+
+def _medir_sessoes(caminho: str) -> dict:
+    from streamlit.testing.v1 import AppTest
+    medidas = {}
+    for nome in ("primeira_sessao_s", "segunda_sessao_s"):
+        app = AppTest.from_file(caminho, default_timeout=600)
+        inicio = time.perf_counter()
+        app.run()
+        medidas[nome] = time.perf_counter() - inicio
+        if app.exception:
+            raise RuntimeError(app.exception[0].message)
+    return medidas
+
+
+def _variantes(args) -> dict:
+    atual = os.path.join(RAIZ, "app.py")
+    variantes = {"atual": (atual, "1"), "atual_sem_aquecimento": (atual, "0")}
+    if args.app_anterior:
+        variantes = {"anterior": (os.path.abspath(args.app_anterior), "0"), **variantes}
+    return variantes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, default=100_000, help="vendas geradas quando não há --banco")
+    parser.add_argument("--banco", help="arquivo SQLite já populado (o esquema é conferido pelo app)")
+    parser.add_argument("--app-anterior", help="outra versão do app.py, medida como 'anterior'")
+    parser.add_argument("--repeticoes", type=int, default=3, help="processos novos por medida (vale a mediana)")
+    parser.add_argument("--saida", help="grava o resultado também em JSON")
+    parser.add_argument("--medir", choices=("barra_lateral", "sessoes"), help=argparse.SUPPRESS)
+    parser.add_argument("--app", help=argparse.SUPPRESS)
+    parser.add_argument("--popular", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.popular:
+        from gerador import popular_banco
+        popular_banco(args.linhas)
+        return
+    if args.medir:
+        medir = _medir_barra_lateral if args.medir == "barra_lateral" else _medir_sessoes
+        print(json.dumps(medir(args.app)))
+        return
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.abspath(args.banco) if args.banco else os.path.join(pasta, "bench.db")
+        ambiente = {**os.environ, "DATABASE_URL": f"sqlite:///{caminho}", "PYTHONPATH": RAIZ, "ARQUIVO_LOG_LENTIDAO": ""}
+        if not args.banco:
+            print(f"Populando {args.linhas:,} linhas...", flush=True)
+            subprocess.run([sys.executable, os.path.abspath(__file__), "--popular", "--linhas", str(args.linhas)],
+                           env=ambiente, cwd=RAIZ, check=True)
+        resultados = {}
+        for nome, (app, aquecer) in _variantes(args).items():
+            execucoes = []
+            for _ in range(args.repeticoes):
+                medidas = {}
+                for medida in ("barra_lateral", "sessoes"):
+                    saida = subprocess.run(
+                        [sys.executable, os.path.abspath(__file__), "--medir", medida, "--app", app],
+                        env={**ambiente, "AQUECER_CACHES": aquecer}, cwd=RAIZ, capture_output=True, text=True, check=True,
+                    )
+                    medidas.update(json.loads(saida.stdout.strip().splitlines()[-1]))
+                execucoes.append(medidas)
+            resultados[nome] = {chave: statistics.median(e[chave] for e in execucoes) for chave in execucoes[0]}
+
+    print(f"{'variante':<24}{'barra lateral s':>17}{'1ª sessão s':>13}{'2ª sessão s':>13}")
+    for nome, r in resultados.items():
+        print(f"{nome:<24}{r['barra_lateral_s']:>17.2f}{r['primeira_sessao_s']:>13.2f}{r['segunda_sessao_s']:>13.2f}")
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump({"linhas_geradas": None if args.banco else args.linhas, "repeticoes": args.repeticoes, "resultados": resultados},
+                      arquivo, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
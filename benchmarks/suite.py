@@ -0,0 +1,266 @@
+# benchmarks/suite.py
+"""
+Suíte de benchmarks das rotinas por trás das telas, rodadas fora do Streamlit sobre dados sintéticos
+determinísticos (benchmarks/gerador.py):
+
+  catalogo.*    importação da planilha de catálogo, carga das tabelas da tela de cadastros, busca e exportação
+  importacao.*  leitura, preparação e gravação de uma planilha Shopee (as etapas de page_importar_vendas),
+                reimportação só com duplicados e um arquivo inteiro pela fila de utils/trabalhos.py
+  dashboard.*   opções dos filtros, KPIs em SQL e no cubo (com e sem filtro), contagem e página do
+                detalhamento e montagem do cubo
+  relatorios.*  relatório por grupo de produto em SQL e no cubo, tendências por dia/semana/mês e curva ABC
+                de SKUs e grupos (com e sem filtro)
+
+Cada tamanho roda num subprocesso com banco e pasta de importação temporários (nunca toca o
+controle_financeiro.db). As planilhas geradas ficam em cache na pasta temporária do sistema, por tamanho
+e semente. O resultado vai para um JSON com o ambiente (commit, versões) e o mínimo e a mediana de
+cada medida; com --comparar, as medidas que pioraram além da tolerância são listadas e o código de saída é 1.
+
+Uso: python benchmarks/suite.py [--tamanhos 10000,100000,1000000] [--repeticoes 5] [--saida resultado.json]
+                                [--comparar anterior.json] [--tolerancia 0.2] [--modo-fila normal|streaming]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+RAIZ_PROJETO = os.path.dirname(RAIZ)
+sys.path.insert(0, RAIZ)
+
+from gerador import SEMENTE_PADRAO, dimensionar_catalogo, escrever_xlsx, gerar_catalogo, gerar_vendas_shopee  # noqa: E402
+
+VERSAO_FORMATO = 1
+TAMANHOS_PADRAO = "10000,100000"
+# Medidas abaixo disto variam mais com o ruído da máquina do que com o código: ficam fora da comparação
+MINIMO_SEGUNDOS_COMPARACAO = 0.005
+
+
+def _planilha(linhas: int, semente: int, prefixo_pedido: str, catalogo) -> str:
+    """
+    Caminho da planilha Shopee com estes parâmetros, gerada só na primeira vez.
+    """
+    pasta = os.path.join(tempfile.gettempdir(), "controle_financeiro_benchmarks")
+    os.makedirs(pasta, exist_ok=True)
+    caminho = os.path.join(pasta, f"shopee_{linhas}_{semente}_{prefixo_pedido}.xlsx")
+    if not os.path.exists(caminho):
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        escrever_xlsx(gerar_vendas_shopee(linhas, catalogo, semente, prefixo_pedido), temporario)
+        os.replace(temporario, caminho)
+    return caminho
+
+
+class _Medidor:
+    def __init__(self, repeticoes: int):
+        self.repeticoes = repeticoes
+        self.medidas = {}
+
+    def medir(self, nome: str, funcao, linhas: int = None, repeticoes: int = None, antes=None):
+        """
+        Executa a função (antes de cada execução, `antes`, fora do tempo) e registra mínimo e mediana.
+        Devolve o resultado da última execução.
+        """
+        tempos = []
+        for _ in range(repeticoes or self.repeticoes):
+            if antes:
+                antes()
+            inicio = time.perf_counter()
+            resultado = funcao()
+            tempos.append(time.perf_counter() - inicio)
+        medida = {"segundos_min": min(tempos), "segundos_mediana": statistics.median(tempos), "execucoes": len(tempos)}
+        if linhas:
+            medida["linhas"] = linhas
+            medida["linhas_por_segundo"] = round(linhas / medida["segundos_mediana"]) if medida["segundos_mediana"] else None
+        self.medidas[nome] = medida
+        print(f"  {nome:<38}{medida['segundos_mediana'] * 1000:>12.1f} ms", file=sys.stderr, flush=True)
+        return resultado
+
+
+def _cenario(linhas: int, repeticoes: int, semente: int, modo_fila: str) -> dict:
+    """
+    Executado no subprocesso, com DATABASE_URL e PASTA_IMPORTACOES já apontando para a pasta temporária.
+    """
+    from database import SessionLocal, criar_banco
+    from utils.catalogo import buscar_no_catalogo, carregar_catalogo, exportar_catalogo, gravar_catalogo, limpar_cache_catalogo, validar_catalogo
+    from utils.cubo import _construir_cubo, carregar_cubo_vendas
+    from utils.consultas import (
+        GRANULARIDADES, FiltrosVendas, calcular_kpis, consultar_curva_abc, consultar_opcoes_filtros, consultar_pagina_lancamentos,
+        consultar_relatorio_por_grupo, consultar_tendencia, contar_lancamentos,
+    )
+    from utils.importacao import gravar_vendas, ler_planilha_sem_cache, preparar_vendas, processar_vendas
+    from utils.trabalhos import FALHOU, aguardar_trabalhos, enviar_importacao
+
+    medidor = _Medidor(repeticoes)
+    criar_banco()
+    catalogo = gerar_catalogo(dimensionar_catalogo(linhas), semente)
+    planilhas = {prefixo: _planilha(linhas, semente, prefixo, catalogo) for prefixo in ("25", "26")}
+
+    # Catálogo: a planilha inteira de uma vez, como o upload da tela de cadastros
+    with SessionLocal() as db:
+        validado = medidor.medir("catalogo.validar_planilha", lambda: validar_catalogo(db, catalogo), len(catalogo), repeticoes=1)
+        medidor.medir("catalogo.gravar_planilha", lambda: gravar_catalogo(db, validado), len(catalogo), repeticoes=1)
+
+    # Importação em etapas (o que a fila faz para cada arquivo), depois o mesmo arquivo de novo
+    with open(planilhas["25"], "rb") as arquivo:
+        conteudo = arquivo.read()
+    bruto = medidor.medir("importacao.ler_planilha", lambda: ler_planilha_sem_cache(conteudo, "vendas.xlsx"), linhas, repeticoes=1)
+    vendas = medidor.medir("importacao.preparar", lambda: preparar_vendas(bruto, "Shopee"), linhas, repeticoes=1)
+    with SessionLocal() as db:
+        resultado = medidor.medir("importacao.gravar", lambda: gravar_vendas(db, vendas), linhas, repeticoes=1)
+        medidor.medir("importacao.reimportar_duplicados", lambda: processar_vendas(db, bruto, "Shopee"), linhas, repeticoes=1)
+
+    # Um segundo arquivo (outros pedidos) pela fila, como a página envia: inclui subir o pool de processos
+    with open(planilhas["26"], "rb") as arquivo:
+        conteudo = arquivo.read()
+    trabalho = medidor.medir(
+        f"importacao.fila_{modo_fila}",
+        lambda: aguardar_trabalhos([enviar_importacao(conteudo, "vendas_fila.xlsx", "Shopee", modo_streaming=modo_fila == "streaming")], intervalo=0.05),
+        linhas, repeticoes=1,
+    )
+    if (trabalho["status"] == FALHOU).any():
+        raise RuntimeError(f"Importação pela fila falhou: {trabalho['erro'].iloc[0]}")
+
+    # Dashboard e relatórios
+    with SessionLocal() as db:
+        opcoes = medidor.medir("dashboard.opcoes_filtros", lambda: consultar_opcoes_filtros(db))
+        fim = opcoes["data_max"]
+        filtrado = FiltrosVendas(plataformas=("Shopee",), categorias=(1, 2, 3), data_inicio=fim - timedelta(days=90), data_fim=fim)
+        for rotulo, filtros in (("", FiltrosVendas()), ("_filtrado", filtrado)):
+            medidor.medir(f"dashboard.kpis{rotulo}", lambda: calcular_kpis(db, filtros))
+            medidor.medir(f"dashboard.contar_lancamentos{rotulo}", lambda: contar_lancamentos(db, filtros))
+            medidor.medir(f"dashboard.pagina_lancamentos{rotulo}", lambda: consultar_pagina_lancamentos(db, filtros))
+            medidor.medir(f"relatorios.por_grupo{rotulo}", lambda: consultar_relatorio_por_grupo(db, filtros))
+            for granularidade in GRANULARIDADES:
+                medidor.medir(f"relatorios.tendencia_{granularidade}{rotulo}", lambda: consultar_tendencia(db, filtros, granularidade))
+            for nivel in ("sku", "grupo"):
+                medidor.medir(f"relatorios.curva_abc_{nivel}{rotulo}", lambda: consultar_curva_abc(db, filtros, nivel))
+    cubo = medidor.medir("dashboard.cubo_construir", _construir_cubo, repeticoes=1)
+    carregar_cubo_vendas()
+    for rotulo, filtros in (("", FiltrosVendas()), ("_filtrado", filtrado)):
+        medidor.medir(f"dashboard.kpis_cubo{rotulo}", lambda: cubo.kpis(filtros))
+        medidor.medir(f"relatorios.por_grupo_cubo{rotulo}", lambda: cubo.relatorio_por_grupo(filtros))
+
+    # Tela de cadastros: as três tabelas lidas do banco (cache vazio), a busca e a exportação
+    medidor.medir(
+        "catalogo.carregar_tabelas",
+        lambda: [carregar_catalogo(tabela) for tabela in ("categorias", "produtos_pai", "variacoes")],
+        antes=limpar_cache_catalogo,
+    )
+    variacoes = carregar_catalogo("variacoes")
+    medidor.medir("catalogo.buscar_variacoes", lambda: buscar_no_catalogo(variacoes, ["skuVariacao", "nomeVariacao", "grupoProduto"], "azul g"))
+    medidor.medir("catalogo.exportar_xlsx", exportar_catalogo)
+
+    return {
+        "linhas": linhas,
+        "skus": len(catalogo),
+        "lancamentos": len(cubo),
+        "itens_salvos_primeira_importacao": resultado.itens_salvos,
+        "medidas": medidor.medidas,
+    }
+
+
+def _ambiente() -> dict:
+    import numpy
+    import pandas
+    import sqlalchemy
+    import sqlite3
+
+    def git(*argumentos):
+        try:
+            return subprocess.run(["git", *argumentos], cwd=RAIZ_PROJETO, capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {
+        "commit": git("rev-parse", "HEAD"),
+        "alteracoes_locais": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "pandas": pandas.__version__,
+        "numpy": numpy.__version__,
+        "sqlalchemy": sqlalchemy.__version__,
+        "sqlite": sqlite3.sqlite_version,
+        "plataforma": platform.platform(),
+        "processador": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def _comparar(atual: dict, anterior: dict, tolerancia: float) -> int:
+    """
+    Imprime as medidas em comum (pela mediana) e devolve quantas pioraram além da tolerância.
+    """
+    pioras = 0
+    print(f"\nComparação com {anterior['ambiente'].get('commit') or '?'} (tolerância {tolerancia:.0%}):")
+    print(f"{'tamanho':>10}  {'medida':<38}{'antes ms':>12}{'agora ms':>12}{'variação':>10}")
+    for tamanho, resultado in atual["resultados"].items():
+        antes = anterior["resultados"].get(tamanho, {}).get("medidas", {})
+        for nome, medida in resultado["medidas"].items():
+            if nome not in antes:
+                continue
+            anterior_s, atual_s = antes[nome]["segundos_mediana"], medida["segundos_mediana"]
+            if max(anterior_s, atual_s) < MINIMO_SEGUNDOS_COMPARACAO:
+                continue
+            variacao = atual_s / anterior_s - 1 if anterior_s else 0.0
+            piorou = variacao > tolerancia
+            pioras += piorou
+            print(f"{tamanho:>10}  {nome:<38}{anterior_s * 1000:>12.1f}{atual_s * 1000:>12.1f}{variacao:>+10.0%}{'  <- piorou' if piorou else ''}")
+    print(f"{pioras} medida(s) piorou(aram) mais de {tolerancia:.0%}.")
+    return pioras
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanhos", default=TAMANHOS_PADRAO, help="linhas de vendas por cenário, separadas por vírgula")
+    parser.add_argument("--repeticoes", type=int, default=5, help="execuções de cada consulta (a importação roda uma vez)")
+    parser.add_argument("--semente", type=int, default=SEMENTE_PADRAO)
+    parser.add_argument("--modo-fila", choices=("normal", "streaming"), default="normal", help="modo do arquivo enviado pela fila")
+    parser.add_argument("--saida", help="arquivo JSON de resultado (padrão: benchmarks/resultados/suite_<data>.json)")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="piora relativa da mediana aceita na comparação")
+    parser.add_argument("--cenario", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.cenario:
+        print(json.dumps(_cenario(args.cenario, args.repeticoes, args.semente, args.modo_fila)))
+        return
+
+    tamanhos = [int(tamanho) for tamanho in args.tamanhos.split(",") if tamanho.strip()]
+    resultado = {
+        "versao_formato": VERSAO_FORMATO,
+        "executado_em": datetime.now().isoformat(timespec="seconds"),
+        "parametros": {"tamanhos": tamanhos, "repeticoes": args.repeticoes, "semente": args.semente, "modo_fila": args.modo_fila},
+        "ambiente": _ambiente(),
+        "resultados": {},
+    }
+    for linhas in tamanhos:
+        print(f"{linhas:,} linhas:", file=sys.stderr, flush=True)
+        with tempfile.TemporaryDirectory() as pasta:
+            ambiente = {**os.environ, "PYTHONPATH": RAIZ_PROJETO, "DATABASE_URL": f"sqlite:///{os.path.join(pasta, 'bench.db')}",
+                        "PASTA_IMPORTACOES": os.path.join(pasta, "importacoes")}
+            saida = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--cenario", str(linhas), "--repeticoes", str(args.repeticoes),
+                 "--semente", str(args.semente), "--modo-fila", args.modo_fila],
+                env=ambiente, cwd=RAIZ_PROJETO, stdout=subprocess.PIPE, text=True, check=True,
+            )
+        resultado["resultados"][str(linhas)] = json.loads(saida.stdout.strip().splitlines()[-1])
+
+    caminho = args.saida or os.path.join(RAIZ, "resultados", f"suite_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+    print(f"\nResultado gravado em {caminho}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            anterior = json.load(arquivo)
+        sys.exit(1 if _comparar(resultado, anterior, args.tolerancia) else 0)
+
+
+if __name__ == "__main__":
+    main()
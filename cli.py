@@ -0,0 +1,163 @@
+# cli.py
+"""
+Linha de comando para rodar sem o Streamlit (cron, scripts):
+
+  python cli.py importar PASTA [--plataforma NOME] [--streaming] [--forcar]
+      Importa os .xlsx/.csv da pasta em paralelo (mesma fila de utils/trabalhos.py). Arquivos cujo conteúdo
+      já foi importado (mesmo hash) são pulados.
+
+  python cli.py relatorio --saida PASTA [--inicio AAAA-MM-DD] [--fim AAAA-MM-DD] [--plataforma NOME] [--categoria NOME] [--formato csv|parquet]
+      Grava o relatório por grupo de produto e os KPIs do dashboard para o período.
+
+Os módulos pesados só são importados dentro de cada comando, e nada aqui importa o Streamlit.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+EXTENSOES_VENDAS = (".xlsx", ".csv")
+
+
+def _importar(args) -> int:
+    from sqlalchemy import select
+    from database import TrabalhoImportacao, criar_banco, sessao_banco
+    from utils.importacao import hash_conteudo
+    from utils.plataformas import detectar_parser, ler_cabecalho, listar_plataformas, obter_parser
+    from utils.trabalhos import CONCLUIDO, FALHOU, PENDENTES, aguardar_trabalhos, enviar_importacao
+
+    criar_banco()
+    if not os.path.isdir(args.pasta):
+        print(f"Pasta não encontrada: {args.pasta}")
+        return 2
+    caminhos = sorted(
+        os.path.join(args.pasta, nome) for nome in os.listdir(args.pasta)
+        if nome.lower().endswith(EXTENSOES_VENDAS) and not nome.startswith("~$")
+    )
+    if not caminhos:
+        print(f"Nenhum arquivo .xlsx ou .csv em {args.pasta}.")
+        return 0
+    if args.plataforma and args.plataforma not in listar_plataformas():
+        print(f"Plataforma desconhecida: {args.plataforma}. Use uma de: {', '.join(listar_plataformas())}")
+        return 2
+
+    with sessao_banco() as db:
+        vistos = set(db.scalars(
+            select(TrabalhoImportacao.hashArquivo).where(TrabalhoImportacao.status.in_((CONCLUIDO, *PENDENTES)))
+        ))
+
+    inicio = time.perf_counter()
+    enviados, pulados = {}, 0
+    for caminho in caminhos:
+        nome_arquivo = os.path.basename(caminho)
+        with open(caminho, "rb") as arquivo:
+            conteudo = arquivo.read()
+        hash_arquivo = hash_conteudo(conteudo)
+        if hash_arquivo in vistos and not args.forcar:
+            pulados += 1
+            print(f"  pulado (conteúdo já importado): {nome_arquivo}")
+            continue
+        vistos.add(hash_arquivo)
+        parser = obter_parser(args.plataforma) if args.plataforma else detectar_parser(ler_cabecalho(conteudo, nome_arquivo))
+        if parser is None:
+            print(f"  ignorado (plataforma não reconhecida; use --plataforma): {nome_arquivo}")
+            continue
+        # retomar_orfaos=False: trabalhos abandonados ficam para o servidor, que continua rodando depois daqui
+        id_trabalho = enviar_importacao(conteudo, nome_arquivo, parser.nome, modo_streaming=args.streaming, retomar_orfaos=False)
+        enviados[id_trabalho] = nome_arquivo
+    print(f"{len(enviados)} arquivo(s) na fila, {pulados} pulado(s).")
+    if not enviados:
+        return 0
+
+    trabalhos = aguardar_trabalhos(list(enviados))
+    segundos = time.perf_counter() - inicio
+    for trabalho in trabalhos.itertuples():
+        situacao = f"ERRO: {trabalho.erro}" if trabalho.status == FALHOU else (
+            f"{trabalho.itensSalvos:,} itens salvos, {trabalho.itensDuplicados:,} duplicados, {len(trabalho.skusNaoEncontrados)} SKUs sem cadastro"
+        )
+        print(f"  {enviados[trabalho.id]}: {trabalho.linhasProcessadas:,} linhas - {situacao}")
+    linhas = int(trabalhos["linhasProcessadas"].sum())
+    print(f"Total: {linhas:,} linhas em {segundos:.1f}s ({linhas / segundos if segundos else 0:,.0f} linhas/s), "
+          f"{int(trabalhos['itensSalvos'].sum()):,} itens salvos.")
+    skus = sorted({sku for lista in trabalhos["skusNaoEncontrados"] for sku in lista})
+    if skus:
+        print(f"SKUs sem cadastro ({len(skus)}): {', '.join(skus[:20])}{' ...' if len(skus) > 20 else ''}")
+    return 1 if (trabalhos["status"] == FALHOU).any() else 0
+
+
+def _gravar(df, caminho_sem_extensao: str, formato: str) -> str:
+    caminho = f"{caminho_sem_extensao}.{formato}"
+    if formato == "parquet":
+        df.to_parquet(caminho, index=False)
+    else:
+        df.to_csv(caminho, index=False, encoding="utf-8-sig")
+    return caminho
+
+
+def _relatorio(args) -> int:
+    import pandas as pd
+    from database import criar_banco, sessao_banco
+    from utils.consultas import FiltrosVendas, calcular_kpis, consultar_opcoes_filtros, consultar_relatorio_por_grupo
+
+    if args.formato == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("O formato parquet precisa do pacote pyarrow (pip install pyarrow).")
+            return 2
+
+    # Bancos novos ou de antes do resumo diário: o relatório lê tabelas criadas pelas migrações
+    criar_banco()
+    with sessao_banco() as db:
+        opcoes = consultar_opcoes_filtros(db)
+        ids_categorias = {nome: id_categoria for id_categoria, nome in opcoes["categorias"].items()}
+        desconhecidas = [nome for nome in args.categoria if nome not in ids_categorias]
+        if desconhecidas:
+            print(f"Categoria(s) não encontrada(s): {', '.join(desconhecidas)}")
+            return 2
+        filtros = FiltrosVendas(
+            plataformas=tuple(args.plataforma), categorias=tuple(ids_categorias[nome] for nome in args.categoria),
+            data_inicio=args.inicio, data_fim=args.fim,
+        )
+        relatorio = consultar_relatorio_por_grupo(db, filtros)
+        kpis = calcular_kpis(db, filtros)
+
+    os.makedirs(args.saida, exist_ok=True)
+    periodo = {"data_inicio": args.inicio or opcoes["data_min"], "data_fim": args.fim or opcoes["data_max"]}
+    arquivos = [
+        _gravar(relatorio, os.path.join(args.saida, "relatorio_grupo"), args.formato),
+        _gravar(pd.DataFrame([{**periodo, **kpis}]), os.path.join(args.saida, "kpis"), args.formato),
+    ]
+    print(f"Receita bruta R$ {kpis['receita_bruta']:,.2f} · lucro R$ {kpis['lucro']:,.2f} · {kpis['pedidos']:,} pedidos · {len(relatorio)} grupos")
+    for caminho in arquivos:
+        print(f"  gravado: {caminho}")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    importar = comandos.add_parser("importar", help="importa os arquivos de vendas de uma pasta")
+    importar.add_argument("pasta")
+    importar.add_argument("--plataforma", help="força a plataforma de todos os arquivos (padrão: detectar pelo cabeçalho)")
+    importar.add_argument("--streaming", action="store_true", help="lê e grava em blocos, com memória constante")
+    importar.add_argument("--forcar", action="store_true", help="importa de novo arquivos já vistos")
+    importar.set_defaults(executar=_importar)
+
+    relatorio = comandos.add_parser("relatorio", help="grava o relatório por grupo e os KPIs do período")
+    relatorio.add_argument("--saida", required=True, help="pasta de destino")
+    relatorio.add_argument("--inicio", type=date.fromisoformat, help="primeiro dia (AAAA-MM-DD)")
+    relatorio.add_argument("--fim", type=date.fromisoformat, help="último dia (AAAA-MM-DD)")
+    relatorio.add_argument("--plataforma", action="append", default=[], help="pode ser repetido")
+    relatorio.add_argument("--categoria", action="append", default=[], help="nome da categoria; pode ser repetido")
+    relatorio.add_argument("--formato", choices=("csv", "parquet"), default="csv")
+    relatorio.set_defaults(executar=_relatorio)
+
+    args = parser.parse_args(argv)
+    return args.executar(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
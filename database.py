@@ -1,12 +1,80 @@
 # database.py
-from sqlalchemy import create_engine, Column, Integer, String, Float, ForeignKey, DateTime
-from sqlalchemy.orm import declarative_base, relationship, sessionmaker
+import os
+import re
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event, inspect, Column, Integer, String, Float, Boolean, ForeignKey, Date, DateTime, Index, JSON
+from sqlalchemy.orm import declarative_base, relationship, sessionmaker, validates
+from utils.instrumentacao import ConexaoSqliteMedida, instrumentar_engine
+
+# Configuração por variáveis de ambiente. Os padrões servem para várias sessões do Streamlit lendo
+# enquanto uma importação grava: WAL deixa leitores e o escritor trabalharem ao mesmo tempo.
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///controle_financeiro.db")
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL").upper()
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").upper()   # NORMAL é seguro com WAL
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))   # cache de páginas por conexão
+SQLITE_MMAP_SIZE_MB = int(os.getenv("SQLITE_MMAP_SIZE_MB", "256"))
+SQLITE_TEMP_STORE = os.getenv("SQLITE_TEMP_STORE", "MEMORY").upper()    # staging e ordenações temporárias
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "15000"))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+_VALORES_PRAGMA = {
+    "SQLITE_JOURNAL_MODE": (SQLITE_JOURNAL_MODE, {"WAL", "DELETE", "TRUNCATE", "PERSIST", "MEMORY", "OFF"}),
+    "SQLITE_SYNCHRONOUS": (SQLITE_SYNCHRONOUS, {"OFF", "NORMAL", "FULL", "EXTRA"}),
+    "SQLITE_TEMP_STORE": (SQLITE_TEMP_STORE, {"DEFAULT", "FILE", "MEMORY"}),
+}
+for _variavel, (_valor, _permitidos) in _VALORES_PRAGMA.items():
+    if _valor not in _permitidos:
+        raise ValueError(f"{_variavel}={_valor!r} inválido. Use um de: {', '.join(sorted(_permitidos))}")
+
+def _criar_engine():
+    if not DATABASE_URL.startswith("sqlite"):
+        return create_engine(DATABASE_URL, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT, pool_pre_ping=True)
+    # Cada sessão do Streamlit roda em uma thread: as conexões do pool circulam entre threads
+    return create_engine(
+        DATABASE_URL,
+        connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000, "factory": ConexaoSqliteMedida},
+        pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT,
+    )
+
+engine = _criar_engine()
+instrumentar_engine(engine)
+
+@event.listens_for(engine, "connect")
+def _configurar_conexao_sqlite(conexao_dbapi, registro_conexao):
+    """
+    Pragmas aplicados a cada conexão nova do pool.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    cursor = conexao_dbapi.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA cache_size={-SQLITE_CACHE_SIZE_KB}")   # negativo = tamanho em KiB
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE_MB * 1024 * 1024}")
+    cursor.execute(f"PRAGMA temp_store={SQLITE_TEMP_STORE}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
 
-DATABASE_URL = "sqlite:///controle_financeiro.db"
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+@contextmanager
+def sessao_banco():
+    """
+    Sessão para um bloco `with`: desfaz a transação pendente se o bloco falhar e sempre devolve a conexão ao pool.
+    Uso: `with sessao_banco() as db: ...`
+    """
+    db = SessionLocal()
+    try:
+        yield db
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
 class Categoria(Base):
     __tablename__ = "categorias"
     id = Column(Integer, primary_key=True, index=True)
@@ -20,24 +88,59 @@ class ProdutoPai(Base):
     custoUnidade = Column(Float, nullable=False, default=0.0)
     quantidadeKit = Column(Integer, nullable=False, default=1)
     custoInsumos = Column(Float, nullable=False, default=0.0)
-    categoria_id = Column(Integer, ForeignKey("categorias.id"))
+    categoria_id = Column(Integer, ForeignKey("categorias.id"), index=True)
     categoria = relationship("Categoria", back_populates="produtos_pai")
     variacoes = relationship("Variacao", back_populates="produto_pai")
 
+class CustoProdutoPai(Base):
+    """
+    Versões de custo de um Produto Pai: cada versão vale de `vigenteDesde` até a véspera da seguinte.
+    Os campos de custo de ProdutoPai guardam sempre a versão mais recente; produto sem versões usa esses
+    campos para qualquer data.
+    """
+    __tablename__ = "custos_produto_pai"
+    __table_args__ = (Index("uq_custos_produto_vigencia", "idProdutoPai", "vigenteDesde", unique=True),)
+    id = Column(Integer, primary_key=True)
+    idProdutoPai = Column(String, ForeignKey("produtos_pai.idProdutoPai"), nullable=False)
+    vigenteDesde = Column(Date, nullable=False)
+    custoUnidade = Column(Float, nullable=False, default=0.0)
+    quantidadeKit = Column(Integer, nullable=False, default=1)
+    custoInsumos = Column(Float, nullable=False, default=0.0)
+
+def extrair_grupo_produto(nome_variacao):
+    """
+    Grupo de produto usado nos relatórios: o nome da variação até o primeiro " - " ou número.
+    """
+    return re.split(r' - | \d+', nome_variacao or "")[0].strip()
+
 class Variacao(Base):
     __tablename__ = "variacoes"
     skuVariacao = Column(String, primary_key=True, index=True)
     nomeVariacao = Column(String, nullable=False)
-    idProdutoPai = Column(String, ForeignKey("produtos_pai.idProdutoPai"))
+    grupoProduto = Column(String, index=True)
+    idProdutoPai = Column(String, ForeignKey("produtos_pai.idProdutoPai"), index=True)
     produto_pai = relationship("ProdutoPai", back_populates="variacoes")
 
+    @validates("nomeVariacao")
+    def _atualizar_grupo(self, chave, nome):
+        # Toda criação ou renomeação pelo ORM recalcula o grupo
+        self.grupoProduto = extrair_grupo_produto(nome)
+        return nome
+
 class LancamentosVendas(Base):
     __tablename__ = "lancamentos_vendas"
+    __table_args__ = (
+        # Chave natural: um pedido com vários itens tem uma linha por SKU
+        Index("uq_lancamentos_pedido_sku", "pedidoId", "skuVenda", unique=True),
+        # Filtro de período (+ plataforma) do dashboard e busca por SKU + período da reprecificação
+        Index("ix_lancamentos_data_plataforma", "dataPedido", "plataforma"),
+        Index("ix_lancamentos_sku_data", "skuVenda", "dataPedido"),
+    )
     id = Column(Integer, primary_key=True, index=True)
-    pedidoId = Column(String, unique=True, nullable=False, index=True)
+    pedidoId = Column(String, nullable=False, index=True)
     dataPedido = Column(DateTime, nullable=False)
     plataforma = Column(String, nullable=False, default="Desconhecida", index=True) # <-- NOVA COLUNA
-    skuVenda = Column(String, nullable=False, index=True)
+    skuVenda = Column(String, nullable=False)
     quantidade = Column(Integer, nullable=False)
     receitaBrutaProduto = Column(Float, nullable=False)
     totalCupons = Column(Float, nullable=False)
@@ -46,9 +149,61 @@ class LancamentosVendas(Base):
     custoTotalCalculado = Column(Float, nullable=False)
     lucroLiquidoReal = Column(Float, nullable=False)
 
+class ResumoVendasDiario(Base):
+    """
+    Totais por dia x SKU x plataforma, mantidos pela importação na mesma transação dos lançamentos.
+    `itens` conta linhas de lançamento da célula, não pedidos: um pedido com vários SKUs aparece em várias células.
+    """
+    __tablename__ = "resumo_vendas_diario"
+    dia = Column(Date, primary_key=True)
+    skuVenda = Column(String, primary_key=True)
+    plataforma = Column(String, primary_key=True)
+    unidades = Column(Integer, nullable=False, default=0)
+    receitaBruta = Column(Float, nullable=False, default=0.0)
+    custoTotal = Column(Float, nullable=False, default=0.0)
+    taxas = Column(Float, nullable=False, default=0.0)
+    cupons = Column(Float, nullable=False, default=0.0)
+    lucro = Column(Float, nullable=False, default=0.0)
+    itens = Column(Integer, nullable=False, default=0)
+
+class TrabalhoImportacao(Base):
+    """
+    Arquivo de vendas enviado para importação em segundo plano (utils/trabalhos.py).
+    `dono` é o processo (host:pid) que executa o trabalho e `atualizadoEm` o seu último sinal de vida:
+    trabalhos pendentes sem sinal recente ficaram órfãos (servidor reiniciado) e são retomados.
+    """
+    __tablename__ = "trabalhos_importacao"
+    id = Column(Integer, primary_key=True)
+    nomeArquivo = Column(String, nullable=False)
+    hashArquivo = Column(String, nullable=False, index=True)
+    plataforma = Column(String, nullable=False)
+    modoStreaming = Column(Boolean, nullable=False, default=False)
+    status = Column(String, nullable=False, default="na_fila", index=True)
+    dono = Column(String)
+    linhasProcessadas = Column(Integer, nullable=False, default=0)
+    totalLinhas = Column(Integer)
+    itensSalvos = Column(Integer, nullable=False, default=0)
+    pedidosNovos = Column(Integer, nullable=False, default=0)
+    itensDuplicados = Column(Integer, nullable=False, default=0)
+    skusNaoEncontrados = Column(JSON, nullable=False, default=list)
+    erro = Column(String)
+    criadoEm = Column(DateTime, nullable=False)
+    iniciadoEm = Column(DateTime)
+    concluidoEm = Column(DateTime)
+    atualizadoEm = Column(DateTime)
+
 def criar_banco():
+    """
+    Cria as tabelas que faltam e leva bancos existentes até a versão atual do esquema (utils/migracoes.py).
+    """
+    from utils.migracoes import aplicar_migracoes, marcar_versao_atual
     print("Criando/Verificando tabelas no banco de dados...")
+    banco_novo = not inspect(engine).has_table("lancamentos_vendas")
     Base.metadata.create_all(bind=engine)
+    if banco_novo and engine.dialect.name == "sqlite":
+        marcar_versao_atual(engine)
+    else:
+        aplicar_migracoes(engine)
     print("Tabelas prontas.")
 
 if __name__ == "__main__":
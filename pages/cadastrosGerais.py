@@ -1,233 +1,337 @@
 # pages/cadastrosGerais.py
+from datetime import date
 import streamlit as st
-import pandas as pd
-from database import SessionLocal, Categoria, ProdutoPai, Variacao
+from database import sessao_banco, Categoria, CustoProdutoPai, ProdutoPai, Variacao
 from sqlalchemy import delete
+from utils.custos import INICIO_VIGENCIA, alterar_custo_produto
+from utils.helpers import limpar_cache_custos
+from utils.instrumentacao import etapa
+from utils.catalogo import COLUNAS_PLANILHA_CATALOGO, buscar_no_catalogo, carregar_catalogo, carregar_versoes_custo, exportar_catalogo, gravar_catalogo, ler_planilha_catalogo, validar_catalogo
 
-def page_cadastros_gerais():
-    st.header("⚙️ Cadastros Gerais (Categorias, Produtos e SKUs)")
-    # Usar 'with' garante que a sessão do banco de dados seja fechada corretamente
-    with SessionLocal() as db:
-
-        tab_cat, tab_prod, tab_var = st.tabs(["🏷️ Categorias", "🧩 Produtos Pai", "🎨 Variações (SKUs)"])
-
-        # --- ABA 1: CATEGORIAS ---
-        with tab_cat:
-            st.subheader("Gerenciar Categorias de Produtos")
-            add_cat_tab, edit_cat_tab, del_cat_tab = st.tabs(["Adicionar", "Editar", "Deletar"])
-            with add_cat_tab:
-                with st.form("nova_categoria_form", clear_on_submit=True):
-                    nome_categoria = st.text_input("Nome da Nova Categoria*")
-                    if st.form_submit_button("Salvar Categoria"):
+# Quantas opções cada seletor envia ao navegador por vez
+TAMANHO_PAGINA_SELETOR = 100
+
+def _seletor_catalogo(rotulo, df, coluna_chave, colunas_busca, formatar, key):
+    """
+    Selectbox com busca e paginação sobre uma tabela do catálogo: só a página atual vira opção.
+    Retorna a linha escolhida (dicionário) ou None se a busca não encontrar nada.
+    """
+    col_busca, col_pagina = st.columns([3, 1])
+    busca = col_busca.text_input(f"Buscar em: {rotulo}", key=f"{key}_busca", placeholder="Digite parte do código ou do nome")
+    encontrados = buscar_no_catalogo(df, colunas_busca, busca)
+    total_paginas = max(1, -(-len(encontrados) // TAMANHO_PAGINA_SELETOR))
+    chave_pagina = f"{key}_pagina"
+    # Uma busca nova pode ter menos páginas que a página em que o usuário estava
+    if st.session_state.get(chave_pagina, 1) > total_paginas:
+        st.session_state[chave_pagina] = 1
+    pagina = col_pagina.number_input(f"Página (de {total_paginas})", min_value=1, max_value=total_paginas, step=1, key=chave_pagina)
+
+    inicio = (pagina - 1) * TAMANHO_PAGINA_SELETOR
+    trecho = encontrados.iloc[inicio:inicio + TAMANHO_PAGINA_SELETOR]
+    if trecho.empty:
+        st.info("Nenhum registro encontrado.")
+        return None
+    linhas = dict(zip(trecho[coluna_chave].tolist(), trecho.to_dict("records")))
+    chave_escolhida = st.selectbox(rotulo, options=list(linhas), format_func=lambda chave: formatar(linhas[chave]), key=key)
+    st.caption(f"{len(encontrados)} registro(s) encontrado(s).")
+    return linhas[chave_escolhida]
+
+def _formatar_produto(p):
+    return f"{p['idProdutoPai']} - {p['nomeProdutoPai']}"
+
+def _formatar_variacao(v):
+    return f"{v['skuVariacao']} - {v['nomeVariacao']}"
+
+# --- ABA 1: CATEGORIAS ---
+def _aba_categorias(db):
+    """
+    Categorias: cadastro, edição e exclusão.
+    """
+    categorias_df = carregar_catalogo("categorias")
+    st.subheader("Gerenciar Categorias de Produtos")
+    add_cat_tab, edit_cat_tab, del_cat_tab = st.tabs(["Adicionar", "Editar", "Deletar"])
+    with add_cat_tab:
+        with st.form("nova_categoria_form", clear_on_submit=True):
+            nome_categoria = st.text_input("Nome da Nova Categoria*")
+            if st.form_submit_button("Salvar Categoria"):
+                # VERIFICAÇÃO ADICIONADA
+                if not nome_categoria or not nome_categoria.strip():
+                    st.warning("O nome da categoria é obrigatório.")
+                else:
+                    if db.query(Categoria).filter_by(nome=nome_categoria.strip()).first():
+                        st.error("Esta categoria já existe.")
+                    else:
+                        db.add(Categoria(nome=nome_categoria.strip()))
+                        db.commit()
+                        st.success("Categoria adicionada!")
+                        st.rerun()
+    with edit_cat_tab:
+        if categorias_df.empty:
+            st.info("Nenhuma categoria para editar.")
+        else:
+            categoria_para_editar = _seletor_catalogo("Selecione a Categoria para Editar", categorias_df, "id", ["nome"], lambda c: c["nome"], key="sel_edit_cat")
+            if categoria_para_editar:
+                with st.form("edit_categoria_form"):
+                    novo_nome_cat = st.text_input("Novo Nome*", value=categoria_para_editar["nome"])
+                    if st.form_submit_button("Atualizar Categoria"):
                         # VERIFICAÇÃO ADICIONADA
-                        if not nome_categoria or not nome_categoria.strip():
+                        if not novo_nome_cat or not novo_nome_cat.strip():
                             st.warning("O nome da categoria é obrigatório.")
                         else:
-                            if db.query(Categoria).filter_by(nome=nome_categoria.strip()).first():
-                                st.error("Esta categoria já existe.")
-                            else:
-                                db.add(Categoria(nome=nome_categoria.strip()))
-                                db.commit()
-                                st.success("Categoria adicionada!")
-                                st.rerun()
-            with edit_cat_tab:
-                categorias_lista = db.query(Categoria).all()
-                if not categorias_lista:
-                    st.info("Nenhuma categoria para editar.")
-                else:
-                    categoria_para_editar = st.selectbox("Selecione a Categoria para Editar", options=categorias_lista, format_func=lambda c: c.nome, key="sel_edit_cat")
-                    with st.form("edit_categoria_form"):
-                        novo_nome_cat = st.text_input("Novo Nome*", value=categoria_para_editar.nome)
-                        if st.form_submit_button("Atualizar Categoria"):
-                            # VERIFICAÇÃO ADICIONADA
-                            if not novo_nome_cat or not novo_nome_cat.strip():
-                                st.warning("O nome da categoria é obrigatório.")
-                            else:
-                                cat_atualizar = db.query(Categoria).filter_by(id=categoria_para_editar.id).first()
-                                cat_atualizar.nome = novo_nome_cat.strip()
-                                db.commit()
-                                st.success("Categoria atualizada!")
-                                st.rerun()
-            with del_cat_tab:
-                categorias_lista_del = db.query(Categoria).all()
-                if not categorias_lista_del:
-                    st.info("Nenhuma categoria para deletar.")
-                else:
-                    with st.form("delete_categoria_form"):
-                        categoria_para_deletar = st.selectbox("Selecione a Categoria para Deletar", options=categorias_lista_del, format_func=lambda c: c.nome, key="del_cat")
-                        confirmacao = st.checkbox(f"Sim, eu confirmo que desejo deletar a categoria '{categoria_para_deletar.nome}'. Esta ação é irreversível.")
-                        if st.form_submit_button("Deletar Categoria Selecionada"):
-                            if confirmacao:
-                                db.execute(delete(Categoria).where(Categoria.id == categoria_para_deletar.id))
-                                db.commit()
-                                st.success("Categoria deletada!")
-                                st.rerun()
-                            else:
-                                st.warning("Você precisa confirmar a exclusão marcando a caixa.")
-            st.markdown("---")
-            categorias_df = pd.read_sql(db.query(Categoria).statement, db.bind).rename(columns={'id': 'ID', 'nome': 'Nome da Categoria'})
-            st.dataframe(categorias_df, use_container_width=True)
-
-        # --- ABA 2: PRODUTOS PAI ---
-        with tab_prod:
-            st.subheader("Gerenciar Produtos Pai")
-            add_prod_tab, edit_prod_tab, del_prod_tab = st.tabs(["Adicionar", "Editar", "Deletar"])
-            
-            with add_prod_tab:
-                categorias_dict = {c.id: c.nome for c in db.query(Categoria).all()}
-                if not categorias_dict:
-                    st.warning("Cadastre uma Categoria na primeira aba antes de adicionar um produto.")
-                else:
-                    with st.form("novo_produto_form", clear_on_submit=True):
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            id_produto = st.text_input("ID do Produto Pai*", placeholder="Ex: CABE-RIPA-7UNI")
-                            categoria_id_selecionada = st.selectbox("Categoria*", options=list(categorias_dict.keys()), format_func=lambda x: categorias_dict[x])
-                            quantidade_kit = st.number_input("Quantidade no Kit", min_value=1, step=1, value=1)
-                        with col2:
-                            nome = st.text_input("Nome do Produto Pai*", placeholder="Ex: Cabeceira Ripa 7 uni")
-                            custo_unidade = st.number_input("Custo por Unidade (R$)", min_value=0.0, format="%.2f")
-                            custo_insumos = st.number_input("Custo dos Insumos (R$)", min_value=0.0, format="%.2f")
-                        
-                        if st.form_submit_button("Salvar Novo Produto"):
-                            # VERIFICAÇÃO ADICIONADA
-                            if not id_produto.strip() or not nome.strip():
-                                st.warning("Os campos com * são obrigatórios.")
-                            else:
-                                if db.query(ProdutoPai).filter_by(idProdutoPai=id_produto.strip()).first():
-                                    st.error(f"ID '{id_produto}' já existe!")
-                                else:
-                                    novo_produto = ProdutoPai(
-                                        idProdutoPai=id_produto.strip(), nomeProdutoPai=nome.strip(),
-                                        categoria_id=categoria_id_selecionada,
-                                        custoUnidade=custo_unidade, quantidadeKit=quantidade_kit,
-                                        custoInsumos=custo_insumos
-                                    )
-                                    db.add(novo_produto)
-                                    db.commit()
-                                    st.success("Produto Pai adicionado!")
-                                    st.rerun()
-            with edit_prod_tab:
-                produtos_pai_lista = db.query(ProdutoPai).all()
-                categorias_dict_edit = {c.id: c.nome for c in db.query(Categoria).all()}
-                if not produtos_pai_lista:
-                    st.info("Nenhum produto para editar.")
-                elif not categorias_dict_edit:
-                    st.warning("Cadastre ao menos uma categoria primeiro.")
-                else:
-                    produto_para_editar = st.selectbox("Selecione o Produto para Editar", options=produtos_pai_lista, format_func=lambda p: f"{p.idProdutoPai} - {p.nomeProdutoPai}", key="sel_edit_prod")
-                    with st.form("edit_produto_form"):
-                        st.write(f"**Editando:** `{produto_para_editar.idProdutoPai}`")
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            novo_nome = st.text_input("Nome do Produto Pai*", value=produto_para_editar.nomeProdutoPai)
-                            cat_ids = list(categorias_dict_edit.keys())
-                            current_cat_index = cat_ids.index(produto_para_editar.categoria_id) if produto_para_editar.categoria_id in cat_ids else 0
-                            nova_cat_id = st.selectbox("Categoria*", options=cat_ids, index=current_cat_index, format_func=lambda x: categorias_dict_edit[x])
-                            nova_qtd_kit = st.number_input("Quantidade no Kit", value=produto_para_editar.quantidadeKit, min_value=1, step=1)
-                        with col2:
-                            novo_custo_unidade = st.number_input("Custo por Unidade (R$)", value=produto_para_editar.custoUnidade, format="%.2f")
-                            novo_custo_insumos = st.number_input("Custo dos Insumos (R$)", value=produto_para_editar.custoInsumos, format="%.2f")
-
-                        if st.form_submit_button("Atualizar Produto"):
-                            # VERIFICAÇÃO ADICIONADA
-                            if not novo_nome.strip():
-                                st.warning("O nome do produto é obrigatório.")
+                            cat_atualizar = db.get(Categoria, categoria_para_editar["id"])
+                            cat_atualizar.nome = novo_nome_cat.strip()
+                            db.commit()
+                            st.success("Categoria atualizada!")
+                            st.rerun()
+    with del_cat_tab:
+        if categorias_df.empty:
+            st.info("Nenhuma categoria para deletar.")
+        else:
+            categoria_para_deletar = _seletor_catalogo("Selecione a Categoria para Deletar", categorias_df, "id", ["nome"], lambda c: c["nome"], key="del_cat")
+            if categoria_para_deletar:
+                with st.form("delete_categoria_form"):
+                    confirmacao = st.checkbox(f"Sim, eu confirmo que desejo deletar a categoria '{categoria_para_deletar['nome']}'. Esta ação é irreversível.")
+                    if st.form_submit_button("Deletar Categoria Selecionada"):
+                        if confirmacao:
+                            db.execute(delete(Categoria).where(Categoria.id == categoria_para_deletar["id"]))
+                            db.commit()
+                            st.success("Categoria deletada!")
+                            st.rerun()
+                        else:
+                            st.warning("Você precisa confirmar a exclusão marcando a caixa.")
+    st.markdown("---")
+    st.dataframe(categorias_df.rename(columns={'id': 'ID', 'nome': 'Nome da Categoria'}), use_container_width=True)
+
+# --- ABA 2: PRODUTOS PAI ---
+def _aba_produtos_pai(db):
+    """
+    Produtos Pai: cadastro, edição e exclusão.
+    """
+    produtos_pai_df = carregar_catalogo("produtos_pai")
+    categorias_df = carregar_catalogo("categorias")
+    categorias_dict = dict(zip(categorias_df["id"].tolist(), categorias_df["nome"].tolist()))
+    st.subheader("Gerenciar Produtos Pai")
+    add_prod_tab, edit_prod_tab, del_prod_tab = st.tabs(["Adicionar", "Editar", "Deletar"])
+
+    with add_prod_tab:
+        if not categorias_dict:
+            st.warning("Cadastre uma Categoria na primeira aba antes de adicionar um produto.")
+        else:
+            with st.form("novo_produto_form", clear_on_submit=True):
+                col1, col2 = st.columns(2)
+                with col1:
+                    id_produto = st.text_input("ID do Produto Pai*", placeholder="Ex: CABE-RIPA-7UNI")
+                    categoria_id_selecionada = st.selectbox("Categoria*", options=list(categorias_dict.keys()), format_func=lambda x: categorias_dict[x])
+                    quantidade_kit = st.number_input("Quantidade no Kit", min_value=1, step=1, value=1)
+                with col2:
+                    nome = st.text_input("Nome do Produto Pai*", placeholder="Ex: Cabeceira Ripa 7 uni")
+                    custo_unidade = st.number_input("Custo por Unidade (R$)", min_value=0.0, format="%.2f")
+                    custo_insumos = st.number_input("Custo dos Insumos (R$)", min_value=0.0, format="%.2f")
+
+                if st.form_submit_button("Salvar Novo Produto"):
+                    # VERIFICAÇÃO ADICIONADA
+                    if not id_produto.strip() or not nome.strip():
+                        st.warning("Os campos com * são obrigatórios.")
+                    else:
+                        if db.get(ProdutoPai, id_produto.strip()):
+                            st.error(f"ID '{id_produto}' já existe!")
+                        else:
+                            novo_produto = ProdutoPai(
+                                idProdutoPai=id_produto.strip(), nomeProdutoPai=nome.strip(),
+                                categoria_id=categoria_id_selecionada,
+                                custoUnidade=custo_unidade, quantidadeKit=quantidade_kit,
+                                custoInsumos=custo_insumos
+                            )
+                            db.add(novo_produto)
+                            db.commit()
+                            limpar_cache_custos()
+                            st.success("Produto Pai adicionado!")
+                            st.rerun()
+    with edit_prod_tab:
+        if produtos_pai_df.empty:
+            st.info("Nenhum produto para editar.")
+        elif not categorias_dict:
+            st.warning("Cadastre ao menos uma categoria primeiro.")
+        else:
+            produto_para_editar = _seletor_catalogo("Selecione o Produto para Editar", produtos_pai_df, "idProdutoPai", ["idProdutoPai", "nomeProdutoPai"], _formatar_produto, key="sel_edit_prod")
+            if produto_para_editar:
+                with st.form("edit_produto_form"):
+                    st.write(f"**Editando:** `{produto_para_editar['idProdutoPai']}`")
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        novo_nome = st.text_input("Nome do Produto Pai*", value=produto_para_editar["nomeProdutoPai"])
+                        cat_ids = list(categorias_dict.keys())
+                        current_cat_index = cat_ids.index(produto_para_editar["categoria_id"]) if produto_para_editar["categoria_id"] in cat_ids else 0
+                        nova_cat_id = st.selectbox("Categoria*", options=cat_ids, index=current_cat_index, format_func=lambda x: categorias_dict[x])
+                        nova_qtd_kit = st.number_input("Quantidade no Kit", value=int(produto_para_editar["quantidadeKit"]), min_value=1, step=1)
+                    with col2:
+                        novo_custo_unidade = st.number_input("Custo por Unidade (R$)", value=float(produto_para_editar["custoUnidade"]), format="%.2f")
+                        novo_custo_insumos = st.number_input("Custo dos Insumos (R$)", value=float(produto_para_editar["custoInsumos"]), format="%.2f")
+                        vigente_desde = st.date_input("Novo custo vale a partir de", value=date.today(), format="DD/MM/YYYY", help="Vendas a partir desta data são recalculadas com o novo custo; as anteriores mantêm o custo que estava vigente.")
+
+                    if st.form_submit_button("Atualizar Produto"):
+                        # VERIFICAÇÃO ADICIONADA
+                        if not novo_nome.strip():
+                            st.warning("O nome do produto é obrigatório.")
+                        else:
+                            produto_atualizar = db.get(ProdutoPai, produto_para_editar["idProdutoPai"])
+                            produto_atualizar.nomeProdutoPai = novo_nome.strip()
+                            produto_atualizar.categoria_id = nova_cat_id
+                            novos_custos = (novo_custo_unidade, nova_qtd_kit, novo_custo_insumos)
+                            if novos_custos != (produto_atualizar.custoUnidade, produto_atualizar.quantidadeKit, produto_atualizar.custoInsumos):
+                                # Custo novo: vira uma versão datada e as vendas afetadas são recalculadas na mesma transação
+                                resultado = alterar_custo_produto(db, produto_atualizar.idProdutoPai, vigente_desde, *novos_custos)
+                                st.session_state.msg_cadastro = (
+                                    f"Produto Pai atualizado! {resultado.linhas_alteradas} venda(s) recalculada(s); "
+                                    f"o lucro variou R$ {resultado.variacao_lucro:,.2f}."
+                                )
                             else:
-                                produto_atualizar = db.query(ProdutoPai).filter_by(idProdutoPai=produto_para_editar.idProdutoPai).first()
-                                produto_atualizar.nomeProdutoPai = novo_nome.strip()
-                                produto_atualizar.categoria_id = nova_cat_id
-                                produto_atualizar.custoUnidade = novo_custo_unidade
-                                produto_atualizar.quantidadeKit = nova_qtd_kit
-                                produto_atualizar.custoInsumos = novo_custo_insumos
-                                db.commit()
-                                st.success("Produto Pai atualizado!")
-                                st.rerun()
-            with del_prod_tab:
-                produtos_pai_del = db.query(ProdutoPai).all()
-                if not produtos_pai_del:
-                    st.info("Nenhum produto para deletar.")
-                else:
-                    with st.form("delete_produto_form"):
-                        produto_para_deletar = st.selectbox("Selecione o Produto para Deletar", options=produtos_pai_del, format_func=lambda p: f"{p.idProdutoPai} - {p.nomeProdutoPai}", key="del_prod")
-                        confirmacao = st.checkbox(f"Sim, eu confirmo que desejo deletar o produto '{produto_para_deletar.nomeProdutoPai}' e todos os seus SKUs associados.")
-                        if st.form_submit_button("Deletar Produto e SKUs"):
-                            if confirmacao:
-                                db.execute(delete(Variacao).where(Variacao.idProdutoPai == produto_para_deletar.idProdutoPai))
-                                db.execute(delete(ProdutoPai).where(ProdutoPai.idProdutoPai == produto_para_deletar.idProdutoPai))
                                 db.commit()
-                                st.success("Produto Pai e suas variações deletados!")
-                                st.rerun()
-                            else:
-                                st.warning("Você precisa confirmar a exclusão marcando a caixa.")
-
-            st.markdown("---")
-            produtos_pai_df = pd.read_sql(db.query(ProdutoPai).statement, db.bind).rename(columns={'idProdutoPai': 'ID Produto', 'nomeProdutoPai': 'Nome do Produto', 'custoUnidade': 'Custo Unid. (R$)', 'quantidadeKit': 'Qtd. Kit', 'custoInsumos': 'Insumos (R$)', 'categoria_id': 'ID Categoria'})
-            st.dataframe(produtos_pai_df, use_container_width=True)
-
-    # --- ABA 3: VARIAÇÕES (SKUs) ---
-    with tab_var:
-        st.subheader("Gerenciar Variações (SKUs)")
-        add_var_tab, edit_var_tab, del_var_tab = st.tabs(["Adicionar", "Editar", "Deletar"])
-        
-        with add_var_tab:
-            produtos_pai_lista = {p.idProdutoPai: p.nomeProdutoPai for p in db.query(ProdutoPai).all()}
-            if not produtos_pai_lista:
-                st.warning("Cadastre um Produto Pai primeiro.")
-            else:
+                                st.session_state.msg_cadastro = "Produto Pai atualizado!"
+                            st.rerun()
+                versoes = carregar_versoes_custo(produto_para_editar["idProdutoPai"])
+                if not versoes.empty:
+                    with st.expander(f"Histórico de custos ({len(versoes)} versões)"):
+                        versoes["vigenteDesde"] = versoes["vigenteDesde"].astype(str).replace(str(INICIO_VIGENCIA), "Desde o início")
+                        st.dataframe(versoes.rename(columns={'vigenteDesde': 'Vigente desde', 'custoUnidade': 'Custo Unid. (R$)', 'quantidadeKit': 'Qtd. Kit', 'custoInsumos': 'Insumos (R$)'}), hide_index=True, use_container_width=True)
+    with del_prod_tab:
+        if produtos_pai_df.empty:
+            st.info("Nenhum produto para deletar.")
+        else:
+            produto_para_deletar = _seletor_catalogo("Selecione o Produto para Deletar", produtos_pai_df, "idProdutoPai", ["idProdutoPai", "nomeProdutoPai"], _formatar_produto, key="del_prod")
+            if produto_para_deletar:
+                with st.form("delete_produto_form"):
+                    confirmacao = st.checkbox(f"Sim, eu confirmo que desejo deletar o produto '{produto_para_deletar['nomeProdutoPai']}' e todos os seus SKUs associados.")
+                    if st.form_submit_button("Deletar Produto e SKUs"):
+                        if confirmacao:
+                            db.execute(delete(Variacao).where(Variacao.idProdutoPai == produto_para_deletar["idProdutoPai"]))
+                            db.execute(delete(CustoProdutoPai).where(CustoProdutoPai.idProdutoPai == produto_para_deletar["idProdutoPai"]))
+                            db.execute(delete(ProdutoPai).where(ProdutoPai.idProdutoPai == produto_para_deletar["idProdutoPai"]))
+                            db.commit()
+                            limpar_cache_custos()
+                            st.success("Produto Pai e suas variações deletados!")
+                            st.rerun()
+                        else:
+                            st.warning("Você precisa confirmar a exclusão marcando a caixa.")
+
+    st.markdown("---")
+    st.dataframe(produtos_pai_df.rename(columns={'idProdutoPai': 'ID Produto', 'nomeProdutoPai': 'Nome do Produto', 'custoUnidade': 'Custo Unid. (R$)', 'quantidadeKit': 'Qtd. Kit', 'custoInsumos': 'Insumos (R$)', 'categoria_id': 'ID Categoria'}), use_container_width=True)
+
+# --- ABA 3: VARIAÇÕES (SKUs) ---
+def _aba_variacoes(db):
+    """
+    Variações (SKUs): cadastro, edição e exclusão.
+    """
+    variacoes_df = carregar_catalogo("variacoes")
+    produtos_pai_df = carregar_catalogo("produtos_pai")
+    st.subheader("Gerenciar Variações (SKUs)")
+    add_var_tab, edit_var_tab, del_var_tab = st.tabs(["Adicionar", "Editar", "Deletar"])
+
+    with add_var_tab:
+        if produtos_pai_df.empty:
+            st.warning("Cadastre um Produto Pai primeiro.")
+        else:
+            # Fora do formulário para que a busca atualize as opções na hora
+            produto_pai_selecionado = _seletor_catalogo("Associar ao Produto Pai*", produtos_pai_df, "idProdutoPai", ["idProdutoPai", "nomeProdutoPai"], _formatar_produto, key="add_var_pai")
+            if produto_pai_selecionado:
                 with st.form("nova_variacao_form", clear_on_submit=True):
                     sku_variacao = st.text_input("SKU da Variação*", placeholder="Ex: RIPADO-FREIJO-100UNI")
                     nome_variacao = st.text_input("Nome da Variação*", placeholder="Ex: Ripado Freijó 100 unidades")
-                    id_pai_selecionado = st.selectbox("Associar ao Produto Pai*", options=list(produtos_pai_lista.keys()), format_func=lambda x: f"{x} - {produtos_pai_lista[x]}")
                     if st.form_submit_button("Salvar Nova Variação"):
                         # VERIFICAÇÃO ADICIONADA
                         if not sku_variacao.strip() or not nome_variacao.strip():
                             st.warning("Os campos com * são obrigatórios.")
                         else:
-                            if db.query(Variacao).filter_by(skuVariacao=sku_variacao.strip()).first():
+                            if db.get(Variacao, sku_variacao.strip()):
                                 st.error(f"SKU '{sku_variacao}' já existe!")
                             else:
-                                db.add(Variacao(skuVariacao=sku_variacao.strip(), nomeVariacao=nome_variacao.strip(), idProdutoPai=id_pai_selecionado))
+                                db.add(Variacao(skuVariacao=sku_variacao.strip(), nomeVariacao=nome_variacao.strip(), idProdutoPai=produto_pai_selecionado["idProdutoPai"]))
                                 db.commit()
+                                limpar_cache_custos()
                                 st.success("Variação adicionada!")
                                 st.rerun()
-        with edit_var_tab:
-            variacoes_lista = db.query(Variacao).all()
-            if not variacoes_lista:
-                st.info("Nenhuma variação para editar.")
-            else:
-                variacao_para_editar = st.selectbox("Selecione a Variação para Editar", options=variacoes_lista, format_func=lambda v: f"{v.skuVariacao} - {v.nomeVariacao}", key="sel_edit_var")
+    with edit_var_tab:
+        if variacoes_df.empty:
+            st.info("Nenhuma variação para editar.")
+        else:
+            variacao_para_editar = _seletor_catalogo("Selecione a Variação para Editar", variacoes_df, "skuVariacao", ["skuVariacao", "nomeVariacao"], _formatar_variacao, key="sel_edit_var")
+            if variacao_para_editar:
                 with st.form("edit_variacao_form"):
-                    novo_nome_var = st.text_input("Novo Nome da Variação*", value=variacao_para_editar.nomeVariacao)
+                    novo_nome_var = st.text_input("Novo Nome da Variação*", value=variacao_para_editar["nomeVariacao"])
                     if st.form_submit_button("Atualizar Variação"):
                         # VERIFICAÇÃO ADICIONADA
                         if not novo_nome_var.strip():
                             st.warning("O nome da variação é obrigatório.")
                         else:
-                            var_atualizar = db.query(Variacao).filter_by(skuVariacao=variacao_para_editar.skuVariacao).first()
+                            var_atualizar = db.get(Variacao, variacao_para_editar["skuVariacao"])
                             var_atualizar.nomeVariacao = novo_nome_var.strip()
                             db.commit()
+                            limpar_cache_custos()
                             st.success("Variação atualizada!")
                             st.rerun()
-        with del_var_tab:
-            variacoes_lista_del = db.query(Variacao).all()
-            if not variacoes_lista_del:
-                st.info("Nenhuma variação para deletar.")
-            else:
+    with del_var_tab:
+        if variacoes_df.empty:
+            st.info("Nenhuma variação para deletar.")
+        else:
+            variacao_para_deletar = _seletor_catalogo("Selecione a Variação para Deletar", variacoes_df, "skuVariacao", ["skuVariacao", "nomeVariacao"], _formatar_variacao, key="del_var")
+            if variacao_para_deletar:
                 with st.form("delete_variacao_form"):
-                    variacao_para_deletar = st.selectbox("Selecione a Variação para Deletar", options=variacoes_lista_del, format_func=lambda v: f"{v.skuVariacao} - {v.nomeVariacao}", key="del_var")
-                    confirmacao = st.checkbox(f"Sim, eu confirmo que desejo deletar o SKU '{variacao_para_deletar.skuVariacao}'.")
+                    confirmacao = st.checkbox(f"Sim, eu confirmo que desejo deletar o SKU '{variacao_para_deletar['skuVariacao']}'.")
                     if st.form_submit_button("Deletar Variação"):
                         if confirmacao:
-                            db.execute(delete(Variacao).where(Variacao.skuVariacao == variacao_para_deletar.skuVariacao))
+                            db.execute(delete(Variacao).where(Variacao.skuVariacao == variacao_para_deletar["skuVariacao"]))
                             db.commit()
+                            limpar_cache_custos()
                             st.success("Variação deletada!")
                             st.rerun()
                         else:
                             st.warning("Você precisa confirmar a exclusão marcando a caixa.")
 
-        st.markdown("---")
-        variacoes_df = pd.read_sql(db.query(Variacao).statement, db.bind).rename(columns={'skuVariacao': 'SKU', 'nomeVariacao': 'Nome da Variação', 'idProdutoPai': 'ID Produto Pai'})
-        st.dataframe(variacoes_df, use_container_width=True)
-    
-    db.close()
\ No newline at end of file
+    st.markdown("---")
+    st.dataframe(variacoes_df.rename(columns={'skuVariacao': 'SKU', 'nomeVariacao': 'Nome da Variação', 'idProdutoPai': 'ID Produto Pai', 'grupoProduto': 'Grupo'}), use_container_width=True)
+
+# --- ABA 4: IMPORTAR / EXPORTAR ---
+def _aba_importar_exportar(db):
+    """
+    Catálogo inteiro de uma vez: exportação e importação por planilha.
+    """
+    st.subheader("Exportar Catálogo")
+    st.caption("Uma linha por SKU, com os dados do Produto Pai e da categoria. O arquivo exportado pode ser editado e importado de volta.")
+    col1, col2 = st.columns(2)
+    # A planilha só é gerada quando o botão é clicado
+    col1.download_button("⬇️ Exportar .xlsx", data=lambda: exportar_catalogo("xlsx"), file_name="catalogo.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", on_click="ignore")
+    col2.download_button("⬇️ Exportar .csv", data=lambda: exportar_catalogo("csv"), file_name="catalogo.csv", mime="text/csv", on_click="ignore")
+
+    st.markdown("---")
+    st.subheader("Importar Catálogo")
+    st.caption(f"Colunas: {', '.join(COLUNAS_PLANILHA_CATALOGO)}. Registros existentes (mesmo ID de produto ou SKU) são atualizados.")
+    arquivo = st.file_uploader("Planilha de catálogo (.xlsx ou .csv)", type=["xlsx", "csv"], key="cad_planilha_catalogo")
+    if arquivo:
+        catalogo = validar_catalogo(db, ler_planilha_catalogo(arquivo.getvalue(), arquivo.name))
+        if catalogo.erros:
+            st.error(f"A planilha tem {len(catalogo.erros)} erro(s). Nada foi gravado.")
+            st.dataframe({"Erro": catalogo.erros}, use_container_width=True)
+        else:
+            st.info(f"Planilha válida: {len(catalogo.categorias)} categorias, {len(catalogo.produtos)} produtos pai e {len(catalogo.variacoes)} SKUs.")
+            if st.button("💾 Gravar Catálogo"):
+                resultado = gravar_catalogo(db, catalogo)
+                st.success(
+                    f"Catálogo gravado! Categorias novas: {resultado.categorias_novas}. "
+                    f"Produtos: {resultado.produtos_novos} novos, {resultado.produtos_atualizados} atualizados. "
+                    f"SKUs: {resultado.variacoes_novas} novos, {resultado.variacoes_atualizadas} atualizados."
+                    + (f" {resultado.linhas_recalculadas} venda(s) recalculada(s); o lucro variou R$ {resultado.variacao_lucro:,.2f}." if resultado.linhas_recalculadas else "")
+                )
+
+def page_cadastros_gerais():
+    st.header("⚙️ Cadastros Gerais (Categorias, Produtos e SKUs)")
+    if 'msg_cadastro' in st.session_state:
+        st.success(st.session_state.msg_cadastro)
+        del st.session_state.msg_cadastro
+    # Usar 'with' garante que a sessão do banco de dados seja fechada corretamente
+    with sessao_banco() as db:
+        # Abas com estado: só a aba aberta é montada (e só ela consulta o banco)
+        tab_cat, tab_prod, tab_var, tab_planilha = st.tabs(["🏷️ Categorias", "🧩 Produtos Pai", "🎨 Variações (SKUs)", "📦 Importar / Exportar"], key="cad_aba", on_change="rerun")
+        for aba, montar_aba in ((tab_cat, _aba_categorias), (tab_prod, _aba_produtos_pai), (tab_var, _aba_variacoes), (tab_planilha, _aba_importar_exportar)):
+            if aba.open:
+                with aba, etapa(montar_aba.__name__.lstrip("_").replace("_", " ")):
+                    montar_aba(db)
@@ -1,77 +1,86 @@
 # pages/dashboard.py
+import math
 import streamlit as st
-import pandas as pd
-from database import SessionLocal, Categoria, ProdutoPai, Variacao, LancamentosVendas
+from database import sessao_banco
+from utils.consultas import FiltrosVendas, consultar_opcoes_filtros, consultar_pagina_lancamentos, contar_lancamentos
+from utils.cubo import carregar_cubo_vendas
+from utils.instrumentacao import etapa
 
 def page_dashboard():
     st.header("📊 Dashboard de Análise de Vendas")
-    db_gen = SessionLocal(); db = db_gen
+    with sessao_banco() as db:
+        try:
+            with etapa("opções dos filtros"):
+                opcoes = consultar_opcoes_filtros(db)
+        except Exception:
+            st.info("Ainda não há dados de vendas. Importe um arquivo na página 'Importar Vendas'.")
+            return
 
-    try:
-        vendas_df = pd.read_sql(db.query(LancamentosVendas).statement, db.bind)
-        variacoes_df = pd.read_sql(db.query(Variacao).statement, db.bind)
-        produtos_pai_df = pd.read_sql(db.query(ProdutoPai).statement, db.bind)
-        categorias_df = pd.read_sql(db.query(Categoria).statement, db.bind)
-    except Exception:
-        st.info("Ainda não há dados de vendas. Importe um arquivo na página 'Importar Vendas'.")
-        return
-    finally:
-        db.close()
+        if opcoes["data_min"] is None:
+            st.info("Nenhuma venda processada ainda. Importe um arquivo na página 'Importar Vendas'.")
+            return
 
-    if vendas_df.empty:
-        st.info("Nenhuma venda processada ainda. Importe um arquivo na página 'Importar Vendas'.")
-        return
+        st.sidebar.header("Filtros do Dashboard")
+        
+        plataformas_selecionadas = st.sidebar.multiselect("Filtrar por Plataforma", options=opcoes["plataformas"], key="dash_platform_filter")
+        
+        categorias_dict = opcoes["categorias"]
+        categorias_selecionadas = st.sidebar.multiselect("Filtrar por Categoria", options=list(categorias_dict.keys()), format_func=lambda x: categorias_dict[x], key="dash_cat_filter")
+        
+        min_date = opcoes["data_min"]; max_date = opcoes["data_max"]
+        date_range = st.sidebar.date_input("Selecione o Período", (min_date, max_date), min_value=min_date, max_value=max_date, key="dash_date_filter")
+        
+        filtros = FiltrosVendas(
+            plataformas=tuple(plataformas_selecionadas), categorias=tuple(categorias_selecionadas),
+            data_inicio=date_range[0] if len(date_range) == 2 else None,
+            data_fim=date_range[1] if len(date_range) == 2 else None,
+        )
 
-    dados_completos = pd.merge(vendas_df, variacoes_df, left_on='skuVenda', right_on='skuVariacao')
-    dados_completos = pd.merge(dados_completos, produtos_pai_df, on='idProdutoPai')
-    dados_completos = pd.merge(dados_completos, categorias_df, left_on='categoria_id', right_on='id', suffixes=('', '_cat'))
-    dados_completos['dataPedido'] = pd.to_datetime(dados_completos['dataPedido'])
-    
-    st.sidebar.header("Filtros do Dashboard")
-    
-    plataformas_disponiveis = dados_completos['plataforma'].unique()
-    plataformas_selecionadas = st.sidebar.multiselect("Filtrar por Plataforma", options=plataformas_disponiveis, key="dash_platform_filter")
-    
-    categorias_dict = {cat.id: cat.nome for _, cat in categorias_df.iterrows()}
-    categorias_selecionadas = st.sidebar.multiselect("Filtrar por Categoria", options=list(categorias_dict.keys()), format_func=lambda x: categorias_dict[x], key="dash_cat_filter")
-    
-    min_date = dados_completos['dataPedido'].min().date(); max_date = dados_completos['dataPedido'].max().date()
-    date_range = st.sidebar.date_input("Selecione o Período", (min_date, max_date), min_value=min_date, max_value=max_date, key="dash_date_filter")
-    
-    vendas_filtradas = dados_completos.copy()
-    if plataformas_selecionadas: vendas_filtradas = vendas_filtradas[vendas_filtradas['plataforma'].isin(plataformas_selecionadas)]
-    if categorias_selecionadas: vendas_filtradas = vendas_filtradas[vendas_filtradas['categoria_id'].isin(categorias_selecionadas)]
-    if len(date_range) == 2:
-        start_date, end_date = date_range
-        vendas_filtradas = vendas_filtradas[(vendas_filtradas['dataPedido'].dt.date >= start_date) & (vendas_filtradas['dataPedido'].dt.date <= end_date)]
+        # Os totais saem do cubo em memória (montado uma vez por versão dos dados): mudar um filtro não consulta o banco
+        with etapa("KPIs"):
+            kpis = carregar_cubo_vendas().kpis(filtros)
+        if kpis["itens"] == 0:
+            st.warning("Nenhum dado encontrado para os filtros selecionados."); return
 
-    if vendas_filtradas.empty:
-        st.warning("Nenhum dado encontrado para os filtros selecionados."); return
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Receita Bruta", f"R$ {kpis['receita_bruta']:,.2f}"); col2.metric("Gasto Total", f"R$ {kpis['gasto_total']:,.2f}", help="Custo dos Produtos + Insumos")
+        col3.metric("Lucro Líquido", f"R$ {kpis['lucro']:,.2f}"); col4.metric("Total de Pedidos", f"{kpis['pedidos']}")
+        
+        st.markdown("---")
+        st.subheader("📄 Detalhamento de Lançamentos")
+        col_busca, col_ordem, col_tamanho = st.columns([3, 1, 1])
+        busca = col_busca.text_input("Buscar por SKU ou pedido", key="dash_busca")
+        ordem = col_ordem.selectbox("Ordenar por data", ["Mais recentes", "Mais antigas"], key="dash_ordem")
+        por_pagina = col_tamanho.selectbox("Linhas por página", [25, 50, 100, 200], index=1, key="dash_por_pagina")
 
-    receita_total_bruta = (vendas_filtradas['receitaBrutaProduto'] * vendas_filtradas['quantidade']).sum()
-    custo_produto_total = (vendas_filtradas['custoTotalCalculado'] * vendas_filtradas['quantidade']).sum()
-    taxas_total = vendas_filtradas['taxasMarketplace'].sum()
-    cupons_total = vendas_filtradas['totalCupons'].sum()
-    gasto_total = custo_produto_total + taxas_total + cupons_total
-    lucro_total = vendas_filtradas['lucroLiquidoReal'].sum()
-    pedidos_total = vendas_filtradas['pedidoId'].nunique()
+        # Paginação por chave: guarda o cursor (dataPedido, id) de início de cada página visitada
+        assinatura = (filtros, busca, ordem, por_pagina)
+        if st.session_state.get("dash_detalhe_assinatura") != assinatura:
+            st.session_state.dash_detalhe_assinatura = assinatura
+            st.session_state.dash_cursores = [None]
+        cursores = st.session_state.dash_cursores
 
-    col1, col2, col3, col4 = st.columns(4)
-    col1.metric("Receita Bruta", f"R$ {receita_total_bruta:,.2f}"); col2.metric("Gasto Total", f"R$ {gasto_total:,.2f}", help="Custo dos Produtos + Insumos")
-    col3.metric("Lucro Líquido", f"R$ {lucro_total:,.2f}"); col4.metric("Total de Pedidos", f"{pedidos_total}")
-    
-    st.markdown("---")
-    st.subheader("📄 Detalhamento de Lançamentos")
-    df_detalhado = vendas_filtradas.copy()
-    df_detalhado['Receita Bruta Total'] = df_detalhado['receitaBrutaProduto'] * df_detalhado['quantidade']
-    df_detalhado['Custo Total Produto'] = df_detalhado['custoTotalCalculado'] * df_detalhado['quantidade']
-    df_final_para_exibir = df_detalhado.rename(columns={'dataPedido': 'Data', 'plataforma': 'Plataforma', 'nomeVariacao': 'Variação', 'totalCupons': 'Cupons', 'taxasMarketplace': 'Taxas', 'valorVendaLiquido': 'Venda Líquida', 'lucroLiquidoReal': 'Lucro Líquido'})
+        with etapa("detalhamento: consulta"):
+            total_linhas = contar_lancamentos(db, filtros, busca)
+            pagina = consultar_pagina_lancamentos(db, filtros, busca, apos=cursores[-1], decrescente=(ordem == "Mais recentes"), limite=por_pagina)
 
-    st.dataframe(
-        df_final_para_exibir[['Data', 'Plataforma', 'Variação', 'Receita Bruta Total', 'Cupons', 'Taxas', 'Venda Líquida', 'Custo Total Produto', 'Lucro Líquido']].style.format({
-            'Receita Bruta Total': 'R$ {:,.2f}', 'Cupons': 'R$ {:,.2f}', 'Taxas': 'R$ {:,.2f}',
-            'Venda Líquida': 'R$ {:,.2f}', 'Custo Total Produto': 'R$ {:,.2f}', 'Lucro Líquido': 'R$ {:,.2f}',
-            'Data': '{:%d/%m/%Y %H:%M}'
-        }),
-        use_container_width=True
-    )
\ No newline at end of file
+    total_paginas = max(1, math.ceil(total_linhas / por_pagina))
+    ultima_chave = (pagina['dataPedido'].iloc[-1].to_pydatetime(), int(pagina['id'].iloc[-1])) if not pagina.empty else None
+
+    # Só a página visível é formatada
+    df_final_para_exibir = pagina.rename(columns={'dataPedido': 'Data', 'pedidoId': 'Pedido', 'plataforma': 'Plataforma', 'skuVenda': 'SKU', 'nomeVariacao': 'Variação', 'receitaBrutaTotal': 'Receita Bruta Total', 'totalCupons': 'Cupons', 'taxasMarketplace': 'Taxas', 'valorVendaLiquido': 'Venda Líquida', 'custoTotalProduto': 'Custo Total Produto', 'lucroLiquidoReal': 'Lucro Líquido'})
+
+    with etapa("detalhamento: tabela"):
+        st.dataframe(
+            df_final_para_exibir[['Data', 'Pedido', 'Plataforma', 'SKU', 'Variação', 'Receita Bruta Total', 'Cupons', 'Taxas', 'Venda Líquida', 'Custo Total Produto', 'Lucro Líquido']].style.format({
+                'Receita Bruta Total': 'R$ {:,.2f}', 'Cupons': 'R$ {:,.2f}', 'Taxas': 'R$ {:,.2f}',
+                'Venda Líquida': 'R$ {:,.2f}', 'Custo Total Produto': 'R$ {:,.2f}', 'Lucro Líquido': 'R$ {:,.2f}',
+                'Data': '{:%d/%m/%Y %H:%M}'
+            }),
+            use_container_width=True, hide_index=True
+        )
+
+    col_anterior, col_info, col_proxima = st.columns([1, 3, 1])
+    col_anterior.button("◀ Anterior", disabled=len(cursores) == 1, on_click=cursores.pop, key="dash_pagina_anterior")
+    col_info.caption(f"Página {len(cursores)} de {total_paginas} · {total_linhas:,} lançamentos")
+    col_proxima.button("Próxima ▶", disabled=len(cursores) >= total_paginas or ultima_chave is None, on_click=cursores.append, args=(ultima_chave,), key="dash_pagina_proxima")
\ No newline at end of file
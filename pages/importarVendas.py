@@ -1,99 +1,104 @@
 # pages/importarVendas.py
-import streamlit as st
+import zlib
 import pandas as pd
-from database import SessionLocal, Variacao, LancamentosVendas, ProdutoPai # <-- IMPORT CORRIGIDO
-from utils.helpers import calcular_custo_pelo_produto_pai
+import streamlit as st
+from database import sessao_banco
+from utils.catalogo import carregar_catalogo, gravar_catalogo, validar_catalogo
+from utils.helpers import resolver_custos_skus
+from utils.importacao import LIMITE_BYTES_STREAMING, ler_amostra_planilha
+from utils.instrumentacao import etapa
+from utils.plataformas import PLATAFORMA_GENERICA, detectar_parser, ler_cabecalho, listar_plataformas, obter_parser
+from utils.trabalhos import EXECUTANDO, PENDENTES, ROTULOS_STATUS, enviar_importacao, listar_trabalhos
 
-def page_importar_vendas():
-    st.header("📥 Importar e Processar Vendas")
+# Intervalo entre as consultas de andamento enquanto houver importação pendente
+INTERVALO_ATUALIZACAO = 2
+
+def _configurar_arquivo(arquivo, indice: int, mostrar_previa: bool):
+    """
+    Detecta e confirma a plataforma de um arquivo enviado. Devolve (conteúdo, plataforma), ou None se o
+    arquivo não estiver no formato da plataforma escolhida.
+    """
+    conteudo = arquivo.getvalue()
+    # Só o cabeçalho é lido aqui: um arquivo de formato errado é recusado antes de carregar as linhas
+    cabecalho = ler_cabecalho(conteudo, arquivo.name)
+    parser_detectado = detectar_parser(cabecalho)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        if parser_detectado: st.success(f"**{arquivo.name}**: plataforma detectada **{parser_detectado.nome}**")
+        else: st.warning(f"**{arquivo.name}**: não foi possível detectar a plataforma automaticamente.")
+    with col2:
+        plataformas_disponiveis = listar_plataformas()
+        indice_plataforma = plataformas_disponiveis.index(parser_detectado.nome if parser_detectado else PLATAFORMA_GENERICA)
+        plataforma_selecionada = st.selectbox("Confirme ou selecione a plataforma", options=plataformas_disponiveis, index=indice_plataforma, key=f"plataforma_arquivo_{indice}_{arquivo.name}")
 
-    def detectar_plataforma(colunas):
-        colunas_set = set(colunas)
-        if {'ID do pedido', 'Taxa de comissão', 'Taxa de serviço'}.issubset(colunas_set):
-            return "Shopee"
+    parser = obter_parser(plataforma_selecionada)
+    colunas_faltantes = parser.colunas_faltantes(cabecalho)
+    if colunas_faltantes:
+        st.error(f"O arquivo não está no formato '{plataforma_selecionada}'. Colunas obrigatórias ausentes: {', '.join(colunas_faltantes)}")
         return None
+    if mostrar_previa:
+        # A leitura completa fica para o processo de importação: aqui só as primeiras linhas
+        df_amostra = ler_amostra_planilha(conteudo, nome_arquivo=arquivo.name)
+        st.write("Pré-visualização simplificada:")
+        st.dataframe(df_amostra[[col for col in parser.mapa_colunas.keys() if col in df_amostra.columns]])
+    return conteudo, plataforma_selecionada
 
-    if 'uploaded_file' not in st.session_state: st.session_state.uploaded_file = None
-    if 'skus_nao_encontrados' not in st.session_state: st.session_state.skus_nao_encontrados = []
-    
-    uploaded_file = st.file_uploader("Escolha seu arquivo de vendas (.xlsx)", type="xlsx")
+def _painel_trabalhos(havia_pendentes: bool):
+    """
+    Andamento das importações recentes. Roda como fragmento, atualizado a cada INTERVALO_ATUALIZACAO
+    segundos enquanto houver trabalho pendente.
+    """
+    with sessao_banco() as db:
+        trabalhos = listar_trabalhos(db)
+    pendentes = trabalhos[trabalhos["status"].isin(PENDENTES)]
+    if havia_pendentes and pendentes.empty:
+        # Terminou tudo: a página inteira é refeita para parar a atualização e mostrar os SKUs faltantes
+        st.rerun()
+    if trabalhos.empty:
+        return
 
-    if uploaded_file:
-        st.session_state.uploaded_file = uploaded_file
-        st.session_state.skus_nao_encontrados = []
+    st.subheader("Importações recentes")
+    for trabalho in pendentes.itertuples():
+        if trabalho.status == EXECUTANDO and trabalho.totalLinhas:
+            fracao = min(trabalho.linhasProcessadas / trabalho.totalLinhas, 1.0)
+            st.progress(fracao, text=f"{trabalho.nomeArquivo}: {trabalho.linhasProcessadas:,} de {trabalho.totalLinhas:,.0f} linhas")
+        else:
+            st.progress(0.0, text=f"{trabalho.nomeArquivo}: {ROTULOS_STATUS[trabalho.status].lower()}...")
+    duracao = (trabalhos["concluidoEm"] - trabalhos["iniciadoEm"]).dt.total_seconds()
+    st.dataframe(pd.DataFrame({
+        "Arquivo": trabalhos["nomeArquivo"], "Plataforma": trabalhos["plataforma"],
+        "Status": trabalhos["status"].map(ROTULOS_STATUS), "Linhas": trabalhos["linhasProcessadas"],
+        "Itens salvos": trabalhos["itensSalvos"], "Pedidos novos": trabalhos["pedidosNovos"], "Duplicados": trabalhos["itensDuplicados"],
+        "SKUs não encontrados": trabalhos["skusNaoEncontrados"].map(len), "Enviado em": trabalhos["criadoEm"],
+        "Duração (s)": duracao.round(1), "Erro": trabalhos["erro"],
+    }), hide_index=True, use_container_width=True, column_config={"Enviado em": st.column_config.DatetimeColumn(format="DD/MM/YYYY HH:mm:ss")})
 
-    if st.session_state.uploaded_file is not None:
-        try:
-            db_gen = SessionLocal(); db = db_gen
-            df_shopee = pd.read_excel(st.session_state.uploaded_file, dtype=str)
-            df_shopee.columns = df_shopee.columns.str.strip()
-            
-            plataforma_detectada = detectar_plataforma(df_shopee.columns)
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                if plataforma_detectada: st.success(f"Plataforma detectada: **{plataforma_detectada}**")
-                else: st.warning("Não foi possível detectar a plataforma automaticamente.")
-            with col2:
-                plataformas_disponiveis = ["Shopee", "Mercado Livre", "Shein", "Outra"]
-                indice_plataforma = plataformas_disponiveis.index(plataforma_detectada) if plataforma_detectada in plataformas_disponiveis else 3
-                plataforma_selecionada = st.selectbox("Confirme ou selecione a plataforma", options=plataformas_disponiveis, index=indice_plataforma)
+def page_importar_vendas():
+    st.header("📥 Importar e Processar Vendas")
 
-            mapa_colunas = {
-                "ID do pedido": "pedidoId", "Data de criação do pedido": "dataPedido",
-                "Número de referência SKU": "skuVenda", "Quantidade": "quantidade",
-                "Preço acordado": "receitaBrutaProduto", "Taxa de comissão": "taxaComissao",
-                "Taxa de serviço": "taxaServico", "Taxa de transação": "taxaTransacao",
-                "Cupom do vendedor": "cupomVendedor", "Cupom Shopee": "cupomShopee",
-                "Reembolso Shopee": "reembolsoShopee"
-            }
-            
-            colunas_relevantes = [col for col in mapa_colunas.keys() if col in df_shopee.columns]
-            df_preview = df_shopee[colunas_relevantes]
-            st.write("Pré-visualização simplificada:")
-            st.dataframe(df_preview.head())
+    arquivos = st.file_uploader("Escolha seus arquivos de vendas (.xlsx ou .csv)", type=["xlsx", "csv"], accept_multiple_files=True)
 
-            if st.button("🚀 Processar Vendas"):
-                with st.spinner("Processando..."):
-                    df_vendas = df_shopee.rename(columns=mapa_colunas)
-                    colunas_numericas = ['quantidade', 'receitaBrutaProduto', 'taxaComissao', 'taxaServico', 'taxaTransacao', 'cupomVendedor', 'cupomShopee', 'reembolsoShopee']
-                    for col in colunas_numericas:
-                        if col not in df_vendas.columns: df_vendas[col] = 0
-                        df_vendas[col] = pd.to_numeric(df_vendas[col], errors='coerce').fillna(0)
-                    df_vendas["taxasMarketplace"] = df_vendas["taxaComissao"] + df_vendas["taxaServico"] + df_vendas["taxaTransacao"]
-                    df_vendas["totalCupons"] = df_vendas["cupomVendedor"] + df_vendas["cupomShopee"] + df_vendas["reembolsoShopee"]
-                    novos_lancamentos, skus_nao_encontrados, vendas_duplicadas = [], [], 0
-                    ids_existentes = {str(id[0]) for id in db.query(LancamentosVendas.pedidoId).all()}
+    if arquivos:
+        try:
+            envios = []
+            with etapa("cabeçalhos e prévia dos arquivos"):
+                for indice, arquivo in enumerate(arquivos):
+                    configurado = _configurar_arquivo(arquivo, indice, mostrar_previa=len(arquivos) == 1)
+                    if configurado:
+                        envios.append((arquivo.name, *configurado))
+
+            if envios:
+                modo_streaming = st.checkbox("Modo streaming (arquivos muito grandes)", value=any(len(conteudo) > LIMITE_BYTES_STREAMING for _, conteudo, _ in envios), help="Lê e grava cada arquivo em blocos, com memória constante. Cada bloco é salvo separadamente.")
+                if st.button("🚀 Processar Vendas"):
+                    # A importação roda em segundo plano: a página só acompanha o andamento
+                    with etapa("envio para a fila"):
+                        for nome_arquivo, conteudo, plataforma in envios:
+                            enviar_importacao(conteudo, nome_arquivo, plataforma, modo_streaming=modo_streaming)
+                    st.session_state.msg_sucesso = f"📨 {len(envios)} arquivo(s) enviado(s) para importação. Acompanhe o andamento abaixo; pode sair desta página ou fechar o navegador."
 
-                    for _, venda in df_vendas.iterrows():
-                        pedido_id, sku = str(venda.get('pedidoId')), venda.get('skuVenda')
-                        if pedido_id in ids_existentes: vendas_duplicadas += 1; continue
-                        custo_do_kit = calcular_custo_pelo_produto_pai(db, sku)
-                        if custo_do_kit is not None: novos_lancamentos.append(venda)
-                        elif sku and sku not in skus_nao_encontrados: skus_nao_encontrados.append(sku)
-                    
-                    lancamentos_para_salvar = []
-                    pedidos_unicos = set()
-                    for venda in novos_lancamentos:
-                        custo_do_kit = calcular_custo_pelo_produto_pai(db, venda['skuVenda'])
-                        receita_bruta_total = venda['receitaBrutaProduto'] * venda['quantidade']
-                        custo_total_produtos = custo_do_kit * venda['quantidade']
-                        valor_venda_liquido = receita_bruta_total - venda['totalCupons'] - venda['taxasMarketplace']
-                        lucro_liquido = valor_venda_liquido - custo_total_produtos
-                        pedidos_unicos.add(venda['pedidoId'])
-                        lancamentos_para_salvar.append(LancamentosVendas(pedidoId=venda['pedidoId'], dataPedido=pd.to_datetime(venda['dataPedido']), plataforma=plataforma_selecionada, skuVenda=venda['skuVenda'], quantidade=int(venda['quantidade']), receitaBrutaProduto=venda['receitaBrutaProduto'], totalCupons=venda['totalCupons'], taxasMarketplace=venda['taxasMarketplace'], valorVendaLiquido=valor_venda_liquido, custoTotalCalculado=custo_do_kit, lucroLiquidoReal=lucro_liquido))
-                    
-                    if lancamentos_para_salvar:
-                        db.add_all(lancamentos_para_salvar); db.commit()
-                        st.session_state.msg_sucesso = f"✅ {len(pedidos_unicos)} novos pedidos ({len(lancamentos_para_salvar)} itens) da plataforma '{plataforma_selecionada}' foram processados e salvos!"
-                    if vendas_duplicadas > 0: st.session_state.msg_info = f"ℹ️ {vendas_duplicadas} itens de pedidos já existentes foram ignorados."
-                    st.session_state.skus_nao_encontrados = skus_nao_encontrados
-                    # st.rerun() # REMOVIDO PARA AS MENSAGENS PERSISTIREM
-            
         except Exception as e:
             st.error(f"Ocorreu um erro ao processar o arquivo: {e}")
-        finally:
-            db.close()
 
     # Mostra as mensagens de sucesso/info se existirem
     if 'msg_sucesso' in st.session_state:
@@ -102,34 +107,53 @@ def page_importar_vendas():
     if 'msg_info' in st.session_state:
         st.info(st.session_state.msg_info)
         del st.session_state.msg_info # Limpa para não mostrar de novo
+    if 'msg_erro' in st.session_state:
+        st.error(st.session_state.msg_erro)
+        del st.session_state.msg_erro
+
+    with sessao_banco() as db, etapa("trabalhos e SKUs sem cadastro"):
+        trabalhos = listar_trabalhos(db)
+        # SKUs sem cadastro nas importações recentes, descartando os que já foram cadastrados (aqui ou em Cadastros Gerais)
+        skus_recentes = list(dict.fromkeys(sku for skus in trabalhos["skusNaoEncontrados"] for sku in skus))
+        _, skus_desconhecidos = resolver_custos_skus(db, skus_recentes)
+    havia_pendentes = bool(trabalhos["status"].isin(PENDENTES).any())
+    st.fragment(run_every=INTERVALO_ATUALIZACAO if havia_pendentes else None)(_painel_trabalhos)(havia_pendentes)
 
     # Seção para adicionar SKUs faltantes
-    if st.session_state.skus_nao_encontrados:
-        skus_faltantes = st.session_state.skus_nao_encontrados
-        st.warning(f"ALERTA: {len(skus_faltantes)} SKUs da sua planilha não foram encontrados ou não estão associados a um Produto Pai com custo definido.")
-        with st.expander("➕ Adicionar SKUs Faltantes Rapidamente"):
-            db_gen = SessionLocal(); db = db_gen
-            produtos_pai_lista = {p.idProdutoPai: p.nomeProdutoPai for p in db.query(ProdutoPai).all()}
-            if not produtos_pai_lista:
+    skus_faltantes = [sku for sku in skus_recentes if sku in skus_desconhecidos]
+    if skus_faltantes:
+        st.warning(f"ALERTA: {len(skus_faltantes)} SKUs das importações recentes não foram encontrados ou não estão associados a um Produto Pai com custo definido. As vendas desses SKUs não foram gravadas: depois de cadastrá-los, importe o arquivo de novo.")
+        with st.expander("➕ Cadastrar SKUs Faltantes em Lote", expanded=True):
+            produtos_pai_df = carregar_catalogo("produtos_pai")
+            if produtos_pai_df.empty:
                 st.error("Nenhum 'Produto Pai' cadastrado. Vá para 'Cadastros Gerais' para criar um antes de adicionar SKUs.")
             else:
-                for sku in skus_faltantes:
-                    with st.form(f"form_add_{sku}", clear_on_submit=True):
-                        st.markdown(f"**Cadastrar SKU:** `{sku}`")
-                        nome_variacao = st.text_input("Nome da Variação*", key=f"nome_{sku}")
-                        id_pai_selecionado = st.selectbox("Associar ao Produto Pai*", options=list(produtos_pai_lista.keys()), format_func=lambda x: f"{x} - {produtos_pai_lista[x]}", key=f"pai_{sku}")
-                        if st.form_submit_button(f"Salvar SKU {sku}"):
-                            if not nome_variacao:
-                                st.warning("O nome da variação é obrigatório.")
-                            else:
-                                db_commit_gen = SessionLocal(); db_commit = db_commit_gen
-                                if db_commit.query(Variacao).filter_by(skuVariacao=sku).first():
-                                    st.error(f"O SKU '{sku}' já existe no banco de dados.")
+                nomes_produtos = dict(zip(produtos_pai_df["idProdutoPai"].tolist(), produtos_pai_df["nomeProdutoPai"].tolist()))
+                st.caption("Escolha o Produto Pai de cada SKU (é possível colar uma coluna inteira). Linhas sem Produto Pai ficam para depois.")
+                grade = pd.DataFrame({"skuVariacao": skus_faltantes, "nomeVariacao": skus_faltantes, "idProdutoPai": None})
+                # A chave muda com a lista: quando outra importação termina, a grade recomeça em vez de reaplicar edições em linhas trocadas
+                chave_grade = f"grade_skus_faltantes_{zlib.crc32(chr(0).join(skus_faltantes).encode())}"
+                with st.form("form_skus_faltantes"):
+                    grade_editada = st.data_editor(
+                        grade, key=chave_grade, hide_index=True, use_container_width=True, disabled=["skuVariacao"],
+                        column_config={
+                            "skuVariacao": st.column_config.TextColumn("SKU"),
+                            "nomeVariacao": st.column_config.TextColumn("Nome da Variação*"),
+                            "idProdutoPai": st.column_config.SelectboxColumn("Produto Pai*", options=list(nomes_produtos), format_func=lambda x: f"{x} - {nomes_produtos[x]}"),
+                        },
+                    )
+                    if st.form_submit_button("💾 Salvar SKUs mapeados"):
+                        mapeados = grade_editada.dropna(subset=["idProdutoPai"])
+                        if mapeados.empty:
+                            st.warning("Escolha o Produto Pai de pelo menos um SKU.")
+                        else:
+                            with sessao_banco() as db:
+                                catalogo = validar_catalogo(db, mapeados)
+                                if catalogo.erros:
+                                    st.error("Corrija os SKUs abaixo antes de salvar:\n\n" + "\n".join(f"- {erro}" for erro in catalogo.erros))
                                 else:
-                                    db_commit.add(Variacao(skuVariacao=sku, nomeVariacao=nome_variacao, idProdutoPai=id_pai_selecionado))
-                                    db_commit.commit()
-                                    st.success(f"SKU '{sku}' salvo com sucesso!")
-                                    st.session_state.skus_nao_encontrados.remove(sku)
+                                    resultado = gravar_catalogo(db, catalogo)
+                                    st.session_state.msg_sucesso = f"✅ {resultado.variacoes_novas + resultado.variacoes_atualizadas} SKUs cadastrados."
+                                    # A grade é montada de novo só com os SKUs que faltam
+                                    del st.session_state[chave_grade]
                                     st.rerun()
-                                db_commit.close()
-            db.close()
\ No newline at end of file
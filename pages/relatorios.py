@@ -1,72 +1,60 @@
 # pages/relatorios.py
 import streamlit as st
-import pandas as pd
-from database import SessionLocal, Categoria, ProdutoPai, Variacao, LancamentosVendas
-import re
+from database import sessao_banco
+from utils.consultas import (
+    GRANULARIDADES, LIMITE_CLASSE_A, LIMITE_CLASSE_B, MAX_PONTOS_GRAFICO, FiltrosVendas,
+    consultar_curva_abc, consultar_opcoes_filtros, consultar_tendencia,
+)
+from utils.cubo import carregar_cubo_vendas
+from utils.instrumentacao import etapa
 
 def page_relatorios():
     st.header("📈 Relatórios de Vendas")
-    db_gen = SessionLocal(); db = db_gen
-
-    try:
-        vendas_df = pd.read_sql(db.query(LancamentosVendas).statement, db.bind)
-        variacoes_df = pd.read_sql(db.query(Variacao).statement, db.bind)
-        produtos_pai_df = pd.read_sql(db.query(ProdutoPai).statement, db.bind)
-        categorias_df = pd.read_sql(db.query(Categoria).statement, db.bind)
-    except Exception:
-        st.info("Ainda não há dados de vendas para gerar relatórios."); return
-    finally:
-        db.close()
-
-    if vendas_df.empty:
-        st.info("Nenhuma venda processada ainda para gerar relatórios."); return
-
-    dados_completos = pd.merge(vendas_df, variacoes_df, left_on='skuVenda', right_on='skuVariacao')
-    dados_completos = pd.merge(dados_completos, produtos_pai_df, on='idProdutoPai')
-    # Renomeia a coluna 'nome' da categoria para evitar conflito antes do merge
-    categorias_df = categorias_df.rename(columns={'nome': 'nome_categoria'})
-    dados_completos = pd.merge(dados_completos, categorias_df, left_on='categoria_id', right_on='id')
-    dados_completos['dataPedido'] = pd.to_datetime(dados_completos['dataPedido'])
-    
-    st.sidebar.header("Filtros do Relatório")
-    
-    plataformas_disponiveis = dados_completos['plataforma'].unique()
-    plataformas_selecionadas_report = st.sidebar.multiselect("Filtrar por Plataforma", options=plataformas_disponiveis, key="report_platform_filter")
+    with sessao_banco() as db:
+        try:
+            with etapa("opções dos filtros"):
+                opcoes = consultar_opcoes_filtros(db)
+        except Exception:
+            st.info("Ainda não há dados de vendas para gerar relatórios.")
+            return
 
-    categorias_dict = {cat.id: cat.nome_categoria for _, cat in categorias_df.iterrows()}
-    categorias_selecionadas = st.sidebar.multiselect("Filtrar por Categoria", options=list(categorias_dict.keys()), format_func=lambda x: categorias_dict[x], key="report_cat_filter")
-    
-    min_date = dados_completos['dataPedido'].min().date(); max_date = dados_completos['dataPedido'].max().date()
-    date_range = st.sidebar.date_input("Selecione o Período", (min_date, max_date), min_value=min_date, max_value=max_date, key="report_date_filter")
+        if opcoes["data_min"] is None:
+            st.info("Nenhuma venda processada ainda para gerar relatórios.")
+            return
 
-    dados_filtrados = dados_completos.copy()
-    if plataformas_selecionadas_report: dados_filtrados = dados_filtrados[dados_filtrados['plataforma'].isin(plataformas_selecionadas_report)]
-    if categorias_selecionadas: dados_filtrados = dados_filtrados[dados_filtrados['categoria_id'].isin(categorias_selecionadas)]
-    if len(date_range) == 2:
-        start_date, end_date = date_range
-        dados_filtrados = dados_filtrados[(dados_filtrados['dataPedido'].dt.date >= start_date) & (dados_filtrados['dataPedido'].dt.date <= end_date)]
+        st.sidebar.header("Filtros do Relatório")
+        
+        plataformas_selecionadas_report = st.sidebar.multiselect("Filtrar por Plataforma", options=opcoes["plataformas"], key="report_platform_filter")
 
-    if dados_filtrados.empty:
-        st.warning("Nenhum dado encontrado para os filtros selecionados."); return
+        categorias_dict = opcoes["categorias"]
+        categorias_selecionadas = st.sidebar.multiselect("Filtrar por Categoria", options=list(categorias_dict.keys()), format_func=lambda x: categorias_dict[x], key="report_cat_filter")
+        
+        min_date = opcoes["data_min"]; max_date = opcoes["data_max"]
+        date_range = st.sidebar.date_input("Selecione o Período", (min_date, max_date), min_value=min_date, max_value=max_date, key="report_date_filter")
 
-    st.subheader("Relatório de Vendas por Grupo de Produto")
-    
-    dados_filtrados['unidadesVendidas'] = dados_filtrados['quantidade'] * dados_filtrados['quantidadeKit']
-    dados_filtrados['gastoProduto'] = (dados_filtrados['custoUnidade'] * dados_filtrados['quantidadeKit']) * dados_filtrados['quantidade']
+        filtros = FiltrosVendas(
+            plataformas=tuple(plataformas_selecionadas_report), categorias=tuple(categorias_selecionadas),
+            data_inicio=date_range[0] if len(date_range) == 2 else None,
+            data_fim=date_range[1] if len(date_range) == 2 else None,
+        )
+        # Abas com estado: só a aba aberta é montada (e só ela consulta o banco)
+        aba_grupo, aba_tendencia, aba_abc = st.tabs(["📦 Por Grupo de Produto", "📈 Tendências", "🏆 Curva ABC"], key="report_aba", on_change="rerun")
+        for aba, montar_aba in ((aba_grupo, _aba_por_grupo), (aba_tendencia, _aba_tendencias), (aba_abc, _aba_curva_abc)):
+            if aba.open:
+                with aba, etapa(montar_aba.__name__.lstrip("_").replace("_", " ")):
+                    montar_aba(db, filtros)
 
-    def extrair_grupo(nome):
-        return re.split(r' - | \d+', nome)[0].strip()
 
-    dados_filtrados['grupoProduto'] = dados_filtrados['nomeVariacao'].apply(extrair_grupo)
+def _aba_por_grupo(db, filtros):
+    # Agrupado no cubo em memória, compartilhado com o dashboard
+    with etapa("relatório por grupo: cálculo"):
+        relatorio_grupo = carregar_cubo_vendas().relatorio_por_grupo(filtros)
+
+    if relatorio_grupo.empty:
+        st.warning("Nenhum dado encontrado para os filtros selecionados."); return
+
+    st.subheader("Relatório de Vendas por Grupo de Produto")
 
-    # Agrega os valores, agora incluindo a categoria no agrupamento
-    relatorio_grupo = dados_filtrados.groupby(['grupoProduto', 'nome_categoria']).agg(
-        unidadesVendidas=('unidadesVendidas', 'sum'),
-        gastoTotal=('gastoProduto', 'sum')
-    ).reset_index()
-    
-    relatorio_grupo = relatorio_grupo.sort_values(by='unidadesVendidas', ascending=False)
-    
     # Renomeia as colunas para exibição
     relatorio_grupo = relatorio_grupo.rename(columns={
         'grupoProduto': 'Grupo de Produto', 
@@ -79,9 +67,65 @@ def page_relatorios():
     relatorio_grupo = relatorio_grupo[['Grupo de Produto', 'Categoria', 'Total de Unidades Vendidas', 'Gasto Total (sem insumos)']]
 
     # Aplica o estilo para centralizar o texto
+    with etapa("relatório por grupo: tabela"):
+        st.dataframe(
+            relatorio_grupo.style.format({
+                "Gasto Total (sem insumos)": "R$ {:,.2f}"
+            }).set_properties(**{'text-align': 'center'}),
+            use_container_width=True
+        )
+
+
+_NOMES_GRANULARIDADE = {"dia": "Diária", "semana": "Semanal", "mes": "Mensal"}
+
+
+def _aba_tendencias(db, filtros):
+    st.subheader("Tendência de Receita e Lucro por Plataforma")
+    granularidade = st.radio("Agrupar por", options=list(GRANULARIDADES), format_func=_NOMES_GRANULARIDADE.get, horizontal=True, key="report_granularidade")
+    with etapa("tendências: consulta"):
+        tendencia = consultar_tendencia(db, filtros, granularidade)
+    if tendencia.empty:
+        st.warning("Nenhum dado encontrado para os filtros selecionados."); return
+
+    passo = tendencia.attrs["passo"]
+    tamanho, _ = GRANULARIDADES[granularidade]
+    if passo > tamanho:
+        unidade = "meses" if granularidade == "mes" else "dias"
+        st.caption(f"Período longo: cada ponto soma {passo} {unidade} (no máximo {MAX_PONTOS_GRAFICO} pontos por gráfico).")
+    for coluna, titulo in (("receitaBruta", "Receita Bruta (R$)"), ("lucro", "Lucro Líquido (R$)")):
+        st.markdown(f"**{titulo}**")
+        st.line_chart(tendencia.pivot(index="periodo", columns="plataforma", values=coluna))
+
+
+def _aba_curva_abc(db, filtros):
+    st.subheader("Curva ABC (Pareto) por Lucro")
+    nivel = st.radio("Classificar", options=["sku", "grupo"], format_func={"sku": "SKUs", "grupo": "Grupos de Produto"}.get, horizontal=True, key="report_nivel_abc")
+    with etapa("curva ABC: consulta"):
+        curva = consultar_curva_abc(db, filtros, nivel, top=50)
+    if curva.empty:
+        st.warning("Nenhum dado encontrado para os filtros selecionados."); return
+
+    st.caption(
+        f"Classe A: itens até {LIMITE_CLASSE_A:.0%} do lucro positivo acumulado; B: até {LIMITE_CLASSE_B:.0%}; "
+        "C: o restante e os itens sem lucro."
+    )
+    classes = curva.drop_duplicates("classe").sort_values("classe")
+    total_itens = int(curva["total_itens"].iloc[0])
+    st.dataframe(
+        classes.assign(participacao=classes["itensClasse"] / total_itens)[["classe", "itensClasse", "participacao", "lucroClasse"]]
+        .rename(columns={"classe": "Classe", "itensClasse": "Itens", "participacao": "% dos Itens", "lucroClasse": "Lucro (R$)"})
+        .style.format({"% dos Itens": "{:.1%}", "Lucro (R$)": "R$ {:,.2f}"}),
+        hide_index=True, use_container_width=True,
+    )
+    st.markdown("**Lucro positivo acumulado por posição no ranking**")
+    st.line_chart(curva.set_index("posicao")["participacaoAcumulada"])
+
+    st.markdown(f"**Top {min(50, total_itens)} de {total_itens:,}**")
+    top = curva[curva["posicao"] <= 50]
     st.dataframe(
-        relatorio_grupo.style.format({
-            "Gasto Total (sem insumos)": "R$ {:,.2f}"
-        }).set_properties(**{'text-align': 'center'}),
-        use_container_width=True
-    )
\ No newline at end of file
+        top[["posicao", "chave", "descricao", "classe", "lucro", "receitaBruta", "unidades", "participacaoAcumulada"]].rename(columns={
+            "posicao": "#", "chave": "SKU" if nivel == "sku" else "Grupo de Produto", "descricao": "Variação" if nivel == "sku" else "Categoria",
+            "classe": "Classe", "lucro": "Lucro (R$)", "receitaBruta": "Receita Bruta (R$)", "unidades": "Unidades", "participacaoAcumulada": "% Acumulado",
+        }).style.format({"Lucro (R$)": "R$ {:,.2f}", "Receita Bruta (R$)": "R$ {:,.2f}", "% Acumulado": "{:.1%}"}),
+        hide_index=True, use_container_width=True,
+    )
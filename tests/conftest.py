@@ -0,0 +1,13 @@
+# tests/conftest.py
+"""
+Os testes que importam database.py usam um banco temporário: o engine fica preso ao DATABASE_URL do processo
+no primeiro import, então ele é definido aqui, antes de qualquer módulo do projeto ser importado.
+"""
+import os
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'testes.db')}"
+os.environ["ARQUIVO_LOG_LENTIDAO"] = ""
@@ -0,0 +1,33 @@
+# tests/test_consultas.py
+"""
+Relatórios de utils/consultas.py sobre um banco sem vendas, com só uma das datas do período informada.
+"""
+from datetime import date
+
+import pytest
+
+from database import SessionLocal, criar_banco
+from utils.consultas import GRANULARIDADES, FiltrosVendas, consultar_curva_abc, consultar_tendencia
+
+SO_UMA_DATA = [FiltrosVendas(data_inicio=date(2024, 1, 1)), FiltrosVendas(data_fim=date(2024, 1, 1))]
+
+
+@pytest.fixture(scope="module")
+def db():
+    criar_banco()
+    with SessionLocal() as sessao:
+        yield sessao
+
+
+@pytest.mark.parametrize("granularidade", list(GRANULARIDADES))
+@pytest.mark.parametrize("filtros", SO_UMA_DATA, ids=["so_inicio", "so_fim"])
+def test_tendencia_sem_vendas_vem_vazia(db, filtros, granularidade):
+    tendencia = consultar_tendencia(db, filtros, granularidade)
+    assert tendencia.empty
+    assert list(tendencia.columns) == ["periodo", "plataforma", "receitaBruta", "lucro", "unidades"]
+
+
+@pytest.mark.parametrize("nivel", ["sku", "grupo"])
+@pytest.mark.parametrize("filtros", SO_UMA_DATA, ids=["so_inicio", "so_fim"])
+def test_curva_abc_sem_vendas_vem_vazia(db, filtros, nivel):
+    assert consultar_curva_abc(db, filtros, nivel).empty
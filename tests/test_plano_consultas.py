@@ -0,0 +1,49 @@
+# tests/test_plano_consultas.py
+"""
+As consultas do dashboard, dos relatórios e da reprecificação usam os índices de utils/migracoes.py, tanto num
+banco criado agora (create_all) quanto num banco antigo levado à versão atual pelas migrações.
+
+Cada caso roda benchmarks/plano_consultas.py num subprocesso: o engine de database.py fica preso ao DATABASE_URL
+do processo que o importa primeiro.
+"""
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(RAIZ, "benchmarks", "plano_consultas.py")
+# Esquema do banco distribuído com o projeto, anterior a todas as migrações
+ESQUEMA_BASE = os.path.join(RAIZ, "controle_financeiro.db")
+
+
+def _avaliar(*argumentos) -> dict:
+    saida = subprocess.run(
+        [sys.executable, SCRIPT, "--linhas", "3000", "--json", *argumentos],
+        cwd=RAIZ, capture_output=True, text=True, env={**os.environ, "ARQUIVO_LOG_LENTIDAO": ""},
+    )
+    assert saida.stdout.strip(), saida.stderr
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+
+def _conferir_consultas(resultado: dict):
+    assert resultado["versao_esquema"] == resultado["versao_atual"]
+    reprovadas = {c["nome"]: [c["problema"], *c["plano"]] for c in resultado["consultas"] if c["problema"]}
+    assert not reprovadas, json.dumps(reprovadas, indent=2, ensure_ascii=False)
+
+
+def test_planos_em_banco_novo():
+    _conferir_consultas(_avaliar())
+
+
+@pytest.mark.skipif(not os.path.exists(ESQUEMA_BASE), reason="controle_financeiro.db não encontrado")
+def test_planos_em_banco_migrado_do_esquema_base():
+    conexao = sqlite3.connect(f"file:{ESQUEMA_BASE}?mode=ro", uri=True)
+    try:
+        assert conexao.execute("PRAGMA user_version").fetchone()[0] < 5, "o esquema base deveria estar antes da migração dos índices"
+    finally:
+        conexao.close()
+    _conferir_consultas(_avaliar("--esquema-base", ESQUEMA_BASE))
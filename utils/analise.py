@@ -0,0 +1,124 @@
+# utils/analise.py
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+from sqlalchemy import event, text
+
+from database import SessionLocal, engine
+
+# Objetos derivados das vendas (o cubo de utils/cubo.py) compartilhados por todas as sessões do processo,
+# indexados pela versão dos dados. Só as versões mais recentes de cada um ficam em memória.
+MAX_VERSOES_EM_CACHE = 2
+_caches_por_versao = {}
+_trava_caches = threading.Lock()
+_travas_construcao = {}
+
+_contador_alteracoes = 0
+_trava_contador = threading.Lock()
+_conexao_versao = None
+
+
+def marcar_dados_alterados():
+    """
+    Avança a versão local dos dados. Chamada automaticamente a cada commit com escrita feito por uma sessão do SessionLocal.
+    """
+    global _contador_alteracoes
+    with _trava_contador:
+        _contador_alteracoes += 1
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _marcar_flush(sessao, contexto):
+    sessao.info["houve_escrita"] = True
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _marcar_execucao(estado):
+    # insert/update/delete em lote e SQL textual (importação) também contam como escrita
+    if not estado.is_select:
+        estado.session.info["houve_escrita"] = True
+
+@event.listens_for(SessionLocal, "after_commit")
+def _marcar_commit(sessao):
+    if sessao.info.pop("houve_escrita", False):
+        marcar_dados_alterados()
+
+
+def versao_dados():
+    """
+    Versão atual dos dados: o contador local mais o PRAGMA data_version do SQLite, que muda quando
+    qualquer outra conexão (outro processo, a CLI, etc.) grava no arquivo.
+    """
+    global _conexao_versao
+    with _trava_contador:
+        versao_local = _contador_alteracoes
+        if engine.dialect.name != "sqlite":
+            return (versao_local, 0)
+        # Conexão dedicada, nunca usada para escrita: só ela enxerga as mudanças das demais pelo data_version
+        if _conexao_versao is None:
+            _conexao_versao = engine.connect()
+        versao_sqlite = _conexao_versao.execute(text("PRAGMA data_version")).scalar()
+        _conexao_versao.rollback()
+        return (versao_local, versao_sqlite)
+
+
+# Linhas por bloco na leitura compacta: só um bloco fica como objetos Python de cada vez
+TAMANHO_BLOCO_LEITURA = 100_000
+
+
+def _compactar_bloco(bloco: pd.DataFrame, categoricas) -> pd.DataFrame:
+    for coluna in bloco.columns:
+        if coluna in categoricas:
+            bloco[coluna] = bloco[coluna].astype("category")
+        elif pd.api.types.is_integer_dtype(bloco[coluna]):
+            bloco[coluna] = pd.to_numeric(bloco[coluna], downcast="integer")
+    return bloco
+
+
+def ler_sql_compacto(consulta, conexao, categoricas=(), datas=(), tamanho_bloco: int = TAMANHO_BLOCO_LEITURA) -> pd.DataFrame:
+    """
+    pd.read_sql em blocos, já com tipos enxutos: as colunas em `categoricas` (texto com poucos valores
+    distintos) viram category e os inteiros são reduzidos ao menor tipo que os comporta.
+    """
+    categoricas = set(categoricas)
+    blocos = [
+        _compactar_bloco(bloco, categoricas)
+        for bloco in pd.read_sql(consulta, conexao, parse_dates=list(datas), chunksize=tamanho_bloco)
+    ]
+    if not blocos:
+        return _compactar_bloco(pd.read_sql(consulta, conexao, parse_dates=list(datas)), categoricas)
+    if len(blocos) == 1:
+        return blocos[0]
+    # Cada bloco tem as suas categorias: o pd.concat as transformaria em texto de novo
+    unidas = {coluna: union_categoricals([bloco[coluna] for bloco in blocos]) for coluna in blocos[0].columns if coluna in categoricas}
+    df = pd.concat([bloco.drop(columns=list(unidas)) for bloco in blocos], ignore_index=True)
+    for coluna, valores in unidas.items():
+        df[coluna] = valores
+    return df[list(blocos[0].columns)]
+
+
+def obter_por_versao(nome: str, construir):
+    """
+    Devolve o objeto `nome` da versão atual dos dados, chamando `construir()` só quando a versão muda.
+    Sessões simultâneas esperam a mesma construção e reaproveitam o resultado.
+    """
+    versao = versao_dados()
+    with _trava_caches:
+        cache = _caches_por_versao.setdefault(nome, OrderedDict())
+        trava = _travas_construcao.setdefault(nome, threading.Lock())
+        if versao in cache:
+            cache.move_to_end(versao)
+            return cache[versao]
+
+    # Uma construção por vez de cada objeto
+    with trava:
+        with _trava_caches:
+            if versao in cache:
+                return cache[versao]
+        objeto = construir()
+        with _trava_caches:
+            cache[versao] = objeto
+            while len(cache) > MAX_VERSOES_EM_CACHE:
+                cache.popitem(last=False)
+    return objeto
@@ -0,0 +1,43 @@
+# utils/aquecimento.py
+"""
+Preparação do servidor do Streamlit, feita uma vez por processo (st.cache_resource em app.py): confere e
+migra o esquema do banco e, opcionalmente, monta em segundo plano os caches compartilhados entre sessões
+(cubo de vendas e tabelas do catálogo), para que a primeira sessão não pague por eles.
+"""
+import os
+import threading
+
+from utils.instrumentacao import etapa, medir_execucao
+
+# "0" desliga a montagem antecipada dos caches (o esquema é conferido de qualquer forma)
+AQUECER_CACHES = os.getenv("AQUECER_CACHES", "1") != "0"
+
+
+def aquecer_caches():
+    """
+    Monta o cubo de vendas e lê as três tabelas do catálogo da versão atual dos dados. Uma página que pedir um
+    deles durante o aquecimento espera a mesma construção, sem repeti-la.
+    """
+    from utils.catalogo import carregar_catalogo
+    from utils.cubo import carregar_cubo_vendas
+    with medir_execucao("aquecimento"):
+        # O cubo primeiro: é o que a página inicial (Dashboard) pede
+        carregar_cubo_vendas()
+        with etapa("aquecimento: catálogo"):
+            for tabela in ("categorias", "produtos_pai", "variacoes"):
+                carregar_catalogo(tabela)
+
+
+def preparar_servidor(aquecer: bool = AQUECER_CACHES) -> threading.Thread:
+    """
+    Cria/migra o esquema (o mesmo que `python database.py`) e dispara o aquecimento dos caches numa thread,
+    sem segurar a primeira execução da página. Devolve a thread (None se o aquecimento estiver desligado).
+    """
+    from database import criar_banco
+    with etapa("esquema do banco"):
+        criar_banco()
+    if not aquecer:
+        return None
+    thread = threading.Thread(target=aquecer_caches, name="aquecimento-caches", daemon=True)
+    thread.start()
+    return thread
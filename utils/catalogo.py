@@ -0,0 +1,296 @@
+# utils/catalogo.py
+import io
+import threading
+from dataclasses import dataclass, field
+
+import pandas as pd
+from openpyxl import Workbook
+from sqlalchemy import literal, null, select, union_all
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from database import engine, Categoria, CustoProdutoPai, ProdutoPai, Variacao
+from utils.analise import versao_dados
+from utils.custos import recalcular_lucros, sincronizar_versao_atual
+from utils.helpers import limpar_cache_custos
+from utils.plataformas import eh_csv, ler_csv
+
+# Consultas de cada tabela do catálogo, na ordem em que aparecem nas telas
+_CONSULTAS_CATALOGO = {
+    "categorias": select(Categoria.id, Categoria.nome).order_by(Categoria.nome),
+    "produtos_pai": select(
+        ProdutoPai.idProdutoPai, ProdutoPai.nomeProdutoPai, ProdutoPai.custoUnidade, ProdutoPai.quantidadeKit,
+        ProdutoPai.custoInsumos, ProdutoPai.categoria_id,
+    ).order_by(ProdutoPai.idProdutoPai),
+    "variacoes": select(
+        Variacao.skuVariacao, Variacao.nomeVariacao, Variacao.idProdutoPai, Variacao.grupoProduto,
+    ).order_by(Variacao.skuVariacao),
+}
+
+# Tabela -> (versão dos dados, DataFrame). Compartilhado entre sessões; um commit com escrita muda a versão
+# e a tabela é relida na próxima vez que for pedida.
+_cache_catalogo = {}
+_trava_cache_catalogo = threading.Lock()
+
+
+def carregar_catalogo(tabela: str) -> pd.DataFrame:
+    """
+    Devolve "categorias", "produtos_pai" ou "variacoes" como DataFrame, lido do banco no máximo uma vez
+    por versão dos dados. O DataFrame é compartilhado: filtre ou copie, nunca altere no lugar.
+    """
+    versao = versao_dados()
+    with _trava_cache_catalogo:
+        em_cache = _cache_catalogo.get(tabela)
+        if em_cache and em_cache[0] == versao:
+            return em_cache[1]
+    with engine.connect() as conexao:
+        df = pd.read_sql(_CONSULTAS_CATALOGO[tabela], conexao)
+    with _trava_cache_catalogo:
+        _cache_catalogo[tabela] = (versao, df)
+    return df
+
+
+def carregar_versoes_custo(id_produto: str) -> pd.DataFrame:
+    """
+    Versões de custo de um Produto Pai, da mais recente para a mais antiga.
+    """
+    consulta = (
+        select(CustoProdutoPai.vigenteDesde, CustoProdutoPai.custoUnidade, CustoProdutoPai.quantidadeKit, CustoProdutoPai.custoInsumos)
+        .where(CustoProdutoPai.idProdutoPai == id_produto)
+        .order_by(CustoProdutoPai.vigenteDesde.desc())
+    )
+    with engine.connect() as conexao:
+        return pd.read_sql(consulta, conexao)
+
+
+def limpar_cache_catalogo():
+    """
+    Descarta as tabelas em cache. Só é necessária para escritas feitas fora do SessionLocal.
+    """
+    with _trava_cache_catalogo:
+        _cache_catalogo.clear()
+
+
+def buscar_no_catalogo(df: pd.DataFrame, colunas: list, busca: str = "") -> pd.DataFrame:
+    """
+    Linhas em que alguma das colunas contém o texto buscado (sem diferenciar maiúsculas).
+    """
+    busca = (busca or "").strip()
+    if not busca:
+        return df
+    mascara = pd.Series(False, index=df.index)
+    for coluna in colunas:
+        mascara |= df[coluna].astype(str).str.contains(busca, case=False, regex=False, na=False)
+    return df[mascara]
+
+
+# Planilha de catálogo: uma linha por variação, repetindo os dados do Produto Pai. Linhas sem SKU cadastram
+# só o produto; linhas só com a categoria cadastram só a categoria. A exportação gera o mesmo formato.
+COLUNAS_PLANILHA_CATALOGO = ["categoria", "idProdutoPai", "nomeProdutoPai", "custoUnidade", "quantidadeKit", "custoInsumos", "skuVariacao", "nomeVariacao"]
+_COLUNAS_PRODUTO = ["idProdutoPai", "nomeProdutoPai", "categoria", "custoUnidade", "quantidadeKit", "custoInsumos"]
+_COLUNAS_VARIACAO = ["skuVariacao", "nomeVariacao", "idProdutoPai"]
+
+
+@dataclass
+class CatalogoValidado:
+    categorias: list = field(default_factory=list)
+    produtos: pd.DataFrame = None
+    variacoes: pd.DataFrame = None
+    erros: list = field(default_factory=list)
+
+
+@dataclass
+class ResultadoCatalogo:
+    categorias_novas: int = 0
+    produtos_novos: int = 0
+    produtos_atualizados: int = 0
+    variacoes_novas: int = 0
+    variacoes_atualizadas: int = 0
+    linhas_recalculadas: int = 0
+    variacao_lucro: float = 0.0
+
+
+def ler_planilha_catalogo(conteudo: bytes, nome_arquivo: str = ".xlsx") -> pd.DataFrame:
+    """
+    Lê a planilha de catálogo (.xlsx ou .csv) com todas as colunas como texto.
+    """
+    if eh_csv(nome_arquivo):
+        df_bruto = ler_csv(io.BytesIO(conteudo))
+    else:
+        df_bruto = pd.read_excel(io.BytesIO(conteudo), sheet_name=0, dtype=str)
+    df_bruto.columns = df_bruto.columns.str.strip()
+    return df_bruto
+
+
+def _linhas_com_erro(mascara: pd.Series, mensagem: str) -> list:
+    # +2: o cabeçalho é a linha 1 da planilha
+    return [f"Linha {indice + 2}: {mensagem}" for indice in mascara[mascara].index]
+
+
+def validar_catalogo(db: Session, df_bruto: pd.DataFrame) -> CatalogoValidado:
+    """
+    Confere a planilha inteira com operações de coluna e separa categorias, produtos e variações.
+    Só `idProdutoPai` é obrigatória; as demais colunas ausentes são tratadas como vazias.
+    Nada é gravado: se `erros` vier preenchido, a planilha deve ser corrigida antes de gravar_catalogo.
+    """
+    if "idProdutoPai" not in df_bruto.columns:
+        return CatalogoValidado(erros=["A planilha precisa da coluna 'idProdutoPai'. Colunas esperadas: " + ", ".join(COLUNAS_PLANILHA_CATALOGO)])
+
+    df = pd.DataFrame(index=df_bruto.index)
+    for coluna in COLUNAS_PLANILHA_CATALOGO:
+        texto = df_bruto[coluna].astype("string").str.strip() if coluna in df_bruto.columns else pd.Series(pd.NA, index=df_bruto.index, dtype="string")
+        df[coluna] = texto.mask(texto == "")
+    df = df.dropna(how="all")
+    erros = []
+
+    for coluna, padrao in (("custoUnidade", 0.0), ("custoInsumos", 0.0), ("quantidadeKit", 1)):
+        numeros = pd.to_numeric(df[coluna].str.replace(",", ".", regex=False), errors="coerce")
+        invalidos = df[coluna].notna() & (numeros.isna() | (numeros < (1 if coluna == "quantidadeKit" else 0)))
+        if coluna == "quantidadeKit":
+            invalidos |= numeros.notna() & (numeros % 1 != 0)
+        erros += _linhas_com_erro(invalidos, f"valor inválido em '{coluna}' ({'inteiro a partir de 1' if coluna == 'quantidadeKit' else 'número não negativo'}).")
+        df[coluna] = numeros.fillna(padrao)
+    df["quantidadeKit"] = df["quantidadeKit"].astype(int)
+
+    linha_produto = df["nomeProdutoPai"].notna()
+    linha_variacao = df["skuVariacao"].notna()
+    erros += _linhas_com_erro(linha_produto & df["idProdutoPai"].isna(), "'nomeProdutoPai' preenchido sem 'idProdutoPai'.")
+    erros += _linhas_com_erro(linha_produto & df["categoria"].isna(), "Produto Pai sem 'categoria'.")
+    erros += _linhas_com_erro(linha_variacao & df["nomeVariacao"].isna(), "SKU sem 'nomeVariacao'.")
+    erros += _linhas_com_erro(linha_variacao & df["idProdutoPai"].isna(), "SKU sem 'idProdutoPai'.")
+    erros += _linhas_com_erro(~linha_produto & ~linha_variacao & df["idProdutoPai"].notna(), "linha sem 'nomeProdutoPai' nem 'skuVariacao'.")
+
+    produtos = df.loc[linha_produto & df["idProdutoPai"].notna() & df["categoria"].notna(), _COLUNAS_PRODUTO].drop_duplicates()
+    repetidos = produtos["idProdutoPai"].duplicated(keep=False)
+    erros += [f"Produto Pai '{id_produto}' aparece com dados diferentes em mais de uma linha." for id_produto in produtos.loc[repetidos, "idProdutoPai"].unique()]
+    produtos = produtos.drop_duplicates("idProdutoPai")
+
+    variacoes = df.loc[linha_variacao & df["nomeVariacao"].notna() & df["idProdutoPai"].notna(), _COLUNAS_VARIACAO].drop_duplicates()
+    repetidos = variacoes["skuVariacao"].duplicated(keep=False)
+    erros += [f"SKU '{sku}' aparece com dados diferentes em mais de uma linha." for sku in variacoes.loc[repetidos, "skuVariacao"].unique()]
+    variacoes = variacoes.drop_duplicates("skuVariacao")
+
+    # Cada SKU precisa de um Produto Pai da planilha ou já cadastrado
+    conhecidos = set(produtos["idProdutoPai"]) | set(db.scalars(select(ProdutoPai.idProdutoPai)))
+    sem_pai = ~variacoes["idProdutoPai"].isin(conhecidos)
+    erros += [f"SKU '{sku}': Produto Pai '{id_produto}' não existe." for sku, id_produto in variacoes.loc[sem_pai, ["skuVariacao", "idProdutoPai"]].itertuples(index=False)]
+
+    categorias = sorted(set(df["categoria"].dropna()))
+    return CatalogoValidado(categorias=categorias, produtos=produtos, variacoes=variacoes, erros=erros)
+
+
+def gravar_catalogo(db: Session, catalogo: CatalogoValidado) -> ResultadoCatalogo:
+    """
+    Grava categorias, produtos e variações em uma única transação, com INSERT ... ON CONFLICT em lote:
+    registros novos são inseridos e os existentes (mesma chave) são atualizados com os valores da planilha.
+    Custos alterados substituem a versão de custo atual, e as vendas dos produtos afetados (custo novo ou
+    SKU que mudou de Produto Pai) são reprecificadas na mesma transação.
+    """
+    if catalogo.erros:
+        raise ValueError("A planilha de catálogo tem erros de validação.")
+    resultado = ResultadoCatalogo()
+    produtos_a_recalcular = set()
+    try:
+        if catalogo.categorias:
+            existentes = set(db.scalars(select(Categoria.nome)))
+            novas = [nome for nome in catalogo.categorias if nome not in existentes]
+            if novas:
+                db.execute(sqlite_insert(Categoria.__table__).on_conflict_do_nothing(index_elements=["nome"]), [{"nome": nome} for nome in novas])
+            resultado.categorias_novas = len(novas)
+
+        if catalogo.produtos is not None and not catalogo.produtos.empty:
+            ids_categorias = dict(db.execute(select(Categoria.nome, Categoria.id)).all())
+            custos_atuais = {
+                id_produto: custos for id_produto, *custos in
+                db.execute(select(ProdutoPai.idProdutoPai, ProdutoPai.custoUnidade, ProdutoPai.quantidadeKit, ProdutoPai.custoInsumos))
+            }
+            existentes = set(custos_atuais)
+            produtos = catalogo.produtos
+            registros = [
+                {"idProdutoPai": id_produto, "nomeProdutoPai": nome, "categoria_id": ids_categorias[categoria],
+                 "custoUnidade": float(custo_unidade), "quantidadeKit": int(qtd_kit), "custoInsumos": float(custo_insumos)}
+                for id_produto, nome, categoria, custo_unidade, qtd_kit, custo_insumos in produtos[_COLUNAS_PRODUTO].itertuples(index=False)
+            ]
+            comando = sqlite_insert(ProdutoPai.__table__)
+            db.execute(comando.on_conflict_do_update(
+                index_elements=["idProdutoPai"],
+                set_={coluna: comando.excluded[coluna] for coluna in ("nomeProdutoPai", "categoria_id", "custoUnidade", "quantidadeKit", "custoInsumos")},
+            ), registros)
+            produtos_a_recalcular.update(
+                registro["idProdutoPai"] for registro in registros
+                if registro["idProdutoPai"] in custos_atuais
+                and custos_atuais[registro["idProdutoPai"]] != [registro["custoUnidade"], registro["quantidadeKit"], registro["custoInsumos"]]
+            )
+            resultado.produtos_atualizados = int(produtos["idProdutoPai"].isin(existentes).sum())
+            resultado.produtos_novos = len(produtos) - resultado.produtos_atualizados
+
+        if catalogo.variacoes is not None and not catalogo.variacoes.empty:
+            pais_atuais = dict(db.execute(select(Variacao.skuVariacao, Variacao.idProdutoPai)).all())
+            existentes = set(pais_atuais)
+            variacoes = catalogo.variacoes
+            # Mesma regra de database.extrair_grupo_produto, aplicada à coluna inteira (o INSERT em lote não passa pelo @validates)
+            grupos = variacoes["nomeVariacao"].str.split(r" - | \d+", n=1, regex=True).str[0].str.strip()
+            registros = [
+                {"skuVariacao": sku, "nomeVariacao": nome, "idProdutoPai": id_produto, "grupoProduto": grupo}
+                for (sku, nome, id_produto), grupo in zip(variacoes[_COLUNAS_VARIACAO].itertuples(index=False), grupos)
+            ]
+            comando = sqlite_insert(Variacao.__table__)
+            db.execute(comando.on_conflict_do_update(
+                index_elements=["skuVariacao"],
+                set_={coluna: comando.excluded[coluna] for coluna in ("nomeVariacao", "idProdutoPai", "grupoProduto")},
+            ), registros)
+            produtos_a_recalcular.update(
+                registro["idProdutoPai"] for registro in registros
+                if registro["skuVariacao"] in pais_atuais and pais_atuais[registro["skuVariacao"]] != registro["idProdutoPai"]
+            )
+            resultado.variacoes_atualizadas = int(variacoes["skuVariacao"].isin(existentes).sum())
+            resultado.variacoes_novas = len(variacoes) - resultado.variacoes_atualizadas
+
+        if produtos_a_recalcular:
+            sincronizar_versao_atual(db)
+            recalculo = recalcular_lucros(db, produtos_a_recalcular)
+            resultado.linhas_recalculadas, resultado.variacao_lucro = recalculo.linhas_alteradas, recalculo.variacao_lucro
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    limpar_cache_custos()
+    return resultado
+
+
+def exportar_catalogo(formato: str = "xlsx") -> bytes:
+    """
+    Gera a planilha de catálogo (formato de COLUNAS_PLANILHA_CATALOGO) com uma única consulta.
+    """
+    com_produto = (
+        select(
+            *(coluna.label(nome) for coluna, nome in zip((
+                Categoria.nome, ProdutoPai.idProdutoPai, ProdutoPai.nomeProdutoPai, ProdutoPai.custoUnidade,
+                ProdutoPai.quantidadeKit, ProdutoPai.custoInsumos, Variacao.skuVariacao, Variacao.nomeVariacao,
+            ), COLUNAS_PLANILHA_CATALOGO))
+        )
+        .select_from(ProdutoPai)
+        .outerjoin(Categoria, ProdutoPai.categoria_id == Categoria.id)
+        .outerjoin(Variacao, Variacao.idProdutoPai == ProdutoPai.idProdutoPai)
+    )
+    # Categorias ainda sem produto também vão para a planilha, para que a exportação reimporte o catálogo inteiro
+    sem_produto = (
+        select(Categoria.nome, null(), null(), null(), null(), null(), null(), null())
+        .where(~select(literal(1)).where(ProdutoPai.categoria_id == Categoria.id).exists())
+    )
+    consulta = union_all(com_produto, sem_produto).order_by("categoria", "idProdutoPai", "skuVariacao")
+    with engine.connect() as conexao:
+        df = pd.read_sql(consulta, conexao)
+    # Categorias sem produto deixam a coluna com nulos; sem isto a quantidade sairia como "2.0"
+    df["quantidadeKit"] = df["quantidadeKit"].astype("Int64")
+    if formato == "csv":
+        return df.to_csv(index=False).encode("utf-8-sig")
+    # Modo write_only do openpyxl: grava linha a linha sem montar a planilha em memória (bem mais rápido que to_excel)
+    livro = Workbook(write_only=True)
+    aba = livro.create_sheet("Catalogo")
+    aba.append(COLUNAS_PLANILHA_CATALOGO)
+    for linha in df.astype(object).where(df.notna(), None).itertuples(index=False, name=None):
+        aba.append(linha)
+    saida = io.BytesIO()
+    livro.save(saida)
+    return saida.getvalue()
@@ -0,0 +1,258 @@
+# utils/consultas.py
+import math
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+
+import pandas as pd
+from sqlalchemy import Integer, case, cast, distinct, func, literal, or_, select, tuple_
+from sqlalchemy.orm import Session
+
+from database import Categoria, ProdutoPai, Variacao, LancamentosVendas, ResumoVendasDiario
+
+
+@dataclass(frozen=True)
+class FiltrosVendas:
+    """
+    Filtros da barra lateral. Listas vazias e datas None significam "sem filtro".
+    """
+    plataformas: tuple = ()
+    categorias: tuple = ()
+    data_inicio: date = None
+    data_fim: date = None
+
+
+def com_catalogo(consulta, tabela=LancamentosVendas):
+    # Mesmo critério dos merges originais: só entram vendas com SKU, Produto Pai e Categoria cadastrados
+    return (
+        consulta
+        .join(Variacao, tabela.skuVenda == Variacao.skuVariacao)
+        .join(ProdutoPai, Variacao.idProdutoPai == ProdutoPai.idProdutoPai)
+        .join(Categoria, ProdutoPai.categoria_id == Categoria.id)
+    )
+
+
+def aplicar_filtros(consulta, filtros: FiltrosVendas):
+    """
+    Acrescenta ao SELECT as condições dos filtros, todas como parâmetros.
+    """
+    if filtros.plataformas:
+        consulta = consulta.where(LancamentosVendas.plataforma.in_(filtros.plataformas))
+    if filtros.categorias:
+        consulta = consulta.where(ProdutoPai.categoria_id.in_(filtros.categorias))
+    if filtros.data_inicio:
+        consulta = consulta.where(LancamentosVendas.dataPedido >= datetime.combine(filtros.data_inicio, time.min))
+    if filtros.data_fim:
+        consulta = consulta.where(LancamentosVendas.dataPedido < datetime.combine(filtros.data_fim + timedelta(days=1), time.min))
+    return consulta
+
+
+def aplicar_filtros_resumo(consulta, filtros: FiltrosVendas):
+    """
+    Mesmos filtros de aplicar_filtros, sobre o resumo diário (as datas do filtro são sempre dias inteiros).
+    """
+    if filtros.plataformas:
+        consulta = consulta.where(ResumoVendasDiario.plataforma.in_(filtros.plataformas))
+    if filtros.categorias:
+        consulta = consulta.where(ProdutoPai.categoria_id.in_(filtros.categorias))
+    if filtros.data_inicio:
+        consulta = consulta.where(ResumoVendasDiario.dia >= filtros.data_inicio)
+    if filtros.data_fim:
+        consulta = consulta.where(ResumoVendasDiario.dia <= filtros.data_fim)
+    return consulta
+
+
+def consultar_opcoes_filtros(db: Session) -> dict:
+    """
+    Valores para montar os filtros: plataformas, categorias e o intervalo de datas das vendas.
+    """
+    # MIN e MAX em subconsultas separadas: cada um é uma busca na ponta do índice de dataPedido
+    data_min, data_max = db.execute(select(
+        select(func.min(LancamentosVendas.dataPedido)).scalar_subquery(),
+        select(func.max(LancamentosVendas.dataPedido)).scalar_subquery(),
+    )).one()
+    return {
+        "plataformas": list(db.scalars(select(LancamentosVendas.plataforma).distinct().order_by(LancamentosVendas.plataforma))),
+        "categorias": {id_categoria: nome for id_categoria, nome in db.execute(select(Categoria.id, Categoria.nome).order_by(Categoria.nome))},
+        "data_min": data_min.date() if data_min else None,
+        "data_max": data_max.date() if data_max else None,
+    }
+
+
+def calcular_kpis(db: Session, filtros: FiltrosVendas) -> dict:
+    """
+    Totais do dashboard calculados pelo banco. Os valores somáveis vêm do resumo diário; só a contagem
+    de pedidos distintos (um pedido pode ter vários SKUs) é feita sobre os lançamentos.
+    """
+    consulta = aplicar_filtros_resumo(com_catalogo(select(
+        func.coalesce(func.sum(ResumoVendasDiario.receitaBruta), 0.0).label("receita_bruta"),
+        func.coalesce(func.sum(ResumoVendasDiario.custoTotal), 0.0).label("custo_produtos"),
+        func.coalesce(func.sum(ResumoVendasDiario.taxas), 0.0).label("taxas"),
+        func.coalesce(func.sum(ResumoVendasDiario.cupons), 0.0).label("cupons"),
+        func.coalesce(func.sum(ResumoVendasDiario.lucro), 0.0).label("lucro"),
+        func.coalesce(func.sum(ResumoVendasDiario.itens), 0).label("itens"),
+    ).select_from(ResumoVendasDiario), ResumoVendasDiario), filtros)
+    kpis = dict(db.execute(consulta).mappings().one())
+    consulta_pedidos = aplicar_filtros(com_catalogo(
+        select(func.count(distinct(LancamentosVendas.pedidoId))).select_from(LancamentosVendas)
+    ), filtros)
+    kpis["pedidos"] = db.execute(consulta_pedidos).scalar() if kpis["itens"] else 0
+    kpis["gasto_total"] = kpis["custo_produtos"] + kpis["taxas"] + kpis["cupons"]
+    return kpis
+
+
+def consultar_relatorio_por_grupo(db: Session, filtros: FiltrosVendas) -> pd.DataFrame:
+    """
+    Unidades vendidas e gasto (sem insumos, pelo custo atual do Produto Pai) por grupo de produto e categoria,
+    em um único GROUP BY sobre o resumo diário.
+    """
+    unidades = func.sum(ResumoVendasDiario.unidades * ProdutoPai.quantidadeKit)
+    consulta = aplicar_filtros_resumo(com_catalogo(select(
+        Variacao.grupoProduto, Categoria.nome.label("nome_categoria"),
+        unidades.label("unidadesVendidas"),
+        func.sum(ResumoVendasDiario.unidades * ProdutoPai.quantidadeKit * ProdutoPai.custoUnidade).label("gastoTotal"),
+    ).select_from(ResumoVendasDiario), ResumoVendasDiario), filtros)
+    consulta = consulta.group_by(Variacao.grupoProduto, Categoria.nome).order_by(unidades.desc())
+    return pd.read_sql(consulta, db.connection())
+
+
+# Limite de pontos de um gráfico: períodos de uma série temporal, posições de uma curva ABC
+MAX_PONTOS_GRAFICO = 300
+
+# Granularidade -> (tamanho do período, unidade dos modificadores de data do SQLite)
+GRANULARIDADES = {"dia": (1, "days"), "semana": (7, "days"), "mes": (1, "months")}
+
+
+def consultar_tendencia(db: Session, filtros: FiltrosVendas, granularidade: str = "dia", max_pontos: int = MAX_PONTOS_GRAFICO) -> pd.DataFrame:
+    """
+    Receita bruta, lucro e unidades por período e plataforma, agrupados pelo banco sobre o resumo diário.
+    Semanas começam na segunda-feira. Se o período pedido gerar mais de `max_pontos` pontos, cada ponto
+    passa a juntar vários dias/semanas/meses (o `passo` devolvido em df.attrs).
+    """
+    inicio, fim = filtros.data_inicio, filtros.data_fim
+    if inicio is None or fim is None:
+        data_min, data_max = db.execute(select(func.min(ResumoVendasDiario.dia), func.max(ResumoVendasDiario.dia))).one()
+        inicio, fim = inicio or data_min, fim or data_max
+    tamanho, unidade = GRANULARIDADES[granularidade]
+    if inicio is None or fim is None or fim < inicio:
+        return pd.DataFrame(columns=["periodo", "plataforma", "receitaBruta", "lucro", "unidades"])
+
+    if unidade == "days":
+        ancora = inicio - timedelta(days=inicio.weekday()) if granularidade == "semana" else inicio
+        passo = tamanho * math.ceil(((fim - ancora).days // tamanho + 1) / max_pontos)
+        deslocamento = cast(func.julianday(ResumoVendasDiario.dia) - func.julianday(ancora.isoformat()), Integer) // passo * passo
+    else:
+        ancora = inicio.replace(day=1)
+        mes_ancora = ancora.year * 12 + ancora.month
+        passo = math.ceil(((fim.year * 12 + fim.month) - mes_ancora + 1) / max_pontos)
+        mes = cast(func.strftime("%Y", ResumoVendasDiario.dia), Integer) * 12 + cast(func.strftime("%m", ResumoVendasDiario.dia), Integer)
+        deslocamento = (mes - mes_ancora) // passo * passo
+    # Primeiro dia do período: a âncora deslocada por um múltiplo do passo
+    periodo = func.date(ancora.isoformat(), func.printf(f"+%d {unidade}", deslocamento)).label("periodo")
+
+    consulta = aplicar_filtros_resumo(com_catalogo(select(
+        periodo, ResumoVendasDiario.plataforma,
+        func.sum(ResumoVendasDiario.receitaBruta).label("receitaBruta"),
+        func.sum(ResumoVendasDiario.lucro).label("lucro"),
+        func.sum(ResumoVendasDiario.unidades).label("unidades"),
+    ).select_from(ResumoVendasDiario), ResumoVendasDiario), filtros)
+    consulta = consulta.group_by(periodo, ResumoVendasDiario.plataforma).order_by(periodo, ResumoVendasDiario.plataforma)
+    df = pd.read_sql(consulta, db.connection(), parse_dates=["periodo"])
+    df.attrs["passo"] = passo
+    return df
+
+
+# Corte das classes da curva ABC, pela participação acumulada no lucro positivo antes do item
+LIMITE_CLASSE_A, LIMITE_CLASSE_B = 0.80, 0.95
+
+
+def consultar_curva_abc(db: Session, filtros: FiltrosVendas, nivel: str = "sku", top: int = 50, max_pontos: int = MAX_PONTOS_GRAFICO) -> pd.DataFrame:
+    """
+    Ranking de SKUs (nivel="sku") ou grupos de produto (nivel="grupo") por lucro, com participação acumulada
+    e classe ABC calculadas no banco por funções de janela. Devolve as `top` primeiras posições e, do resto,
+    só uma amostra regular de no máximo `max_pontos` posições (mais a última) para a curva de Pareto;
+    itensClasse e lucroClasse trazem os totais de cada classe sobre o ranking inteiro.
+    Itens sem lucro positivo ficam sempre na classe C.
+    """
+    if nivel == "sku":
+        chaves = [ResumoVendasDiario.skuVenda.label("chave"), Variacao.nomeVariacao.label("descricao")]
+        agrupamento = [ResumoVendasDiario.skuVenda, Variacao.nomeVariacao]
+    else:
+        chaves = [Variacao.grupoProduto.label("chave"), Categoria.nome.label("descricao")]
+        agrupamento = [Variacao.grupoProduto, Categoria.nome]
+    totais = aplicar_filtros_resumo(com_catalogo(select(
+        *chaves,
+        func.sum(ResumoVendasDiario.lucro).label("lucro"),
+        func.sum(ResumoVendasDiario.receitaBruta).label("receitaBruta"),
+        func.sum(ResumoVendasDiario.unidades).label("unidades"),
+    ).select_from(ResumoVendasDiario), ResumoVendasDiario), filtros).group_by(*agrupamento).subquery("totais")
+
+    ordem = [totais.c.lucro.desc(), totais.c.chave]
+    positivo = case((totais.c.lucro > 0, totais.c.lucro), else_=0.0)
+    total_positivo = func.sum(positivo).over()
+    # Acumulado antes do item: o item que cruza o limite ainda entra na classe
+    anterior = func.coalesce(func.sum(positivo).over(order_by=ordem, rows=(None, -1)), 0.0)
+    ranking = select(
+        func.row_number().over(order_by=ordem).label("posicao"), func.count().over().label("total_itens"),
+        totais.c.chave, totais.c.descricao, totais.c.lucro, totais.c.receitaBruta, totais.c.unidades,
+        (func.sum(positivo).over(order_by=ordem, rows=(None, 0)) / func.nullif(total_positivo, 0)).label("participacaoAcumulada"),
+        case(
+            (totais.c.lucro <= 0, "C"),
+            (anterior < LIMITE_CLASSE_A * total_positivo, "A"),
+            (anterior < LIMITE_CLASSE_B * total_positivo, "B"),
+            else_="C",
+        ).label("classe"),
+    ).subquery("ranking")
+    classificado = select(
+        ranking, func.count().over(partition_by=ranking.c.classe).label("itensClasse"),
+        func.sum(ranking.c.lucro).over(partition_by=ranking.c.classe).label("lucroClasse"),
+    ).subquery("classificado")
+
+    passo = func.max(1, (classificado.c.total_itens + max_pontos - 1) // max_pontos)
+    consulta = select(classificado).where(or_(
+        classificado.c.posicao <= top,
+        classificado.c.posicao % passo == 0,
+        classificado.c.posicao == classificado.c.total_itens,
+    )).order_by(classificado.c.posicao)
+    return pd.read_sql(consulta, db.connection())
+
+
+def _filtro_busca(consulta, busca: str):
+    if busca:
+        termo = "%" + busca.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        consulta = consulta.where(or_(
+            LancamentosVendas.skuVenda.like(termo, escape="\\"),
+            LancamentosVendas.pedidoId.like(termo, escape="\\"),
+        ))
+    return consulta
+
+
+def contar_lancamentos(db: Session, filtros: FiltrosVendas, busca: str = "") -> int:
+    """
+    Total de linhas do detalhamento (consulta separada, só COUNT).
+    """
+    consulta = _filtro_busca(aplicar_filtros(com_catalogo(select(func.count()).select_from(LancamentosVendas)), filtros), busca)
+    return db.execute(consulta).scalar()
+
+
+def consultar_pagina_lancamentos(db: Session, filtros: FiltrosVendas, busca: str = "", apos=None, decrescente: bool = True, limite: int = 50) -> pd.DataFrame:
+    """
+    Uma página do detalhamento, com paginação por chave (keyset) em (dataPedido, id): `apos` é o par
+    (dataPedido, id) da última linha da página anterior. O custo não cresce com o número da página.
+    """
+    chave = tuple_(LancamentosVendas.dataPedido, LancamentosVendas.id)
+    consulta = _filtro_busca(aplicar_filtros(com_catalogo(select(
+        LancamentosVendas.id, LancamentosVendas.dataPedido, LancamentosVendas.pedidoId, LancamentosVendas.plataforma,
+        LancamentosVendas.skuVenda, Variacao.nomeVariacao,
+        (LancamentosVendas.receitaBrutaProduto * LancamentosVendas.quantidade).label("receitaBrutaTotal"),
+        LancamentosVendas.totalCupons, LancamentosVendas.taxasMarketplace, LancamentosVendas.valorVendaLiquido,
+        (LancamentosVendas.custoTotalCalculado * LancamentosVendas.quantidade).label("custoTotalProduto"),
+        LancamentosVendas.lucroLiquidoReal,
+    ).select_from(LancamentosVendas)), filtros), busca)
+    if apos is not None:
+        cursor = tuple_(literal(apos[0], LancamentosVendas.dataPedido.type), literal(apos[1], LancamentosVendas.id.type))
+        consulta = consulta.where(chave < cursor if decrescente else chave > cursor)
+    if decrescente:
+        consulta = consulta.order_by(LancamentosVendas.dataPedido.desc(), LancamentosVendas.id.desc())
+    else:
+        consulta = consulta.order_by(LancamentosVendas.dataPedido, LancamentosVendas.id)
+    return pd.read_sql(consulta.limit(limite), db.connection(), parse_dates=["dataPedido"])
@@ -0,0 +1,158 @@
+# utils/cubo.py
+"""
+Cubo de vendas em memória para o dashboard e os relatórios: montado uma vez por versão dos dados e
+compartilhado por todas as sessões, responde a qualquer combinação de filtros sem voltar ao banco.
+
+As linhas são agrupadas em partições, uma por par (plataforma, categoria) com vendas, e ordenadas por
+dataPedido dentro de cada partição. Um filtro de plataforma/categoria escolhe partições inteiras (sem
+máscara por linha) e o período vira, em cada partição, um intervalo contíguo achado por busca binária.
+Os valores dos KPIs ficam como somas acumuladas em arrays NumPy contíguos: a soma de um intervalo é a
+diferença de duas posições, então o custo de um filtro não depende do número de vendas.
+"""
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+from database import engine, Categoria, ProdutoPai, Variacao, LancamentosVendas
+from utils.analise import ler_sql_compacto, obter_por_versao
+from utils.consultas import FiltrosVendas, com_catalogo
+from utils.instrumentacao import etapa
+
+# Somas acumuladas do cubo, na ordem das chaves devolvidas por CuboVendas.kpis
+COLUNAS_SOMADAS = ("receita_bruta", "custo_produtos", "taxas", "cupons", "lucro")
+
+
+def _instante(dia) -> np.int64:
+    return np.datetime64(datetime.combine(dia, time.min), "ns").astype(np.int64)
+
+
+@dataclass(frozen=True)
+class CuboVendas:
+    datas: np.ndarray                 # int64 (ns), crescente dentro de cada partição
+    inicio_particoes: np.ndarray      # partição p ocupa as linhas [inicio_particoes[p], inicio_particoes[p + 1])
+    plataforma_particoes: tuple
+    categoria_particoes: tuple
+    acumulados: np.ndarray            # COLUNAS_SOMADAS x (linhas + 1): acumulados[:, i] = soma das linhas [0, i)
+    codigo_pedido: np.ndarray
+    total_pedidos: int
+    codigo_grupo: np.ndarray
+    grupos: pd.DataFrame              # grupoProduto e nome_categoria de cada código de grupo
+    unidades_kit: np.ndarray          # quantidade x quantidadeKit, por linha
+    gasto_grupo: np.ndarray           # unidades_kit x custoUnidade atual, por linha
+
+    def __len__(self):
+        return len(self.datas)
+
+    def selecionar(self, filtros: FiltrosVendas) -> list:
+        """
+        Intervalos de linhas [a, b) que atendem aos filtros, no máximo um por partição.
+        """
+        plataformas, categorias = set(filtros.plataformas), set(filtros.categorias)
+        limite_inicio = _instante(filtros.data_inicio) if filtros.data_inicio else None
+        limite_fim = _instante(filtros.data_fim + timedelta(days=1)) if filtros.data_fim else None
+        intervalos = []
+        for particao, (plataforma, categoria) in enumerate(zip(self.plataforma_particoes, self.categoria_particoes)):
+            if (plataformas and plataforma not in plataformas) or (categorias and categoria not in categorias):
+                continue
+            inicio, fim = int(self.inicio_particoes[particao]), int(self.inicio_particoes[particao + 1])
+            datas = self.datas[inicio:fim]
+            a = inicio + int(np.searchsorted(datas, limite_inicio, side="left")) if limite_inicio is not None else inicio
+            b = inicio + int(np.searchsorted(datas, limite_fim, side="left")) if limite_fim is not None else fim
+            if b > a:
+                intervalos.append((a, b))
+        return intervalos
+
+    def kpis(self, filtros: FiltrosVendas) -> dict:
+        """
+        Mesmo resultado de utils.consultas.calcular_kpis, calculado sobre os arrays.
+        """
+        intervalos = self.selecionar(filtros)
+        inicios = np.array([a for a, _ in intervalos], dtype=np.int64)
+        fins = np.array([b for _, b in intervalos], dtype=np.int64)
+        somas = (self.acumulados[:, fins] - self.acumulados[:, inicios]).sum(axis=1)
+        itens = int((fins - inicios).sum())
+        if len(intervalos) == len(self.plataforma_particoes) and itens == len(self.datas):
+            pedidos = self.total_pedidos
+        else:
+            # Um pedido pode ter itens em várias partições: conta cada código uma vez
+            vistos = np.zeros(self.total_pedidos, dtype=bool)
+            for a, b in intervalos:
+                vistos[self.codigo_pedido[a:b]] = True
+            pedidos = int(np.count_nonzero(vistos))
+        kpis = {nome: float(valor) for nome, valor in zip(COLUNAS_SOMADAS, somas)}
+        kpis["itens"], kpis["pedidos"] = itens, pedidos
+        kpis["gasto_total"] = kpis["custo_produtos"] + kpis["taxas"] + kpis["cupons"]
+        return kpis
+
+    def relatorio_por_grupo(self, filtros: FiltrosVendas) -> pd.DataFrame:
+        """
+        Mesmo resultado de utils.consultas.consultar_relatorio_por_grupo, somado por código de grupo com bincount.
+        """
+        tamanho = len(self.grupos)
+        unidades, gasto, linhas = np.zeros(tamanho), np.zeros(tamanho), np.zeros(tamanho, dtype=np.int64)
+        for a, b in self.selecionar(filtros):
+            codigos = self.codigo_grupo[a:b]
+            unidades += np.bincount(codigos, weights=self.unidades_kit[a:b], minlength=tamanho)
+            gasto += np.bincount(codigos, weights=self.gasto_grupo[a:b], minlength=tamanho)
+            linhas += np.bincount(codigos, minlength=tamanho)
+        presentes = linhas > 0
+        relatorio = self.grupos[presentes].assign(unidadesVendidas=unidades[presentes].round().astype("int64"), gastoTotal=gasto[presentes])
+        return relatorio.sort_values("unidadesVendidas", ascending=False, kind="stable").reset_index(drop=True)
+
+
+@etapa("cubo de vendas")
+def _construir_cubo() -> CuboVendas:
+    consulta = com_catalogo(select(
+        LancamentosVendas.dataPedido, LancamentosVendas.plataforma, ProdutoPai.categoria_id, LancamentosVendas.pedidoId,
+        Variacao.grupoProduto, Categoria.nome.label("nome_categoria"), LancamentosVendas.quantidade,
+        LancamentosVendas.receitaBrutaProduto, LancamentosVendas.custoTotalCalculado, LancamentosVendas.taxasMarketplace,
+        LancamentosVendas.totalCupons, LancamentosVendas.lucroLiquidoReal, ProdutoPai.quantidadeKit, ProdutoPai.custoUnidade,
+    ).select_from(LancamentosVendas))
+    with engine.connect() as conexao:
+        df = ler_sql_compacto(consulta, conexao, categoricas=["plataforma", "grupoProduto", "nome_categoria"], datas=["dataPedido"])
+
+    codigo_plataforma, plataformas = pd.factorize(df["plataforma"])
+    codigo_categoria, categorias = pd.factorize(df["categoria_id"])
+    particao = codigo_plataforma.astype(np.int64) * max(len(categorias), 1) + codigo_categoria
+    datas = df["dataPedido"].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    # Partição primeiro, data depois: cada partição vira um bloco contíguo ordenado por data
+    ordem = np.lexsort((datas, particao))
+    df, particao, datas = df.iloc[ordem].reset_index(drop=True), particao[ordem], datas[ordem]
+
+    particoes, inicios = np.unique(particao, return_index=True)
+    codigo_pedido, pedidos = pd.factorize(df["pedidoId"])
+    # ngroup com sort=False numera os grupos na ordem em que aparecem, a mesma do drop_duplicates
+    colunas_grupo = df[["grupoProduto", "nome_categoria"]]
+    codigo_grupo = colunas_grupo.groupby(list(colunas_grupo), sort=False, dropna=False, observed=True).ngroup().to_numpy()
+
+    quantidade = df["quantidade"].to_numpy(dtype="float64")
+    valores = np.vstack([
+        df["receitaBrutaProduto"].to_numpy(dtype="float64") * quantidade,
+        df["custoTotalCalculado"].to_numpy(dtype="float64") * quantidade,
+        df["taxasMarketplace"].to_numpy(dtype="float64"),
+        df["totalCupons"].to_numpy(dtype="float64"),
+        df["lucroLiquidoReal"].to_numpy(dtype="float64"),
+    ])
+    acumulados = np.zeros((len(COLUNAS_SOMADAS), len(df) + 1))
+    np.cumsum(valores, axis=1, out=acumulados[:, 1:])
+    unidades_kit = quantidade * df["quantidadeKit"].to_numpy(dtype="float64")
+    return CuboVendas(
+        datas=datas,
+        inicio_particoes=np.append(inicios, len(df)).astype(np.int64),
+        plataforma_particoes=tuple(plataformas[particoes // max(len(categorias), 1)]),
+        categoria_particoes=tuple(int(c) for c in categorias[particoes % max(len(categorias), 1)]),
+        acumulados=acumulados,
+        codigo_pedido=codigo_pedido.astype(np.int32), total_pedidos=len(pedidos),
+        codigo_grupo=codigo_grupo.astype(np.int32), grupos=colunas_grupo.drop_duplicates().astype("str").reset_index(drop=True),
+        unidades_kit=unidades_kit, gasto_grupo=unidades_kit * df["custoUnidade"].to_numpy(dtype="float64"),
+    )
+
+
+def carregar_cubo_vendas() -> CuboVendas:
+    """
+    O cubo da versão atual dos dados (montado na primeira chamada após cada alteração).
+    """
+    return obter_por_versao("cubo", _construir_cubo)
@@ -0,0 +1,174 @@
+# utils/custos.py
+import time
+from dataclasses import dataclass, field
+from datetime import date
+
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, CustoProdutoPai, ProdutoPai, Variacao, ResumoVendasDiario
+from utils.helpers import limpar_cache_custos
+from utils.resumo import reconstruir_resumo_vendas
+
+# Vigência da versão que guarda o custo anterior à primeira alteração datada ("desde sempre")
+INICIO_VIGENCIA = date.min
+_TAMANHO_LOTE_SKUS = 900
+
+
+@dataclass
+class ResultadoRecalculo:
+    produtos: int = 0
+    linhas_alteradas: int = 0
+    variacao_lucro: float = 0.0
+    skus_afetados: list = field(default_factory=list)
+    segundos: float = 0.0
+
+
+def _sql_vigencias(produtos: str) -> str:
+    """
+    Intervalos [inicio, fim) de custo do kit por SKU, para os Produtos Pai devolvidos pela subconsulta `produtos`.
+    Produtos sem versões de custo usam o custo atual em qualquer data (inicio e fim nulos).
+    """
+    return (
+        "SELECT v.skuVariacao AS sku, c.inicio, c.fim, c.custoKit FROM ("
+        "  SELECT idProdutoPai, vigenteDesde AS inicio,"
+        "         LEAD(vigenteDesde) OVER (PARTITION BY idProdutoPai ORDER BY vigenteDesde) AS fim,"
+        "         custoUnidade * quantidadeKit + custoInsumos AS custoKit"
+        f"  FROM custos_produto_pai WHERE idProdutoPai IN ({produtos})"
+        ") c JOIN variacoes v ON v.idProdutoPai = c.idProdutoPai "
+        "UNION ALL "
+        "SELECT v.skuVariacao, NULL, NULL, p.custoUnidade * p.quantidadeKit + p.custoInsumos "
+        "FROM produtos_pai p JOIN variacoes v ON v.idProdutoPai = p.idProdutoPai "
+        f"WHERE p.idProdutoPai IN ({produtos}) "
+        "AND NOT EXISTS (SELECT 1 FROM custos_produto_pai c2 WHERE c2.idProdutoPai = p.idProdutoPai)"
+    )
+
+
+def _sql_reprecificar(tabela: str, produtos: str) -> str:
+    # Só as linhas cujo custo realmente muda são reescritas (o rowcount é o número de linhas alteradas)
+    return (
+        f"UPDATE {tabela} SET custoTotalCalculado = f.custoKit, "
+        f"lucroLiquidoReal = {tabela}.valorVendaLiquido - f.custoKit * {tabela}.quantidade "
+        f"FROM ({_sql_vigencias(produtos)}) AS f "
+        f"WHERE {tabela}.skuVenda = f.sku "
+        f"AND (f.inicio IS NULL OR {tabela}.dataPedido >= f.inicio) AND (f.fim IS NULL OR {tabela}.dataPedido < f.fim) "
+        f"AND {tabela}.custoTotalCalculado <> f.custoKit"
+    )
+
+
+def aplicar_custos_vigentes(conexao, origem: str = "staging_lancamentos"):
+    """
+    Reprecifica as linhas de `origem` (o lote da importação) pela versão de custo vigente na data de cada pedido.
+    """
+    conexao.execute(text(_sql_reprecificar(
+        origem, f"SELECT v.idProdutoPai FROM variacoes v WHERE v.skuVariacao IN (SELECT skuVenda FROM {origem})"
+    )))
+
+
+def _lucro_no_resumo(db: Session, skus: list) -> float:
+    total = 0.0
+    for i in range(0, len(skus), _TAMANHO_LOTE_SKUS):
+        total += db.execute(
+            select(func.coalesce(func.sum(ResumoVendasDiario.lucro), 0.0))
+            .where(ResumoVendasDiario.skuVenda.in_(skus[i:i + _TAMANHO_LOTE_SKUS]))
+        ).scalar()
+    return total
+
+
+def recalcular_lucros(db: Session, ids_produtos=None) -> ResultadoRecalculo:
+    """
+    Reprecifica os lançamentos dos Produtos Pai informados (todos, se None) pelas versões de custo vigentes,
+    com um UPDATE ... FROM por produto, e refaz o resumo diário dos SKUs que mudaram. Não faz commit.
+    """
+    inicio = time.perf_counter()
+    if ids_produtos is None:
+        ids_produtos = db.scalars(select(ProdutoPai.idProdutoPai))
+    ids_produtos = sorted(set(ids_produtos))
+    skus_por_produto = {}
+    for sku, id_produto in db.execute(select(Variacao.skuVariacao, Variacao.idProdutoPai).where(Variacao.idProdutoPai.isnot(None))):
+        skus_por_produto.setdefault(id_produto, []).append(sku)
+
+    resultado = ResultadoRecalculo(produtos=len(ids_produtos))
+    skus_dos_produtos = [sku for id_produto in ids_produtos for sku in skus_por_produto.get(id_produto, [])]
+    lucro_antes = _lucro_no_resumo(db, skus_dos_produtos)
+    for id_produto in ids_produtos:
+        if id_produto not in skus_por_produto:
+            continue
+        alteradas = db.execute(text(_sql_reprecificar("lancamentos_vendas", ":id_produto")), {"id_produto": id_produto}).rowcount
+        if alteradas:
+            resultado.linhas_alteradas += alteradas
+            resultado.skus_afetados += skus_por_produto[id_produto]
+
+    if resultado.skus_afetados:
+        reconstruir_resumo_vendas(db, resultado.skus_afetados)
+        resultado.variacao_lucro = _lucro_no_resumo(db, skus_dos_produtos) - lucro_antes
+    resultado.segundos = time.perf_counter() - inicio
+    return resultado
+
+
+def registrar_versao_custo(db: Session, id_produto: str, vigente_desde: date, custo_unidade: float, quantidade_kit: int, custo_insumos: float):
+    """
+    Cria (ou corrige, se já existir na mesma data) a versão de custo que vale a partir de `vigente_desde`.
+    Na primeira alteração datada, o custo atual do produto vira a versão "desde sempre", preservando o histórico.
+    Os campos de custo do ProdutoPai passam a refletir a versão mais recente. Não faz commit.
+    """
+    produto = db.get(ProdutoPai, id_produto)
+    tem_versoes = db.execute(select(func.count()).select_from(CustoProdutoPai).where(CustoProdutoPai.idProdutoPai == id_produto)).scalar()
+    if not tem_versoes and vigente_desde > INICIO_VIGENCIA:
+        db.add(CustoProdutoPai(
+            idProdutoPai=id_produto, vigenteDesde=INICIO_VIGENCIA, custoUnidade=produto.custoUnidade,
+            quantidadeKit=produto.quantidadeKit, custoInsumos=produto.custoInsumos,
+        ))
+        db.flush()
+    comando = sqlite_insert(CustoProdutoPai.__table__).values(
+        idProdutoPai=id_produto, vigenteDesde=vigente_desde, custoUnidade=custo_unidade,
+        quantidadeKit=quantidade_kit, custoInsumos=custo_insumos,
+    )
+    db.execute(comando.on_conflict_do_update(
+        index_elements=["idProdutoPai", "vigenteDesde"],
+        set_={coluna: comando.excluded[coluna] for coluna in ("custoUnidade", "quantidadeKit", "custoInsumos")},
+    ))
+    produto.custoUnidade, produto.quantidadeKit, produto.custoInsumos = db.execute(
+        select(CustoProdutoPai.custoUnidade, CustoProdutoPai.quantidadeKit, CustoProdutoPai.custoInsumos)
+        .where(CustoProdutoPai.idProdutoPai == id_produto).order_by(CustoProdutoPai.vigenteDesde.desc()).limit(1)
+    ).one()
+
+
+def sincronizar_versao_atual(db: Session):
+    """
+    Copia o custo atual de cada ProdutoPai para a sua versão mais recente (usada quando o custo é
+    sobrescrito sem data, como na importação do catálogo). Produtos sem versões não são afetados.
+    """
+    db.execute(text(
+        "UPDATE custos_produto_pai SET custoUnidade = p.custoUnidade, quantidadeKit = p.quantidadeKit, custoInsumos = p.custoInsumos "
+        "FROM produtos_pai p WHERE custos_produto_pai.idProdutoPai = p.idProdutoPai "
+        "AND custos_produto_pai.vigenteDesde = (SELECT MAX(c.vigenteDesde) FROM custos_produto_pai c WHERE c.idProdutoPai = p.idProdutoPai) "
+        "AND (custos_produto_pai.custoUnidade <> p.custoUnidade OR custos_produto_pai.quantidadeKit <> p.quantidadeKit "
+        "OR custos_produto_pai.custoInsumos <> p.custoInsumos)"
+    ))
+
+
+def alterar_custo_produto(db: Session, id_produto: str, vigente_desde: date, custo_unidade: float, quantidade_kit: int, custo_insumos: float) -> ResultadoRecalculo:
+    """
+    Registra a nova versão de custo e reprecifica as vendas do produto na mesma transação.
+    """
+    try:
+        registrar_versao_custo(db, id_produto, vigente_desde, custo_unidade, quantidade_kit, custo_insumos)
+        db.flush()
+        resultado = recalcular_lucros(db, [id_produto])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    limpar_cache_custos()
+    return resultado
+
+
+if __name__ == "__main__":
+    # python -m utils.custos  ->  reprecifica todas as vendas pelas versões de custo vigentes
+    with SessionLocal() as db:
+        print("Recalculando custos e lucros de todas as vendas...")
+        resultado = recalcular_lucros(db)
+        db.commit()
+        print(f"{resultado.linhas_alteradas} linhas alteradas em {resultado.segundos:.2f}s (lucro variou R$ {resultado.variacao_lucro:,.2f}).")
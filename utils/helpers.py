@@ -1,18 +1,67 @@
 # utils/helpers.py
+import threading
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from database import Variacao, ProdutoPai
+from utils.analise import versao_dados
 
-def calcular_custo_pelo_produto_pai(db: Session, sku_variacao: str):
+# Cache em memória SKU -> custo do kit (None = SKU desconhecido ou sem Produto Pai), válido para uma versão
+# dos dados: é compartilhado por todas as sessões do processo e descartado quando qualquer processo grava no banco.
+_cache_custos = {}
+_versao_cache_custos = None
+_geracao_cache_custos = 0
+_trava_cache_custos = threading.Lock()
+_TAMANHO_LOTE_SKUS = 900
+
+def limpar_cache_custos():
     """
-    Calcula o custo de um SKU buscando os dados financeiros do seu Produto Pai.
+    Esvazia o cache de custos. Deve ser chamada sempre que um ProdutoPai ou Variacao for criado, editado ou deletado.
+    """
+    global _geracao_cache_custos
+    with _trava_cache_custos:
+        _cache_custos.clear()
+        _geracao_cache_custos += 1
+
+def resolver_custos_skus(db: Session, skus):
+    """
+    Calcula o custo do kit de vários SKUs de uma vez.
+    Retorna (dicionário SKU -> custo, conjunto de SKUs desconhecidos).
+    Os SKUs que não estão no cache são buscados com uma única consulta variacoes JOIN produtos_pai.
     """
-    variacao = db.query(Variacao).filter(Variacao.skuVariacao == sku_variacao).first()
-    if not variacao or not variacao.idProdutoPai:
-        return None
+    global _versao_cache_custos
+    skus = {sku for sku in skus if sku}
+    versao = versao_dados()
+    with _trava_cache_custos:
+        if versao != _versao_cache_custos:
+            _cache_custos.clear()
+            _versao_cache_custos = versao
+        geracao = _geracao_cache_custos
+        custos = {sku: _cache_custos[sku] for sku in skus if sku in _cache_custos}
+    faltantes = [sku for sku in skus if sku not in custos]
 
-    produto_pai = db.query(ProdutoPai).filter(ProdutoPai.idProdutoPai == variacao.idProdutoPai).first()
-    if not produto_pai:
-        return None
+    if faltantes:
+        encontrados = {}
+        for i in range(0, len(faltantes), _TAMANHO_LOTE_SKUS):
+            consulta = (
+                select(Variacao.skuVariacao, ProdutoPai.custoUnidade, ProdutoPai.quantidadeKit, ProdutoPai.custoInsumos)
+                .join(ProdutoPai, Variacao.idProdutoPai == ProdutoPai.idProdutoPai)
+                .where(Variacao.skuVariacao.in_(faltantes[i:i + _TAMANHO_LOTE_SKUS]))
+            )
+            for sku, custo_unidade, qtd_kit, custo_insumos in db.execute(consulta):
+                encontrados[sku] = (custo_unidade * qtd_kit) + custo_insumos
+        for sku in faltantes:
+            custos[sku] = encontrados.get(sku)
+        with _trava_cache_custos:
+            # Se o catálogo mudou durante a consulta, o resultado não vai para o cache
+            if geracao == _geracao_cache_custos and versao == _versao_cache_custos:
+                _cache_custos.update({sku: custos[sku] for sku in faltantes})
 
-    custo_total = (produto_pai.custoUnidade * produto_pai.quantidadeKit) + produto_pai.custoInsumos
-    return custo_total
\ No newline at end of file
+    desconhecidos = {sku for sku, custo in custos.items() if custo is None}
+    return {sku: custo for sku, custo in custos.items() if custo is not None}, desconhecidos
+
+def calcular_custo_pelo_produto_pai(db: Session, sku_variacao: str):
+    """
+    Calcula o custo de um SKU buscando os dados financeiros do seu Produto Pai.
+    """
+    custos, _ = resolver_custos_skus(db, [sku_variacao])
+    return custos.get(sku_variacao)
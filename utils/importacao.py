@@ -0,0 +1,293 @@
+# utils/importacao.py
+import hashlib
+import io
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import pandas as pd
+from openpyxl import load_workbook
+from sqlalchemy import Column, MetaData, Table, delete, insert, text
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, LancamentosVendas
+from utils.custos import aplicar_custos_vigentes
+from utils.helpers import resolver_custos_skus
+from utils.instrumentacao import etapa
+from utils.plataformas import ParserPlataforma, eh_csv, ler_csv, obter_parser
+from utils.resumo import recalcular_celulas_resumo, somar_ao_resumo
+
+# Planilhas já lidas, indexadas pelo hash do conteúdo (as mais antigas saem primeiro)
+MAX_PLANILHAS_EM_CACHE = 4
+_cache_planilhas = OrderedDict()
+_trava_cache_planilhas = threading.Lock()
+
+# Linhas por bloco no modo streaming (cada bloco é gravado na sua própria transação)
+TAMANHO_BLOCO_STREAMING = 5000
+# A partir deste tamanho a página de importação sugere o modo streaming
+LIMITE_BYTES_STREAMING = 20 * 1024 * 1024
+
+COLUNAS_LANCAMENTO = ['pedidoId', 'dataPedido', 'plataforma', 'skuVenda', 'quantidade', 'receitaBrutaProduto', 'totalCupons', 'taxasMarketplace', 'valorVendaLiquido', 'custoTotalCalculado', 'lucroLiquidoReal']
+
+# Tabela temporária (uma por conexão) onde cada lote é conferido contra o histórico antes de ser gravado
+_staging = Table(
+    "staging_lancamentos", MetaData(),
+    *(Column(col.name, col.type) for col in LancamentosVendas.__table__.columns if col.name in COLUNAS_LANCAMENTO),
+    prefixes=["TEMPORARY"],
+)
+
+
+@dataclass
+class ResultadoImportacao:
+    linhas_lidas: int = 0
+    itens_salvos: int = 0
+    pedidos_novos: int = 0
+    itens_duplicados: int = 0
+    skus_nao_encontrados: list = field(default_factory=list)
+    segundos: float = 0.0
+    blocos_gravados: int = 0
+    erro: str = None
+
+    @property
+    def linhas_por_segundo(self):
+        return self.linhas_lidas / self.segundos if self.segundos > 0 else 0.0
+
+
+def hash_conteudo(conteudo: bytes) -> str:
+    return hashlib.sha256(conteudo).hexdigest()
+
+
+@etapa("leitura da planilha")
+def ler_planilha_sem_cache(conteudo: bytes, nome_arquivo: str = ".xlsx") -> pd.DataFrame:
+    """
+    Mesma leitura de ler_planilha_vendas, sem guardar o resultado (processos de leitura em segundo plano).
+    """
+    if eh_csv(nome_arquivo):
+        df_bruto = ler_csv(io.BytesIO(conteudo))
+    else:
+        df_bruto = pd.read_excel(io.BytesIO(conteudo), sheet_name=0, dtype=str)
+    df_bruto.columns = df_bruto.columns.str.strip()
+    return df_bruto
+
+
+def ler_planilha_vendas(conteudo: bytes, nome_arquivo: str = ".xlsx") -> pd.DataFrame:
+    """
+    Lê o .xlsx ou .csv (todas as colunas como texto, cabeçalhos sem espaços nas pontas) e guarda o resultado pelo hash do conteúdo.
+    Reexecuções do Streamlit com o mesmo arquivo reaproveitam a mesma leitura. O DataFrame devolvido é compartilhado: não altere no lugar.
+    """
+    chave = hash_conteudo(conteudo)
+    with _trava_cache_planilhas:
+        if chave in _cache_planilhas:
+            _cache_planilhas.move_to_end(chave)
+            return _cache_planilhas[chave]
+
+    df_bruto = ler_planilha_sem_cache(conteudo, nome_arquivo)
+
+    with _trava_cache_planilhas:
+        _cache_planilhas[chave] = df_bruto
+        _cache_planilhas.move_to_end(chave)
+        while len(_cache_planilhas) > MAX_PLANILHAS_EM_CACHE:
+            _cache_planilhas.popitem(last=False)
+    return df_bruto
+
+
+def iterar_blocos_planilha(origem, tamanho_bloco: int = TAMANHO_BLOCO_STREAMING, nome_arquivo: str = ".xlsx"):
+    """
+    Percorre a primeira aba do .xlsx linha a linha (openpyxl em modo somente leitura) e devolve DataFrames de até `tamanho_bloco` linhas.
+    Só um bloco fica em memória por vez. Gera tuplas (bloco, total estimado de linhas ou None).
+    Arquivos .csv são lidos em blocos pelo próprio pandas.
+    """
+    if eh_csv(nome_arquivo):
+        for bloco in ler_csv(origem, chunksize=tamanho_bloco):
+            bloco.columns = bloco.columns.str.strip()
+            yield bloco, None
+        return
+
+    livro = load_workbook(origem, read_only=True, data_only=True)
+    try:
+        # Sempre a primeira aba, como pd.read_excel e ler_cabecalho (a aba ativa pode ser outra)
+        planilha = livro.worksheets[0]
+        linhas = planilha.iter_rows(values_only=True)
+        cabecalho = next(linhas, None)
+        if cabecalho is None:
+            return
+        colunas = [str(col).strip() if col is not None else "" for col in cabecalho]
+        total_linhas = planilha.max_row - 1 if planilha.max_row else None
+
+        bloco = []
+        for linha in linhas:
+            if all(valor is None for valor in linha):
+                continue
+            # Mesmo formato do pd.read_excel(dtype=str): tudo como texto, vazios como None
+            bloco.append([None if valor is None else str(valor) for valor in linha[:len(colunas)]])
+            if len(bloco) >= tamanho_bloco:
+                yield pd.DataFrame(bloco, columns=colunas), total_linhas
+                bloco = []
+        if bloco:
+            yield pd.DataFrame(bloco, columns=colunas), total_linhas
+    finally:
+        livro.close()
+
+
+def ler_amostra_planilha(conteudo: bytes, linhas: int = 5, nome_arquivo: str = ".xlsx") -> pd.DataFrame:
+    """
+    Lê só o cabeçalho e as primeiras linhas do arquivo, para pré-visualização no modo streaming.
+    """
+    for bloco, _ in iterar_blocos_planilha(io.BytesIO(conteudo), tamanho_bloco=linhas, nome_arquivo=nome_arquivo):
+        return bloco
+    return pd.DataFrame()
+
+
+def normalizar_vendas(df_bruto: pd.DataFrame, parser: ParserPlataforma) -> pd.DataFrame:
+    """
+    Renomeia as colunas da planilha conforme o formato da plataforma e calcula taxas e cupons de uma vez para todas as linhas.
+    """
+    df_vendas = df_bruto.rename(columns=parser.mapa_colunas)
+    for col in ('pedidoId', 'dataPedido', 'skuVenda'):
+        if col not in df_vendas.columns: df_vendas[col] = None
+    for col in parser.colunas_numericas:
+        padrao = parser.valores_padrao.get(col, 0)
+        if col not in df_vendas.columns: df_vendas[col] = padrao
+        df_vendas[col] = pd.to_numeric(df_vendas[col], errors='coerce').fillna(padrao)
+    df_vendas["taxasMarketplace"] = parser.calcular_taxas(df_vendas)
+    df_vendas["totalCupons"] = parser.calcular_cupons(df_vendas)
+    return df_vendas
+
+
+def _gravar_sem_duplicados(db: Session, registros: list):
+    """
+    Grava os lançamentos deixando a deduplicação com o banco: o lote vai para uma tabela temporária,
+    as repetições internas e os pares (pedidoId, skuVenda) já existentes são removidos por anti-join
+    e o restante é copiado para lancamentos_vendas e somado ao resumo diário.
+    O custo depende do tamanho do lote, não do histórico.
+    Retorna (itens gravados, pedidos novos).
+    """
+    _staging.create(db.connection(), checkfirst=True)
+    db.execute(delete(_staging))
+    db.execute(insert(_staging), registros)
+    db.execute(text(
+        "DELETE FROM staging_lancamentos WHERE rowid NOT IN "
+        "(SELECT MIN(rowid) FROM staging_lancamentos GROUP BY pedidoId, skuVenda)"
+    ))
+    db.execute(text(
+        "DELETE FROM staging_lancamentos WHERE EXISTS (SELECT 1 FROM lancamentos_vendas l "
+        "WHERE l.pedidoId = staging_lancamentos.pedidoId AND l.skuVenda = staging_lancamentos.skuVenda)"
+    ))
+    # O custo do lote veio do custo atual do Produto Pai; pedidos antigos usam a versão vigente na sua data
+    aplicar_custos_vigentes(db)
+    pedidos_novos = db.execute(text(
+        "SELECT COUNT(DISTINCT s.pedidoId) FROM staging_lancamentos s "
+        "WHERE NOT EXISTS (SELECT 1 FROM lancamentos_vendas l WHERE l.pedidoId = s.pedidoId)"
+    )).scalar()
+    itens_no_lote = db.execute(text("SELECT COUNT(*) FROM staging_lancamentos")).scalar()
+    colunas = ", ".join(COLUNAS_LANCAMENTO)
+    # ON CONFLICT cobre gravações concorrentes entre o anti-join e o INSERT
+    itens_salvos = db.execute(text(
+        f"INSERT INTO lancamentos_vendas ({colunas}) SELECT {colunas} FROM staging_lancamentos WHERE true "
+        "ON CONFLICT DO NOTHING"
+    )).rowcount
+    # Resumo diário na mesma transação: soma o lote, ou recalcula as células afetadas se alguma linha ficou de fora
+    if itens_salvos == itens_no_lote:
+        somar_ao_resumo(db)
+    else:
+        recalcular_celulas_resumo(db)
+    return itens_salvos, pedidos_novos
+
+
+@etapa("preparação das vendas")
+def preparar_vendas(df_bruto: pd.DataFrame, plataforma: str, parser: ParserPlataforma = None) -> pd.DataFrame:
+    """
+    Parte da importação que não depende do banco: normaliza as colunas, calcula o valor líquido e converte
+    datas e tipos. Pode rodar em outro processo; o resultado segue para gravar_vendas.
+    """
+    parser = parser or obter_parser(plataforma)
+    df_vendas = normalizar_vendas(df_bruto, parser)
+    receita_bruta_total = df_vendas['receitaBrutaProduto'] * df_vendas['quantidade']
+    df_vendas['valorVendaLiquido'] = receita_bruta_total - df_vendas['totalCupons'] - df_vendas['taxasMarketplace']
+    df_vendas['dataPedido'] = parser.converter_datas(df_vendas['dataPedido'])
+    df_vendas['quantidade'] = df_vendas['quantidade'].astype(int)
+    df_vendas['pedidoId'] = df_vendas['pedidoId'].astype(str)
+    df_vendas['plataforma'] = plataforma
+    return df_vendas
+
+
+@etapa("gravação das vendas")
+def gravar_vendas(db: Session, df_vendas: pd.DataFrame) -> ResultadoImportacao:
+    """
+    Custeia as vendas já preparadas (preparar_vendas) e grava os lançamentos em lote, com commit.
+    Linhas de SKUs sem custo ficam de fora e são listadas em `skus_nao_encontrados`.
+    """
+    inicio = time.perf_counter()
+    resultado = ResultadoImportacao(linhas_lidas=len(df_vendas))
+    custos, _ = resolver_custos_skus(db, df_vendas['skuVenda'].dropna().unique())
+    custo_do_kit = df_vendas['skuVenda'].map(custos)
+    sem_custo = custo_do_kit.isna()
+    resultado.skus_nao_encontrados = [sku for sku in df_vendas.loc[sem_custo, 'skuVenda'].dropna().unique() if sku]
+
+    df_salvar = df_vendas[~sem_custo].copy()
+    df_salvar['custoTotalCalculado'] = custo_do_kit[~sem_custo].astype(float)
+    df_salvar['lucroLiquidoReal'] = df_salvar['valorVendaLiquido'] - df_salvar['custoTotalCalculado'] * df_salvar['quantidade']
+
+    if not df_salvar.empty:
+        registros = df_salvar[COLUNAS_LANCAMENTO].to_dict('records')
+        resultado.itens_salvos, resultado.pedidos_novos = _gravar_sem_duplicados(db, registros)
+        db.commit()
+        resultado.itens_duplicados = len(registros) - resultado.itens_salvos
+        resultado.blocos_gravados = 1
+
+    resultado.segundos = time.perf_counter() - inicio
+    return resultado
+
+
+def processar_vendas(db: Session, df_bruto: pd.DataFrame, plataforma: str, parser: ParserPlataforma = None) -> ResultadoImportacao:
+    """
+    Processa uma planilha de vendas inteira com operações de coluna e grava os lançamentos em lote.
+    O formato do arquivo vem do registro de plataformas (`parser`, ou o parser registrado com o nome de `plataforma`).
+    Itens já importados (mesmo pedidoId e skuVenda) são ignorados pelo próprio banco.
+    """
+    inicio = time.perf_counter()
+    resultado = gravar_vendas(db, preparar_vendas(df_bruto, plataforma, parser))
+    resultado.segundos = time.perf_counter() - inicio
+    return resultado
+
+
+def importar_planilha(caminho, plataforma: str = "Shopee") -> ResultadoImportacao:
+    """
+    Importa um arquivo .xlsx ou .csv fora do Streamlit (scripts, testes de desempenho).
+    """
+    with open(caminho, "rb") as arquivo:
+        df_bruto = ler_planilha_vendas(arquivo.read(), str(caminho))
+    with SessionLocal() as db:
+        return processar_vendas(db, df_bruto, plataforma)
+
+
+def processar_vendas_em_blocos(origem, plataforma: str, tamanho_bloco: int = TAMANHO_BLOCO_STREAMING, ao_progredir=None, nome_arquivo: str = ".xlsx") -> ResultadoImportacao:
+    """
+    Modo streaming: lê, normaliza, custeia e grava o arquivo em blocos de tamanho fixo, com um commit por bloco.
+    O uso de memória não depende do tamanho do arquivo. Se um bloco falhar, os anteriores continuam gravados
+    e o erro é devolvido em `resultado.erro` (reimportar o arquivo depois ignora o que já foi salvo).
+    `ao_progredir(linhas_processadas, total_estimado)` é chamada após cada bloco.
+    """
+    inicio = time.perf_counter()
+    resultado = ResultadoImportacao()
+    skus_nao_encontrados = {}
+    with SessionLocal() as db:
+        for numero_bloco, (bloco, total_linhas) in enumerate(iterar_blocos_planilha(origem, tamanho_bloco, nome_arquivo), start=1):
+            try:
+                parcial = processar_vendas(db, bloco, plataforma)
+            except Exception as e:
+                db.rollback()
+                resultado.erro = f"Falha no bloco {numero_bloco} (a partir da linha {resultado.linhas_lidas + 2} da planilha): {e}"
+                break
+            resultado.linhas_lidas += parcial.linhas_lidas
+            resultado.itens_salvos += parcial.itens_salvos
+            resultado.pedidos_novos += parcial.pedidos_novos
+            resultado.itens_duplicados += parcial.itens_duplicados
+            resultado.blocos_gravados += parcial.blocos_gravados
+            skus_nao_encontrados.update(dict.fromkeys(parcial.skus_nao_encontrados))
+            if ao_progredir:
+                ao_progredir(resultado.linhas_lidas, total_linhas)
+    resultado.skus_nao_encontrados = list(skus_nao_encontrados)
+    resultado.segundos = time.perf_counter() - inicio
+    return resultado
@@ -0,0 +1,285 @@
+# utils/instrumentacao.py
+"""
+Medição de desempenho sem profiler: cada consulta SQL (tempo, linhas e impressão digital do comando) e
+etapas nomeadas do código (`with etapa("..."):`). O que acontece durante uma execução de página fica num
+RegistroExecucao, mostrado no painel opcional da barra lateral; consultas e etapas acima dos limites vão
+para o log de lentidão (uma linha JSON por ocorrência), inclusive as da CLI e da importação em segundo plano.
+
+No SQLite o trabalho de um SELECT acontece quase todo ao buscar as linhas, então as conexões usam um cursor
+que também mede a busca: o tempo de uma consulta é execução + leitura das linhas, e as linhas são as lidas.
+"""
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+from sqlalchemy import event
+
+LIMITE_CONSULTA_LENTA_MS = float(os.getenv("LIMITE_CONSULTA_LENTA_MS", "500"))
+LIMITE_ETAPA_LENTA_MS = float(os.getenv("LIMITE_ETAPA_LENTA_MS", "2000"))
+# Vazio desliga o log de lentidão
+ARQUIVO_LOG_LENTIDAO = os.getenv("ARQUIVO_LOG_LENTIDAO", "desempenho_lento.log")
+# Uma página que dispara milhares de consultas já é o diagnóstico; além disto só o total é contado
+MAX_CONSULTAS_POR_EXECUCAO = 2000
+
+
+@dataclass
+class Consulta:
+    impressao: str
+    inicio: float
+    etapa: str = None
+    segundos: float = 0.0
+    linhas: int = None
+    encerrada: bool = False
+
+
+@dataclass
+class Etapa:
+    nome: str
+    inicio: float
+    segundos: float
+    nivel: int
+
+
+@dataclass
+class RegistroExecucao:
+    """
+    Consultas e etapas de uma execução do script do Streamlit (ou de qualquer bloco com medir_execucao).
+    """
+    nome: str
+    inicio: float = field(default_factory=time.perf_counter)
+    consultas: list = field(default_factory=list)
+    etapas: list = field(default_factory=list)
+    consultas_nao_guardadas: int = 0
+    _abertas: list = field(default_factory=list)
+
+    def etapa_atual(self):
+        return self._abertas[-1] if self._abertas else None
+
+
+_registro_atual = contextvars.ContextVar("registro_execucao", default=None)
+
+_SUBSTITUICOES_IMPRESSAO = [
+    (re.compile(r"\s+"), " "),
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"\(\?(?:, \?)+\)"), "(?, ...)"),
+    # INSERT em lote: VALUES (?, ...), (?, ...), ... vira um só grupo
+    (re.compile(r"\(\?, \.\.\.\)(?:, \(\?, \.\.\.\))+"), "(?, ...), ..."),
+]
+
+
+def impressao_digital(sql: str) -> str:
+    """
+    O comando sem literais nem listas de parâmetros: consultas iguais com valores diferentes caem juntas.
+    """
+    for padrao, troca in _SUBSTITUICOES_IMPRESSAO:
+        sql = padrao.sub(troca, sql)
+    return sql.strip()
+
+
+def identificador_impressao(impressao: str) -> str:
+    return hashlib.sha1(impressao.encode()).hexdigest()[:8]
+
+
+# --- log de lentidão ---
+
+_logger = logging.getLogger("controle_financeiro.desempenho")
+_trava_logger = threading.Lock()
+
+
+def _registrar_lentidao(tipo: str, nome: str, segundos: float, **detalhes):
+    if not ARQUIVO_LOG_LENTIDAO:
+        return
+    with _trava_logger:
+        # Configurado no primeiro uso: cada processo (inclusive os de leitura da importação) abre o seu handler
+        if not _logger.handlers:
+            handler = RotatingFileHandler(ARQUIVO_LOG_LENTIDAO, maxBytes=5 * 1024 * 1024, backupCount=3, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            _logger.addHandler(handler)
+            _logger.setLevel(logging.INFO)
+            _logger.propagate = False
+    registro = _registro_atual.get()
+    _logger.info(json.dumps({
+        "em": datetime.now().isoformat(timespec="milliseconds"), "tipo": tipo, "nome": nome, "ms": round(segundos * 1000, 1),
+        "execucao": registro.nome if registro else None, "pid": os.getpid(), **detalhes,
+    }, ensure_ascii=False, default=str))
+
+
+def _encerrar_consulta(consulta: Consulta, linhas: int = None):
+    if consulta.encerrada:
+        return
+    consulta.encerrada = True
+    if linhas is not None:
+        consulta.linhas = linhas
+    if consulta.segundos * 1000 >= LIMITE_CONSULTA_LENTA_MS:
+        _registrar_lentidao(
+            "consulta", identificador_impressao(consulta.impressao), consulta.segundos,
+            linhas=consulta.linhas, etapa=consulta.etapa, sql=consulta.impressao[:2000],
+        )
+
+
+# --- consultas ---
+
+class _CursorMedido(sqlite3.Cursor):
+    """
+    Soma à consulta em andamento o tempo e as linhas de cada busca; encerra a medição ao esgotar ou fechar.
+    """
+    consulta = None
+
+    def _contar(self, inicio: float, linhas: int, esgotou: bool):
+        consulta = self.consulta
+        if consulta is None:
+            return
+        consulta.segundos += time.perf_counter() - inicio
+        consulta.linhas = (consulta.linhas or 0) + linhas
+        if esgotou:
+            _encerrar_consulta(consulta)
+
+    def fetchone(self):
+        inicio = time.perf_counter()
+        linha = super().fetchone()
+        self._contar(inicio, linha is not None, linha is None)
+        return linha
+
+    def fetchmany(self, *args, **kwargs):
+        inicio = time.perf_counter()
+        linhas = super().fetchmany(*args, **kwargs)
+        self._contar(inicio, len(linhas), not linhas)
+        return linhas
+
+    def fetchall(self):
+        inicio = time.perf_counter()
+        linhas = super().fetchall()
+        self._contar(inicio, len(linhas), True)
+        return linhas
+
+    def close(self):
+        if self.consulta is not None:
+            _encerrar_consulta(self.consulta)
+        super().close()
+
+
+class ConexaoSqliteMedida(sqlite3.Connection):
+    """
+    Fábrica de conexões do sqlite3 (connect_args={"factory": ...}) cujos cursores medem as buscas.
+    """
+
+    def cursor(self, factory=_CursorMedido):
+        return super().cursor(factory)
+
+
+def instrumentar_engine(engine):
+    """
+    Liga a medição das consultas no engine. Com ConexaoSqliteMedida, as buscas de linhas também entram na conta.
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conexao, cursor, comando, parametros, contexto, executemany):
+        contexto._inicio_medicao = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _depois(conexao, cursor, comando, parametros, contexto, executemany):
+        inicio = contexto._inicio_medicao
+        registro = _registro_atual.get()
+        consulta = Consulta(impressao_digital(comando), inicio, registro.etapa_atual() if registro else None, time.perf_counter() - inicio)
+        if registro is not None:
+            if len(registro.consultas) < MAX_CONSULTAS_POR_EXECUCAO:
+                registro.consultas.append(consulta)
+            else:
+                registro.consultas_nao_guardadas += 1
+        if cursor.description is not None and isinstance(cursor, _CursorMedido):
+            # Devolve linhas: o resto da medição acontece nas buscas
+            cursor.consulta = consulta
+        else:
+            if isinstance(cursor, _CursorMedido):
+                cursor.consulta = None
+            _encerrar_consulta(consulta, cursor.rowcount if cursor.rowcount >= 0 else None)
+
+
+# --- etapas ---
+
+@contextmanager
+def etapa(nome: str):
+    """
+    Mede um trecho de código. As consultas feitas dentro dele ficam associadas ao seu nome no painel.
+    """
+    registro = _registro_atual.get()
+    if registro is not None:
+        registro._abertas.append(nome)
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        segundos = time.perf_counter() - inicio
+        if registro is not None:
+            registro._abertas.pop()
+            registro.etapas.append(Etapa(nome, inicio, segundos, len(registro._abertas)))
+        if segundos * 1000 >= LIMITE_ETAPA_LENTA_MS:
+            _registrar_lentidao("etapa", nome, segundos)
+
+
+@contextmanager
+def medir_execucao(nome: str):
+    """
+    Abre um RegistroExecucao para o bloco (uma execução de página) e o devolve no `with`.
+    """
+    registro = RegistroExecucao(nome)
+    token = _registro_atual.set(registro)
+    try:
+        with etapa(nome):
+            yield registro
+    finally:
+        _registro_atual.reset(token)
+
+
+def resumir_consultas(registro: RegistroExecucao):
+    """
+    Consultas agrupadas pela impressão digital, da que mais somou tempo para a que menos somou.
+    """
+    import pandas as pd
+    if not registro.consultas:
+        return pd.DataFrame(columns=["id", "execucoes", "total_ms", "max_ms", "linhas", "etapa", "sql"])
+    df = pd.DataFrame([
+        {"impressao": c.impressao, "segundos": c.segundos, "linhas": c.linhas, "etapa": c.etapa or "-"} for c in registro.consultas
+    ])
+    resumo = df.groupby("impressao", sort=False).agg(
+        execucoes=("segundos", "size"), total_ms=("segundos", "sum"), max_ms=("segundos", "max"),
+        linhas=("linhas", "sum"), etapa=("etapa", "first"),
+    ).reset_index()
+    resumo[["total_ms", "max_ms"]] *= 1000
+    resumo["id"] = resumo["impressao"].map(identificador_impressao)
+    resumo = resumo.rename(columns={"impressao": "sql"}).sort_values("total_ms", ascending=False)
+    return resumo[["id", "execucoes", "total_ms", "max_ms", "linhas", "etapa", "sql"]]
+
+
+def mostrar_painel_desempenho(registro: RegistroExecucao):
+    """
+    Painel da barra lateral com as etapas e as consultas da execução que acabou de rodar.
+    """
+    import streamlit as st
+    total = time.perf_counter() - registro.inicio
+    tempo_sql = sum(c.segundos for c in registro.consultas)
+    with st.sidebar.expander("⏱️ Desempenho desta execução", expanded=True):
+        st.caption(
+            f"{total * 1000:,.0f} ms no total · {len(registro.consultas) + registro.consultas_nao_guardadas} consulta(s) "
+            f"somando {tempo_sql * 1000:,.0f} ms de SQL"
+            + (f" ({registro.consultas_nao_guardadas} não detalhadas)" if registro.consultas_nao_guardadas else "")
+        )
+        etapas = sorted(registro.etapas, key=lambda e: e.inicio)
+        st.dataframe(
+            [{"etapa": " " * e.nivel + e.nome, "ms": round(e.segundos * 1000, 1),
+              "SQL ms": round(sum(c.segundos for c in registro.consultas if c.etapa == e.nome) * 1000, 1)} for e in etapas],
+            hide_index=True, use_container_width=True,
+        )
+        st.dataframe(resumir_consultas(registro).round({"total_ms": 1, "max_ms": 1}), hide_index=True, use_container_width=True)
+        if ARQUIVO_LOG_LENTIDAO:
+            st.caption(f"Consultas ≥ {LIMITE_CONSULTA_LENTA_MS:,.0f} ms e etapas ≥ {LIMITE_ETAPA_LENTA_MS:,.0f} ms vão para {ARQUIVO_LOG_LENTIDAO}.")
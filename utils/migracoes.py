@@ -0,0 +1,121 @@
+# utils/migracoes.py
+"""
+Migrações versionadas do esquema. A versão aplicada fica em PRAGMA user_version, no cabeçalho do próprio
+arquivo SQLite; cada migração roda na sua transação junto com o novo número de versão.
+
+Para mudar o esquema: altere o modelo em database.py (bancos novos saem prontos do create_all) e acrescente
+aqui uma função que leve os bancos existentes ao mesmo ponto, registrada no fim de MIGRACOES.
+"""
+from sqlalchemy import inspect, text
+
+from database import extrair_grupo_produto
+
+
+def _colunas(conexao, tabela: str) -> set:
+    return {coluna["name"] for coluna in inspect(conexao).get_columns(tabela)}
+
+
+def _coluna_plataforma(conexao):
+    # Bancos criados antes da importação de várias plataformas
+    if "plataforma" not in _colunas(conexao, "lancamentos_vendas"):
+        conexao.execute(text("ALTER TABLE lancamentos_vendas ADD COLUMN plataforma VARCHAR NOT NULL DEFAULT 'Desconhecida'"))
+    conexao.execute(text("CREATE INDEX IF NOT EXISTS ix_lancamentos_vendas_plataforma ON lancamentos_vendas (plataforma)"))
+
+
+def _chave_pedido_sku(conexao):
+    # pedidoId deixou de ser único: agora a chave é (pedidoId, skuVenda)
+    indices = {ix["name"]: ix for ix in inspect(conexao).get_indexes("lancamentos_vendas")}
+    if indices.get("ix_lancamentos_vendas_pedidoId", {}).get("unique"):
+        conexao.execute(text('DROP INDEX "ix_lancamentos_vendas_pedidoId"'))
+    conexao.execute(text('CREATE INDEX IF NOT EXISTS "ix_lancamentos_vendas_pedidoId" ON lancamentos_vendas ("pedidoId")'))
+    conexao.execute(text('CREATE UNIQUE INDEX IF NOT EXISTS uq_lancamentos_pedido_sku ON lancamentos_vendas ("pedidoId", "skuVenda")'))
+
+
+def _grupo_produto(conexao):
+    # Grupo de produto persistido na variação (antes era calculado a cada relatório)
+    if "grupoProduto" not in _colunas(conexao, "variacoes"):
+        conexao.execute(text('ALTER TABLE variacoes ADD COLUMN "grupoProduto" VARCHAR'))
+    conexao.execute(text('CREATE INDEX IF NOT EXISTS "ix_variacoes_grupoProduto" ON variacoes ("grupoProduto")'))
+    sem_grupo = conexao.execute(text('SELECT "skuVariacao", "nomeVariacao" FROM variacoes WHERE "grupoProduto" IS NULL')).all()
+    if sem_grupo:
+        conexao.execute(
+            text('UPDATE variacoes SET "grupoProduto" = :grupo WHERE "skuVariacao" = :sku'),
+            [{"grupo": extrair_grupo_produto(nome), "sku": sku} for sku, nome in sem_grupo],
+        )
+
+
+def _preencher_resumo(conexao):
+    # Bancos anteriores ao resumo diário: preenche a tabela a partir dos lançamentos existentes
+    from utils.resumo import reconstruir_resumo_vendas
+    if conexao.execute(text("SELECT NOT EXISTS (SELECT 1 FROM resumo_vendas_diario)")).scalar():
+        reconstruir_resumo_vendas(conexao)
+
+
+def _indices_consultas(conexao):
+    # Caminhos de acesso do dashboard, dos relatórios e da reprecificação. O (skuVenda, dataPedido)
+    # substitui o índice simples de skuVenda, que passa a ser só um custo a mais em cada importação.
+    conexao.execute(text('CREATE INDEX IF NOT EXISTS ix_lancamentos_data_plataforma ON lancamentos_vendas ("dataPedido", plataforma)'))
+    conexao.execute(text('CREATE INDEX IF NOT EXISTS ix_lancamentos_sku_data ON lancamentos_vendas ("skuVenda", "dataPedido")'))
+    conexao.execute(text('DROP INDEX IF EXISTS "ix_lancamentos_vendas_skuVenda"'))
+    conexao.execute(text('CREATE INDEX IF NOT EXISTS "ix_variacoes_idProdutoPai" ON variacoes ("idProdutoPai")'))
+    conexao.execute(text("CREATE INDEX IF NOT EXISTS ix_produtos_pai_categoria_id ON produtos_pai (categoria_id)"))
+    # Estatísticas para o planejador escolher entre os índices novos
+    conexao.execute(text("ANALYZE"))
+
+
+def _itens_resumo(conexao):
+    # A contagem do resumo é de linhas de lançamento, não de pedidos distintos: o nome antigo induzia a somá-la como pedidos
+    if "pedidos" in _colunas(conexao, "resumo_vendas_diario"):
+        conexao.execute(text("ALTER TABLE resumo_vendas_diario RENAME COLUMN pedidos TO itens"))
+
+
+# (versão, descrição, função). Nunca altere nem reordene uma migração já publicada: acrescente outra.
+MIGRACOES = [
+    (1, "coluna plataforma nos lançamentos", _coluna_plataforma),
+    (2, "chave única (pedidoId, skuVenda)", _chave_pedido_sku),
+    (3, "grupoProduto nas variações", _grupo_produto),
+    (4, "resumo diário de vendas", _preencher_resumo),
+    (5, "índices compostos das consultas analíticas", _indices_consultas),
+    (6, "coluna itens (antes pedidos) no resumo diário", _itens_resumo),
+]
+VERSAO_ATUAL = MIGRACOES[-1][0]
+
+
+def versao_esquema(conexao) -> int:
+    return conexao.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def marcar_versao_atual(engine):
+    """
+    Para bancos recém-criados pelo create_all, que já nascem com o esquema atual.
+    """
+    with engine.begin() as conexao:
+        conexao.exec_driver_sql(f"PRAGMA user_version = {VERSAO_ATUAL}")
+
+
+def aplicar_migracoes(engine) -> list:
+    """
+    Aplica, em ordem, as migrações com versão acima da gravada no banco. Cada uma roda sob BEGIN IMMEDIATE,
+    então dois processos subindo juntos não aplicam a mesma migração duas vezes.
+    Devolve as descrições das migrações aplicadas.
+    """
+    aplicadas = []
+    if engine.dialect.name != "sqlite":
+        return aplicadas
+    for versao, descricao, migrar in MIGRACOES:
+        with engine.connect() as conexao:
+            if versao_esquema(conexao) >= versao:
+                continue
+            conexao.exec_driver_sql("BEGIN IMMEDIATE")
+            try:
+                # Relido com a trava de escrita: outro processo pode ter acabado de aplicar esta versão
+                if versao_esquema(conexao) < versao:
+                    print(f"Aplicando migração {versao}: {descricao}...")
+                    migrar(conexao)
+                    conexao.exec_driver_sql(f"PRAGMA user_version = {versao}")
+                    aplicadas.append(descricao)
+                conexao.exec_driver_sql("COMMIT")
+            except Exception:
+                conexao.exec_driver_sql("ROLLBACK")
+                raise
+    return aplicadas
@@ -0,0 +1,249 @@
+# utils/plataformas.py
+import csv
+import io
+import posixpath
+import zipfile
+from dataclasses import dataclass, field
+from typing import Callable
+from xml.etree.ElementTree import iterparse
+
+import pandas as pd
+from openpyxl import load_workbook
+
+_NS_PLANILHA = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_REL_DOC = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_NS_REL_PACOTE = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+try:
+    import pyarrow  # noqa: F401
+    MOTOR_CSV = "pyarrow"
+except ImportError:
+    MOTOR_CSV = "c"
+
+
+def _soma_colunas(*colunas):
+    return lambda df: sum((df[col] for col in colunas), start=pd.Series(0.0, index=df.index))
+
+
+def _soma_absoluta_colunas(*colunas):
+    # O Mercado Livre exporta tarifas e reembolsos como valores negativos
+    return lambda df: sum((df[col].abs() for col in colunas), start=pd.Series(0.0, index=df.index))
+
+
+@dataclass(frozen=True)
+class ParserPlataforma:
+    """
+    Descreve o formato de exportação de um marketplace: colunas que o identificam, como renomeá-las
+    e como calcular taxas e cupons (sempre com operações de coluna, nunca linha a linha).
+    """
+    nome: str
+    assinatura: frozenset
+    mapa_colunas: dict
+    colunas_numericas: tuple
+    calcular_taxas: Callable
+    calcular_cupons: Callable
+    valores_padrao: dict = field(default_factory=dict)
+    converter_datas: Callable = pd.to_datetime
+
+    def reconhece(self, cabecalho) -> bool:
+        return self.assinatura.issubset({str(col).strip() for col in cabecalho})
+
+    def colunas_faltantes(self, cabecalho) -> list:
+        cabecalho = {str(col).strip() for col in cabecalho}
+        return sorted(col for col in self.assinatura if col not in cabecalho)
+
+
+_parsers = {}
+
+def registrar_parser(parser: ParserPlataforma):
+    """
+    Adiciona (ou substitui) um formato de marketplace. A ordem de registro é a ordem de detecção.
+    """
+    _parsers[parser.nome] = parser
+    return parser
+
+def listar_plataformas() -> list:
+    return list(_parsers)
+
+def obter_parser(nome: str) -> ParserPlataforma:
+    """
+    Devolve o parser da plataforma. Nomes desconhecidos usam o formato genérico ("Outra").
+    """
+    return _parsers.get(nome, _parsers[PLATAFORMA_GENERICA])
+
+def detectar_parser(cabecalho):
+    """
+    Identifica o formato só pelos nomes das colunas. Retorna None se nenhum parser reconhecer o arquivo.
+    """
+    for parser in _parsers.values():
+        if parser.reconhece(cabecalho):
+            return parser
+    return None
+
+
+def _datas_mercado_livre(serie: pd.Series) -> pd.Series:
+    # Ex.: "15 de janeiro de 2024 10:32 hs."
+    meses = ["janeiro", "fevereiro", "março", "abril", "maio", "junho", "julho", "agosto", "setembro", "outubro", "novembro", "dezembro"]
+    texto = serie.astype(str).str.lower().str.replace(r"\s*hs\.?$", "", regex=True)
+    for numero, mes in enumerate(meses, start=1):
+        texto = texto.str.replace(f" de {mes} de ", f"/{numero:02d}/", regex=False)
+    datas = pd.to_datetime(texto, format="%d/%m/%Y %H:%M", errors="coerce")
+    fora_do_padrao = datas.isna() & serie.notna()
+    if fora_do_padrao.any():
+        datas[fora_do_padrao] = pd.to_datetime(serie[fora_do_padrao])
+    return datas
+
+
+PLATAFORMA_GENERICA = "Outra"
+
+registrar_parser(ParserPlataforma(
+    nome="Shopee",
+    assinatura=frozenset({"ID do pedido", "Taxa de comissão", "Taxa de serviço"}),
+    mapa_colunas={
+        "ID do pedido": "pedidoId", "Data de criação do pedido": "dataPedido",
+        "Número de referência SKU": "skuVenda", "Quantidade": "quantidade",
+        "Preço acordado": "receitaBrutaProduto", "Taxa de comissão": "taxaComissao",
+        "Taxa de serviço": "taxaServico", "Taxa de transação": "taxaTransacao",
+        "Cupom do vendedor": "cupomVendedor", "Cupom Shopee": "cupomShopee",
+        "Reembolso Shopee": "reembolsoShopee"
+    },
+    colunas_numericas=('quantidade', 'receitaBrutaProduto', 'taxaComissao', 'taxaServico', 'taxaTransacao', 'cupomVendedor', 'cupomShopee', 'reembolsoShopee'),
+    calcular_taxas=_soma_colunas('taxaComissao', 'taxaServico', 'taxaTransacao'),
+    calcular_cupons=_soma_colunas('cupomVendedor', 'cupomShopee', 'reembolsoShopee'),
+))
+
+registrar_parser(ParserPlataforma(
+    nome="Mercado Livre",
+    assinatura=frozenset({"N.º de venda", "Data da venda", "Tarifa de venda e impostos (BRL)"}),
+    mapa_colunas={
+        "N.º de venda": "pedidoId", "Data da venda": "dataPedido", "SKU": "skuVenda",
+        "Unidades": "quantidade", "Preço unitário de venda do anúncio (BRL)": "receitaBrutaProduto",
+        "Tarifa de venda e impostos (BRL)": "tarifaVenda", "Tarifas de envio (BRL)": "tarifaEnvio",
+        "Cancelamentos e reembolsos (BRL)": "reembolsos"
+    },
+    colunas_numericas=('quantidade', 'receitaBrutaProduto', 'tarifaVenda', 'tarifaEnvio', 'reembolsos'),
+    calcular_taxas=_soma_absoluta_colunas('tarifaVenda', 'tarifaEnvio'),
+    calcular_cupons=_soma_absoluta_colunas('reembolsos'),
+    converter_datas=_datas_mercado_livre,
+))
+
+registrar_parser(ParserPlataforma(
+    nome="Shein",
+    assinatura=frozenset({"Número do pedido", "SKU do vendedor", "Comissão"}),
+    mapa_colunas={
+        "Número do pedido": "pedidoId", "Data do pedido": "dataPedido", "SKU do vendedor": "skuVenda",
+        "Quantidade": "quantidade", "Preço do produto": "receitaBrutaProduto",
+        "Comissão": "comissao", "Taxa de serviço": "taxaServico", "Cupom": "cupom"
+    },
+    colunas_numericas=('quantidade', 'receitaBrutaProduto', 'comissao', 'taxaServico', 'cupom'),
+    calcular_taxas=_soma_colunas('comissao', 'taxaServico'),
+    calcular_cupons=_soma_colunas('cupom'),
+    # A exportação da Shein traz uma linha por peça
+    valores_padrao={'quantidade': 1},
+))
+
+# Formato genérico: CSV/XLSX já com os nomes de coluna do sistema
+registrar_parser(ParserPlataforma(
+    nome=PLATAFORMA_GENERICA,
+    assinatura=frozenset({"pedidoId", "dataPedido", "skuVenda"}),
+    mapa_colunas={
+        "pedidoId": "pedidoId", "dataPedido": "dataPedido", "skuVenda": "skuVenda",
+        "quantidade": "quantidade", "receitaBrutaProduto": "receitaBrutaProduto",
+        "taxasMarketplace": "taxasMarketplace", "totalCupons": "totalCupons"
+    },
+    colunas_numericas=('quantidade', 'receitaBrutaProduto', 'taxasMarketplace', 'totalCupons'),
+    calcular_taxas=lambda df: df['taxasMarketplace'],
+    calcular_cupons=lambda df: df['totalCupons'],
+    valores_padrao={'quantidade': 1},
+))
+
+
+def eh_csv(nome_arquivo: str) -> bool:
+    return str(nome_arquivo).lower().endswith(".csv")
+
+def ler_csv(origem, **kwargs) -> pd.DataFrame:
+    """
+    Lê um CSV com todas as colunas como texto, usando o motor mais rápido disponível (pyarrow, se instalado).
+    """
+    # O motor pyarrow não suporta leitura em blocos (chunksize)
+    motor = "c" if "chunksize" in kwargs else MOTOR_CSV
+    return pd.read_csv(origem, dtype=str, engine=motor, **kwargs)
+
+def _cabecalho_csv(conteudo: bytes) -> list:
+    primeira_linha = conteudo[:64 * 1024].split(b"\n", 1)[0].decode("utf-8-sig", errors="replace")
+    return [col.strip() for col in next(csv.reader([primeira_linha]), [])]
+
+def _texto_celula_inline(celula) -> str:
+    return "".join(t.text or "" for t in celula.iter(f"{_NS_PLANILHA}t"))
+
+def _indice_coluna(letras: str) -> int:
+    indice = 0
+    for letra in letras.upper():
+        indice = indice * 26 + (ord(letra) - ord("A") + 1)
+    return indice - 1
+
+def _cabecalho_xlsx(conteudo: bytes) -> list:
+    """
+    Lê só a primeira linha da primeira aba direto do XML do .xlsx, sem carregar a planilha
+    nem a tabela inteira de textos compartilhados.
+    """
+    with zipfile.ZipFile(io.BytesIO(conteudo)) as pacote:
+        id_relacao = None
+        with pacote.open("xl/workbook.xml") as arquivo:
+            for _, elemento in iterparse(arquivo):
+                if elemento.tag == f"{_NS_PLANILHA}sheet":
+                    id_relacao = elemento.get(f"{_NS_REL_DOC}id")
+                    break
+        with pacote.open("xl/_rels/workbook.xml.rels") as arquivo:
+            alvos = {rel.get("Id"): rel.get("Target") for _, rel in iterparse(arquivo) if rel.tag == f"{_NS_REL_PACOTE}Relationship"}
+        alvo = alvos[id_relacao]
+        caminho_aba = alvo.lstrip("/") if alvo.startswith("/") else posixpath.normpath(posixpath.join("xl", alvo))
+
+        celulas = []
+        with pacote.open(caminho_aba) as arquivo:
+            for evento, elemento in iterparse(arquivo, events=("end",)):
+                if elemento.tag == f"{_NS_PLANILHA}c":
+                    # Células vazias não aparecem no XML: a posição vem da referência (ex.: "C1")
+                    letras = "".join(ch for ch in elemento.get("r", "") if ch.isalpha())
+                    posicao = _indice_coluna(letras) if letras else len(celulas)
+                    celulas.extend([("texto", "")] * (posicao - len(celulas)))
+                    valor = elemento.find(f"{_NS_PLANILHA}v")
+                    if elemento.get("t") == "inlineStr":
+                        celulas.append(("texto", _texto_celula_inline(elemento)))
+                    elif elemento.get("t") == "s" and valor is not None:
+                        celulas.append(("compartilhado", int(valor.text)))
+                    else:
+                        celulas.append(("texto", valor.text if valor is not None else ""))
+                elif elemento.tag == f"{_NS_PLANILHA}row":
+                    break
+
+        indices = {indice for tipo, indice in celulas if tipo == "compartilhado"}
+        textos = {}
+        if indices:
+            maior_indice = max(indices)
+            with pacote.open("xl/sharedStrings.xml") as arquivo:
+                for posicao, (_, elemento) in enumerate(e for e in iterparse(arquivo) if e[1].tag == f"{_NS_PLANILHA}si"):
+                    if posicao in indices:
+                        textos[posicao] = _texto_celula_inline(elemento)
+                    elemento.clear()
+                    if posicao >= maior_indice:
+                        break
+    return [(textos.get(valor, "") if tipo == "compartilhado" else (valor or "")).strip() for tipo, valor in celulas]
+
+def ler_cabecalho(conteudo: bytes, nome_arquivo: str = ".xlsx") -> list:
+    """
+    Devolve os nomes das colunas do arquivo lendo apenas a linha de cabeçalho (no .xlsx, da primeira aba,
+    a mesma que a importação lê).
+    """
+    if eh_csv(nome_arquivo):
+        return _cabecalho_csv(conteudo)
+    try:
+        return _cabecalho_xlsx(conteudo)
+    except (KeyError, ValueError, zipfile.BadZipFile):
+        # Estrutura de pacote incomum: recorre ao openpyxl (mais lento, mas tolerante)
+        livro = load_workbook(io.BytesIO(conteudo), read_only=True)
+        try:
+            primeira_linha = next(livro.worksheets[0].iter_rows(max_row=1, values_only=True), ())
+        finally:
+            livro.close()
+        return [str(col).strip() if col is not None else "" for col in primeira_linha]
@@ -0,0 +1,59 @@
+# utils/resumo.py
+from sqlalchemy import text
+
+from database import SessionLocal
+
+_COLUNAS_RESUMO = "dia, skuVenda, plataforma, unidades, receitaBruta, custoTotal, taxas, cupons, lucro, itens"
+
+def _select_agregado(origem: str, condicao: str = "true") -> str:
+    return (
+        f"SELECT date(dataPedido), skuVenda, plataforma, SUM(quantidade), SUM(receitaBrutaProduto * quantidade), "
+        f"SUM(custoTotalCalculado * quantidade), SUM(taxasMarketplace), SUM(totalCupons), SUM(lucroLiquidoReal), COUNT(*) "
+        f"FROM {origem} WHERE {condicao} GROUP BY date(dataPedido), skuVenda, plataforma"
+    )
+
+def somar_ao_resumo(conexao, origem: str = "staging_lancamentos"):
+    """
+    Acrescenta ao resumo diário os lançamentos da tabela `origem` (o lote recém-gravado pela importação).
+    Só agrega o lote: o custo não depende do tamanho do histórico.
+    """
+    conexao.execute(text(
+        f"INSERT INTO resumo_vendas_diario ({_COLUNAS_RESUMO}) {_select_agregado(origem)} "
+        "ON CONFLICT (dia, skuVenda, plataforma) DO UPDATE SET "
+        "unidades = unidades + excluded.unidades, receitaBruta = receitaBruta + excluded.receitaBruta, "
+        "custoTotal = custoTotal + excluded.custoTotal, taxas = taxas + excluded.taxas, "
+        "cupons = cupons + excluded.cupons, lucro = lucro + excluded.lucro, itens = itens + excluded.itens"
+    ))
+
+def recalcular_celulas_resumo(conexao, origem: str = "staging_lancamentos"):
+    """
+    Recalcula, a partir de lancamentos_vendas, só as células (dia, SKU, plataforma) presentes em `origem`.
+    """
+    celulas = f"SELECT DISTINCT date(dataPedido) AS dia, skuVenda, plataforma FROM {origem}"
+    conexao.execute(text(
+        f"DELETE FROM resumo_vendas_diario WHERE (dia, skuVenda, plataforma) IN ({celulas})"
+    ))
+    conexao.execute(text(
+        f"INSERT INTO resumo_vendas_diario ({_COLUNAS_RESUMO}) "
+        + _select_agregado("lancamentos_vendas", f"skuVenda IN (SELECT skuVenda FROM {origem}) AND (date(dataPedido), skuVenda, plataforma) IN ({celulas})")
+    ))
+
+def reconstruir_resumo_vendas(conexao, skus=None):
+    """
+    Refaz o resumo diário a partir dos lançamentos (todo ele, ou só os SKUs informados).
+    """
+    if skus is None:
+        conexao.execute(text("DELETE FROM resumo_vendas_diario"))
+        conexao.execute(text(f"INSERT INTO resumo_vendas_diario ({_COLUNAS_RESUMO}) {_select_agregado('lancamentos_vendas')}"))
+        return
+    for sku in skus:
+        conexao.execute(text("DELETE FROM resumo_vendas_diario WHERE skuVenda = :sku"), {"sku": sku})
+        conexao.execute(text(f"INSERT INTO resumo_vendas_diario ({_COLUNAS_RESUMO}) {_select_agregado('lancamentos_vendas', 'skuVenda = :sku')}"), {"sku": sku})
+
+if __name__ == "__main__":
+    # python -m utils.resumo  ->  reconstrói o resumo diário inteiro
+    with SessionLocal() as db:
+        print("Reconstruindo o resumo diário de vendas...")
+        reconstruir_resumo_vendas(db)
+        db.commit()
+        print("Resumo pronto.")
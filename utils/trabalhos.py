@@ -0,0 +1,238 @@
+# utils/trabalhos.py
+"""
+Importações em segundo plano. Cada arquivo enviado vira um TrabalhoImportacao no banco e é copiado para
+PASTA_IMPORTACOES; a leitura e a preparação das planilhas rodam em paralelo num pool de processos e só a
+gravação passa por uma única thread escritora, então o SQLite nunca tem duas importações disputando a escrita.
+
+As páginas só enviam trabalhos e consultam o andamento: fechar ou recarregar o navegador não interrompe nada.
+Se o servidor for reiniciado no meio, os trabalhos pendentes são retomados quando o servidor seguinte iniciar
+o gerenciador (a importação ignora o que já foi gravado, então repetir um trabalho é seguro). A linha de comando
+não retoma trabalhos órfãos: ela só espera os próprios e termina, e os deixaria presos em "executando".
+"""
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import socket
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import pandas as pd
+from sqlalchemy import select, update
+
+from database import TrabalhoImportacao, engine, sessao_banco
+from utils.importacao import (
+    ResultadoImportacao, gravar_vendas, hash_conteudo, ler_planilha_sem_cache, preparar_vendas, processar_vendas_em_blocos,
+)
+
+PASTA_IMPORTACOES = os.getenv("PASTA_IMPORTACOES", "importacoes_pendentes")
+PROCESSOS_LEITURA = int(os.getenv("IMPORTACAO_PROCESSOS", str(max(1, min(4, (os.cpu_count() or 2) - 1)))))
+# Sinal de vida dos trabalhos pendentes; sem sinal por INTERVALO_ORFAO o trabalho é considerado abandonado
+INTERVALO_BATIMENTO = timedelta(seconds=20)
+INTERVALO_ORFAO = timedelta(minutes=2)
+
+NA_FILA, EXECUTANDO, CONCLUIDO, FALHOU = "na_fila", "executando", "concluido", "falhou"
+PENDENTES = (NA_FILA, EXECUTANDO)
+ROTULOS_STATUS = {NA_FILA: "⏳ Na fila", EXECUTANDO: "⚙️ Gravando", CONCLUIDO: "✅ Concluído", FALHOU: "❌ Falhou"}
+
+_logger = logging.getLogger("controle_financeiro.importacoes")
+_tabela_verificada = False
+
+
+def _garantir_tabela():
+    # Bancos criados antes da fila de importação (criar_banco também cria a tabela)
+    global _tabela_verificada
+    if not _tabela_verificada:
+        TrabalhoImportacao.__table__.create(engine, checkfirst=True)
+        _tabela_verificada = True
+
+
+def _caminho_arquivo(id_trabalho: int, nome_arquivo: str) -> str:
+    # Um arquivo por trabalho: o mesmo conteúdo enviado duas vezes não é apagado no meio da outra importação
+    return os.path.join(PASTA_IMPORTACOES, f"trabalho_{id_trabalho}{os.path.splitext(nome_arquivo)[1].lower()}")
+
+
+def _ler_e_preparar(caminho: str, nome_arquivo: str, plataforma: str) -> pd.DataFrame:
+    """
+    Executada num processo do pool: lê a planilha do disco e prepara as vendas (nada de banco aqui).
+    """
+    with open(caminho, "rb") as arquivo:
+        return preparar_vendas(ler_planilha_sem_cache(arquivo.read(), nome_arquivo), plataforma)
+
+
+def _atualizar(id_trabalho: int, **valores):
+    valores["atualizadoEm"] = datetime.now()
+    with sessao_banco() as db:
+        db.execute(update(TrabalhoImportacao).where(TrabalhoImportacao.id == id_trabalho).values(**valores))
+        db.commit()
+
+
+def _dados_envio(trabalho: TrabalhoImportacao) -> tuple:
+    return trabalho.id, trabalho.nomeArquivo, trabalho.plataforma, trabalho.modoStreaming
+
+
+class _GerenciadorImportacoes:
+    """
+    Pool de processos para a leitura e uma thread escritora, compartilhados por todas as sessões do processo.
+    """
+
+    def __init__(self, retomar_orfaos: bool = True):
+        self.dono = f"{socket.gethostname()}:{os.getpid()}"
+        # spawn: o processo do Streamlit tem várias threads, e um fork copiaria travas e conexões no meio do uso
+        self._pool = ProcessPoolExecutor(max_workers=PROCESSOS_LEITURA, mp_context=multiprocessing.get_context("spawn"))
+        self._prontos = queue.Queue()
+        threading.Thread(target=self._escrever, name="escritor-importacoes", daemon=True).start()
+        threading.Thread(target=self._bater, name="batimento-importacoes", daemon=True).start()
+        if retomar_orfaos:
+            self._retomar_orfaos()
+
+    def enviar(self, id_trabalho: int, nome_arquivo: str, plataforma: str, modo_streaming: bool):
+        caminho = _caminho_arquivo(id_trabalho, nome_arquivo)
+        if modo_streaming:
+            # Streaming é lido bloco a bloco pela própria escritora, com memória constante
+            self._prontos.put((id_trabalho, caminho, nome_arquivo, plataforma, None))
+            return
+        leitura = self._pool.submit(_ler_e_preparar, caminho, nome_arquivo, plataforma)
+        leitura.add_done_callback(lambda futuro: self._prontos.put((id_trabalho, caminho, nome_arquivo, plataforma, futuro)))
+
+    def _retomar_orfaos(self):
+        limite = datetime.now() - INTERVALO_ORFAO
+        with sessao_banco() as db:
+            orfaos = db.scalars(
+                select(TrabalhoImportacao)
+                .where(TrabalhoImportacao.status.in_(PENDENTES), TrabalhoImportacao.atualizadoEm < limite)
+                .order_by(TrabalhoImportacao.id)
+            ).all()
+            for trabalho in orfaos:
+                if os.path.exists(_caminho_arquivo(trabalho.id, trabalho.nomeArquivo)):
+                    trabalho.status, trabalho.dono, trabalho.atualizadoEm = NA_FILA, self.dono, datetime.now()
+                else:
+                    trabalho.status, trabalho.erro, trabalho.concluidoEm = FALHOU, "Interrompido e o arquivo não está mais disponível.", datetime.now()
+            retomados = [_dados_envio(trabalho) for trabalho in orfaos if trabalho.status == NA_FILA]
+            db.commit()
+        for dados in retomados:
+            self.enviar(*dados)
+
+    def _bater(self):
+        # Sinal de vida de todos os trabalhos pendentes deste processo, inclusive os que esperam na fila
+        # enquanto a escritora está presa numa gravação longa
+        while True:
+            time.sleep(INTERVALO_BATIMENTO.total_seconds())
+            try:
+                with sessao_banco() as db:
+                    db.execute(
+                        update(TrabalhoImportacao)
+                        .where(TrabalhoImportacao.dono == self.dono, TrabalhoImportacao.status.in_(PENDENTES))
+                        .values(atualizadoEm=datetime.now())
+                    )
+                    db.commit()
+            except Exception:
+                pass  # banco ocupado: fica para a próxima batida
+
+    def _escrever(self):
+        while True:
+            item = self._prontos.get()
+            try:
+                self._executar(*item)
+            except Exception as e:
+                # Falha ao registrar o andamento (banco travado, por exemplo): a escritora segue com a fila
+                _logger.exception("Erro no trabalho de importação %s", item[0])
+                self._registrar_falha(item[0], item[1], f"{type(e).__name__}: {e}")
+
+    def _registrar_falha(self, id_trabalho: int, caminho: str, erro: str):
+        # Sem isto o trabalho ficaria em "executando" até virar órfão e ser repetido
+        try:
+            _atualizar(id_trabalho, status=FALHOU, concluidoEm=datetime.now(), erro=erro)
+        except Exception:
+            _logger.exception("Não foi possível registrar a falha do trabalho de importação %s", id_trabalho)
+            return
+        if os.path.exists(caminho):
+            os.remove(caminho)
+
+    def _executar(self, id_trabalho: int, caminho: str, nome_arquivo: str, plataforma: str, leitura):
+        _atualizar(id_trabalho, status=EXECUTANDO, iniciadoEm=datetime.now())
+        try:
+            if leitura is None:
+                with open(caminho, "rb") as arquivo:
+                    resultado = processar_vendas_em_blocos(
+                        arquivo, plataforma, nome_arquivo=nome_arquivo,
+                        ao_progredir=lambda linhas, total: _atualizar(id_trabalho, linhasProcessadas=linhas, totalLinhas=total),
+                    )
+            else:
+                df_vendas = leitura.result()
+                _atualizar(id_trabalho, totalLinhas=len(df_vendas))
+                with sessao_banco() as db:
+                    resultado = gravar_vendas(db, df_vendas)
+        except Exception as e:
+            resultado = ResultadoImportacao(erro=f"{type(e).__name__}: {e}")
+        _atualizar(
+            id_trabalho, status=FALHOU if resultado.erro else CONCLUIDO, concluidoEm=datetime.now(), erro=resultado.erro,
+            linhasProcessadas=resultado.linhas_lidas, itensSalvos=resultado.itens_salvos, pedidosNovos=resultado.pedidos_novos,
+            itensDuplicados=resultado.itens_duplicados, skusNaoEncontrados=resultado.skus_nao_encontrados,
+        )
+        if os.path.exists(caminho):
+            os.remove(caminho)
+
+
+_gerenciador = None
+_trava_gerenciador = threading.Lock()
+
+
+def _obter_gerenciador(retomar_orfaos: bool = True) -> _GerenciadorImportacoes:
+    global _gerenciador
+    with _trava_gerenciador:
+        if _gerenciador is None:
+            _garantir_tabela()
+            _gerenciador = _GerenciadorImportacoes(retomar_orfaos)
+        return _gerenciador
+
+
+def enviar_importacao(conteudo: bytes, nome_arquivo: str, plataforma: str, modo_streaming: bool = False,
+                      retomar_orfaos: bool = True) -> int:
+    """
+    Coloca um arquivo na fila de importação e devolve o id do trabalho. O arquivo é copiado para
+    PASTA_IMPORTACOES e apagado quando o trabalho termina. Processos de vida curta (linha de comando) passam
+    retomar_orfaos=False, para não assumir trabalhos abandonados que não vão esperar terminar.
+    """
+    gerenciador = _obter_gerenciador(retomar_orfaos)
+    agora = datetime.now()
+    with sessao_banco() as db:
+        trabalho = TrabalhoImportacao(
+            nomeArquivo=nome_arquivo, hashArquivo=hash_conteudo(conteudo), plataforma=plataforma, modoStreaming=modo_streaming,
+            status=NA_FILA, dono=gerenciador.dono, skusNaoEncontrados=[], criadoEm=agora, atualizadoEm=agora,
+        )
+        db.add(trabalho)
+        db.commit()
+        dados = _dados_envio(trabalho)
+    os.makedirs(PASTA_IMPORTACOES, exist_ok=True)
+    with open(_caminho_arquivo(dados[0], nome_arquivo), "wb") as arquivo:
+        arquivo.write(conteudo)
+    gerenciador.enviar(*dados)
+    return dados[0]
+
+
+def listar_trabalhos(db, limite: int = 10) -> pd.DataFrame:
+    """
+    Os trabalhos mais recentes, do mais novo para o mais antigo.
+    """
+    _garantir_tabela()
+    consulta = select(TrabalhoImportacao.__table__).order_by(TrabalhoImportacao.id.desc()).limit(limite)
+    df = pd.read_sql(consulta, db.connection(), parse_dates=["criadoEm", "iniciadoEm", "concluidoEm"])
+    # O JSON volta como texto pelo read_sql
+    df["skusNaoEncontrados"] = df["skusNaoEncontrados"].map(lambda valor: json.loads(valor) if isinstance(valor, str) else (valor or []))
+    return df
+
+
+def aguardar_trabalhos(ids: list, intervalo: float = 0.5) -> pd.DataFrame:
+    """
+    Bloqueia até os trabalhos informados terminarem (scripts e linha de comando) e devolve as suas linhas.
+    """
+    while True:
+        with sessao_banco() as db:
+            df = pd.read_sql(select(TrabalhoImportacao.__table__).where(TrabalhoImportacao.id.in_(ids)), db.connection())
+        if not df["status"].isin(PENDENTES).any():
+            return df
+        time.sleep(intervalo)